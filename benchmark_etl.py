@@ -0,0 +1,174 @@
+import sqlite3
+import pandas as pd
+import numpy as np
+import os
+import io
+import time
+import tempfile
+from contextlib import redirect_stdout
+from create_database_table import create_tables
+from etl_script import transform_data, load_data_conditionally
+from queries import ANALYSIS_QUERIES, OVERVIEW_GROUPING_SETS
+from grouping_sets import grouping_sets_sql
+from query_backends import connect_backend, export_parquet, run_query, duckdb
+
+# Agrégations lues directement sur FAIT_VENTES (cas défavorable: parcours complet des ventes)
+FACT_SCAN_QUERIES = {
+    'scan_ca_par_ville': """
+    SELECT dm.VILLE, COUNT(*) as nombre_ventes, SUM(fv.MONTANT_VENTE) as ca_total, AVG(fv.MONTANT_VENTE) as panier_moyen
+    FROM FAIT_VENTES fv JOIN DIM_MAGASINS dm ON fv.ID_MAGASIN = dm.ID_MAGASIN
+    GROUP BY dm.VILLE ORDER BY ca_total DESC
+    """,
+    'scan_top_produits': """
+    SELECT dp.NOM_PRODUIT, SUM(fv.QUANTITE_VENDUE) as quantite_totale, SUM(fv.MONTANT_VENTE) as ca_total
+    FROM FAIT_VENTES fv JOIN DIM_PRODUITS dp ON fv.ID_PRODUIT = dp.ID_PRODUIT
+    GROUP BY dp.NOM_PRODUIT ORDER BY ca_total DESC
+    """,
+    'scan_evolution_temporelle': """
+    SELECT dt.DATE_COMPLETE, SUM(fv.MONTANT_VENTE) as ca_jour, COUNT(*) as nombre_ventes
+    FROM FAIT_VENTES fv JOIN DIM_TEMPS dt ON fv.ID_TEMPS = dt.ID_TEMPS
+    GROUP BY dt.DATE_COMPLETE ORDER BY dt.DATE_COMPLETE
+    """,
+    # KPIs, CA par ville et par produit en un seul parcours des faits
+    'scan_vue_ensemble': grouping_sets_sql(OVERVIEW_GROUPING_SETS, 'FAIT_VENTES')
+}
+
+def synthetic_sources(n_ventes, n_jours=730, n_produits=50, n_magasins=20, seed=42):
+    """Sources synthétiques (mêmes colonnes que les CSV) de taille arbitraire"""
+    rng = np.random.default_rng(seed)
+    villes = ['Paris', 'Marseille', 'Lyon', 'Bordeaux', 'Lille', 'Nantes', 'Strasbourg']
+    
+    df_produits = pd.DataFrame({
+        'ID Référence produit': [f"REF{i:04d}" for i in range(1, n_produits + 1)],
+        'Nom': [f"Produit {i}" for i in range(1, n_produits + 1)],
+        'Prix': rng.integers(500, 20000, n_produits) / 100,
+        'Stock': rng.integers(0, 500, n_produits).astype('int32')
+    })
+    df_magasins = pd.DataFrame({
+        'ID Magasin': np.arange(1, n_magasins + 1, dtype='int32'),
+        'Ville': [villes[i % len(villes)] for i in range(n_magasins)],
+        'Nombre de salariés': rng.integers(2, 20, n_magasins).astype('int32')
+    })
+    dates = pd.date_range('2023-01-01', periods=n_jours, freq='D').strftime('%Y-%m-%d')
+    df_ventes = pd.DataFrame({
+        'Date': dates[rng.integers(0, n_jours, n_ventes)],
+        'ID Référence produit': df_produits['ID Référence produit'].to_numpy()[rng.integers(0, n_produits, n_ventes)],
+        'Quantité': rng.integers(1, 10, n_ventes).astype('int32'),
+        'ID Magasin': rng.integers(1, n_magasins + 1, n_ventes).astype('int32')
+    })
+    return df_ventes, df_produits, df_magasins
+
+def timed(func, *args, **kwargs):
+    """Exécution silencieuse d'une fonction, retourne (résultat, durée en secondes)"""
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def benchmark_load(n_ventes):
+    """Ingestion FAIT_VENTES: DataFrame.to_sql (paramètres par défaut) vs chargement en masse"""
+    print(f"\n⏱️ Benchmark chargement: {n_ventes:,} ventes")
+    print("=" * 50)
+    
+    frames, _ = timed(transform_data, *synthetic_sources(n_ventes), compact=True)
+    df_faits = frames[3]
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Référence: to_sql sur une connexion par défaut (journal rollback, synchronous FULL)
+        conn = sqlite3.connect(os.path.join(tmp_dir, 'to_sql.db'))
+        create_tables(conn.cursor())
+        # Références résolues en ID_PRODUIT hors mesure (la table de faits ne stocke que la clé entière)
+        frames[1][['ID_REFERENCE_PRODUIT']].to_sql('DIM_PRODUITS', conn, if_exists='append', index=False)
+        conn.commit()
+        id_by_reference = dict(conn.execute("SELECT ID_REFERENCE_PRODUIT, ID_PRODUIT FROM DIM_PRODUITS"))
+        df_to_sql = df_faits.assign(
+            ID_PRODUIT=df_faits['ID_REFERENCE_PRODUIT'].astype(object).map(id_by_reference).astype('int64')
+        ).drop(columns='ID_REFERENCE_PRODUIT')
+        _, duration_to_sql = timed(df_to_sql.to_sql, 'FAIT_VENTES', conn, if_exists='append', index=False)
+        conn.commit()
+        conn.close()
+        
+        # Chargement en masse (dimensions comprises, delta calculé)
+        inserted, duration_bulk = timed(load_data_conditionally, *frames, db_path=os.path.join(tmp_dir, 'bulk.db'))
+    
+    if inserted is None or inserted['FAIT_VENTES'] != n_ventes:
+        print("❌ Le chargement en masse a échoué")
+        return None
+    
+    print(f"to_sql           : {duration_to_sql:8.2f} s ({n_ventes / duration_to_sql:,.0f} lignes/s)")
+    print(f"chargement masse : {duration_bulk:8.2f} s ({n_ventes / duration_bulk:,.0f} lignes/s)")
+    print(f"accélération     : x{duration_to_sql / duration_bulk:.1f}")
+    return duration_to_sql, duration_bulk
+
+def benchmark_transform(n_ventes, workers_list=None):
+    """Transformation série vs partitionnée sur un pool de processus"""
+    print(f"\n⏱️ Benchmark transformation: {n_ventes:,} ventes")
+    print("=" * 50)
+    
+    sources = synthetic_sources(n_ventes)
+    workers_list = workers_list or sorted({2, 4, os.cpu_count() or 1} - {1})
+    
+    reference, duration_serial = timed(transform_data, *sources, compact=True)
+    print(f"série            : {duration_serial:8.2f} s ({n_ventes / duration_serial:,.0f} lignes/s)")
+    
+    durations = {}
+    for workers in workers_list:
+        frames, durations[workers] = timed(transform_data, *sources, compact=True, workers=workers)
+        identical = all(a.equals(b) for a, b in zip(reference, frames))
+        print(f"{workers:2d} processus     : {durations[workers]:8.2f} s "
+              f"(x{duration_serial / durations[workers]:.1f}){'' if identical else ' ❌ résultat différent'}")
+    return duration_serial, durations
+
+def best_of(repeats, func, *args, **kwargs):
+    """Meilleure durée sur plusieurs exécutions (cache chaud)"""
+    return min(timed(func, *args, **kwargs)[1] for _ in range(repeats))
+
+def benchmark_queries(n_ventes, repeats=3):
+    """Requêtes du dashboard et parcours de FAIT_VENTES: backend SQLite vs DuckDB"""
+    print(f"\n⏱️ Benchmark requêtes: {n_ventes:,} ventes")
+    print("=" * 50)
+    
+    if duckdb is None:
+        print("⚠️ duckdb n'est pas installé: benchmark limité au backend SQLite")
+    
+    frames, _ = timed(transform_data, *synthetic_sources(n_ventes), compact=True)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'sales_analysis.db')
+        parquet_dir = os.path.join(tmp_dir, 'parquet')
+        timed(load_data_conditionally, *frames, db_path=db_path)
+        _, duration_export = timed(export_parquet, db_path, parquet_dir)
+        print(f"export Parquet   : {duration_export:8.2f} s")
+        
+        backends = ['sqlite'] + (['duckdb'] if duckdb is not None else [])
+        connections = {backend: connect_backend(backend, db_path, parquet_dir) for backend in backends}
+        print(f"{'requête':28}" + ''.join(f"{backend:>12}" for backend in backends))
+        for name, query in {**ANALYSIS_QUERIES, **FACT_SCAN_QUERIES}.items():
+            results[name] = {
+                backend: best_of(repeats, run_query, conn, query) for backend, conn in connections.items()
+            }
+            print(f"{name:28}" + ''.join(f"{results[name][backend] * 1000:10.1f}ms" for backend in backends))
+        for conn in connections.values():
+            conn.close()
+    return results
+
+if __name__ == "__main__":
+    import sys
+    
+    sizes = [int(arg) for arg in sys.argv[2:]] or [100_000, 1_000_000]
+    option = sys.argv[1].lower() if len(sys.argv) > 1 else "load"
+    
+    if option == "load":
+        for size in sizes:
+            benchmark_load(size)
+    elif option == "transform":
+        for size in sizes:
+            benchmark_transform(size)
+    elif option == "queries":
+        for size in sizes:
+            benchmark_queries(size)
+    else:
+        print("Options disponibles:")
+        print("  python benchmark_etl.py load [tailles...]      - Benchmark du chargement SQLite")
+        print("  python benchmark_etl.py transform [tailles...] - Benchmark de la transformation parallèle")
+        print("  python benchmark_etl.py queries [tailles...]   - Benchmark des backends de requêtes (SQLite, DuckDB)")
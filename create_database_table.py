@@ -1,13 +1,31 @@
 import sqlite3
 
-def create_database_and_tables():
-    """Création de la base de données et des tables vides selon le schéma MCD"""
-    
-    # Connexion à la base de données SQLite
-    conn = sqlite3.connect('/data/sales_analysis.db')
-    cursor = conn.cursor()
-    
-    print("🔧 Création de la base de données et des tables...")
+DB_PATH = '/data/sales_analysis.db'
+
+# Index gérés: nom -> (table, colonnes, unicité)
+# Les index de FAIT_VENTES sont couvrants (mesures incluses): les analyses par date,
+# magasin et produit sont résolues dans l'index sans lire la table de faits
+MANAGED_INDEXES = {
+    'IDX_DIM_TEMPS_DATE': ('DIM_TEMPS', ('DATE_COMPLETE',), True),
+    'IDX_FAIT_VENTES_CLE': ('FAIT_VENTES', ('ID_TEMPS', 'ID_PRODUIT', 'ID_MAGASIN', 'QUANTITE_VENDUE', 'MONTANT_VENTE'), False),
+    'IDX_FAIT_VENTES_MAGASIN': ('FAIT_VENTES', ('ID_MAGASIN', 'QUANTITE_VENDUE', 'MONTANT_VENTE'), False),
+    'IDX_FAIT_VENTES_PRODUIT': ('FAIT_VENTES', ('ID_PRODUIT', 'QUANTITE_VENDUE', 'MONTANT_VENTE'), False)
+}
+
+# Colonnes de FAIT_VENTES et de ses partitions (le produit est référencé par sa clé entière ID_PRODUIT)
+# Montants (PRIX_UNITAIRE, MONTANT_VENTE, MONTANT_TOTAL) stockés en centimes entiers: sommes exactes
+FACT_COLUMNS = 'ID_VENTE, ID_TEMPS, ID_PRODUIT, ID_MAGASIN, QUANTITE_VENDUE, MONTANT_VENTE'
+FACT_VIEW = 'V_FAIT_VENTES'
+
+# Clés d'unicité des agrégats jour x magasin x produit et mois x magasin (cibles des ON CONFLICT du chargement)
+AGG_DAY_KEY = "IFNULL(ID_TEMPS, ''), IFNULL(ID_MAGASIN, ''), ID_PRODUIT"
+AGG_MONTH_KEY = "IFNULL(ANNEE_MOIS, ''), IFNULL(ID_MAGASIN, '')"
+
+# Ligne de ETL_ETAT horodatée à chaque chargement validé: version des données (cache de résultats du dashboard)
+DATA_VERSION_ROW = 'BASE'
+
+def create_tables(cursor):
+    """Création idempotente des tables et des index gérés du schéma MCD"""
     
     # 1. Création de la table DIM_TEMPS
     cursor.execute('''
@@ -22,15 +40,7 @@ def create_database_and_tables():
     ''')
     
     # 2. Création de la table DIM_PRODUITS
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS DIM_PRODUITS (
-            ID_PRODUIT INTEGER PRIMARY KEY AUTOINCREMENT,
-            ID_REFERENCE_PRODUIT VARCHAR(20) UNIQUE NOT NULL,
-            NOM_PRODUIT VARCHAR(100),
-            PRIX_UNITAIRE DECIMAL(10,2),
-            STOCK_DISPONIBLE INTEGER
-        )
-    ''')
+    create_product_table(cursor, 'DIM_PRODUITS')
     
     # 3. Création de la table DIM_MAGASINS
     cursor.execute('''
@@ -43,20 +53,295 @@ def create_database_and_tables():
         )
     ''')
     
+    # Base antérieure à la clé produit entière ou aux centimes: conversion (les dimensions existent)
+    migrate_sales_schema(cursor)
+    
     # 4. Création de la table FAIT_VENTES (table de faits)
+    create_fact_table(cursor, 'FAIT_VENTES')
+    
+    # 5. Suivi des chargements incrémentaux (high-watermark par table)
     cursor.execute('''
-        CREATE TABLE IF NOT EXISTS FAIT_VENTES (
-            ID_VENTE INTEGER PRIMARY KEY AUTOINCREMENT,
+        CREATE TABLE IF NOT EXISTS ETL_ETAT (
+            NOM_TABLE VARCHAR(50) PRIMARY KEY,
+            DATE_MAX_CHARGEE DATE,
+            DERNIER_CHARGEMENT TIMESTAMP
+        )
+    ''')
+    
+    # 6. Historique des exécutions ETL (métriques par run, rapport JSON complet)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ETL_EXECUTIONS (
+            ID_EXECUTION INTEGER PRIMARY KEY AUTOINCREMENT,
+            DEBUT TIMESTAMP NOT NULL,
+            FIN TIMESTAMP,
+            STATUT VARCHAR(20),
+            DUREE_S DECIMAL(10,3),
+            CPU_S DECIMAL(10,3),
+            LIGNES_EXTRAITES INTEGER,
+            LIGNES_CHARGEES INTEGER,
+            OCTETS_LUS INTEGER,
+            RSS_MAX_MO DECIMAL(10,1),
+            RAPPORT TEXT
+        )
+    ''')
+    
+    # 7. Agrégats maintenus incrémentalement par l'ETL (additifs: ventes, quantités, montants)
+    # Ventes sans date ou sans magasin agrégées sous une clé NULL, comme dans FAIT_VENTES: l'unicité porte
+    # sur IFNULL(clé, '') (jamais égal à une clé renseignée) pour que les NULL se regroupent
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS AGG_VENTES_JOUR_MAGASIN_PRODUIT (
             ID_TEMPS INTEGER,
-            ID_REFERENCE_PRODUIT VARCHAR(20) NOT NULL,
+            ID_MAGASIN INTEGER,
+            ID_PRODUIT INTEGER NOT NULL,
+            NB_VENTES INTEGER NOT NULL,
+            QUANTITE_TOTALE INTEGER NOT NULL,
+            MONTANT_TOTAL INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE UNIQUE INDEX IF NOT EXISTS IDX_AGG_VENTES_JOUR_MAGASIN_PRODUIT
+        ON AGG_VENTES_JOUR_MAGASIN_PRODUIT({AGG_DAY_KEY})
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS AGG_VENTES_MOIS_MAGASIN (
+            ANNEE_MOIS VARCHAR(7),
+            ID_MAGASIN INTEGER,
+            NB_VENTES INTEGER NOT NULL,
+            QUANTITE_TOTALE INTEGER NOT NULL,
+            MONTANT_TOTAL INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE UNIQUE INDEX IF NOT EXISTS IDX_AGG_VENTES_MOIS_MAGASIN
+        ON AGG_VENTES_MOIS_MAGASIN({AGG_MONTH_KEY})
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS AGG_VENTES_PRODUIT (
+            ID_PRODUIT INTEGER PRIMARY KEY,
+            NB_VENTES INTEGER NOT NULL,
+            QUANTITE_TOTALE INTEGER NOT NULL,
+            MONTANT_TOTAL INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    
+    # 8. Catalogue des partitions de FAIT_VENTES (stockage partitionné optionnel)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS FAIT_VENTES_PARTITIONS (
+            NOM_PARTITION VARCHAR(30) PRIMARY KEY,
+            DATE_DEBUT DATE NOT NULL,
+            DATE_FIN DATE NOT NULL,
+            LECTURE_SEULE INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    
+    # 9. Catalogue de statistiques des tables, tenu à jour par chaque chargement (lu par le dashboard)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ETL_STATISTIQUES (
+            NOM_TABLE VARCHAR(50) PRIMARY KEY,
+            NB_LIGNES INTEGER NOT NULL,
+            DATE_MIN_VENTE DATE,
+            DATE_MAX_VENTE DATE,
+            NB_MAGASINS INTEGER,
+            NB_PRODUITS INTEGER,
+            DERNIER_CHARGEMENT TIMESTAMP NOT NULL,
+            ID_EXECUTION INTEGER
+        )
+    ''')
+    
+    # 10. Vue unifiée des ventes, à interroger à la place de FAIT_VENTES (qui ne contient plus que les ventes
+    # antérieures au stockage partitionné): étendue aux partitions par chaque chargement partitionné
+    cursor.execute(f"CREATE VIEW IF NOT EXISTS {FACT_VIEW} AS SELECT {FACT_COLUMNS} FROM FAIT_VENTES")
+    
+    # Index gérés (clés naturelles et index couvrants des analyses)
+    sync_indexes(cursor)
+
+def create_product_table(cursor, table_name):
+    """Création de la table des produits (prix unitaire en centimes)"""
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {table_name} (
+            ID_PRODUIT INTEGER PRIMARY KEY AUTOINCREMENT,
+            ID_REFERENCE_PRODUIT VARCHAR(20) UNIQUE NOT NULL,
+            NOM_PRODUIT VARCHAR(100),
+            PRIX_UNITAIRE INTEGER,
+            STOCK_DISPONIBLE INTEGER
+        )
+    ''')
+
+def create_fact_table(cursor, table_name):
+    """Création d'une table de ventes: FAIT_VENTES ou l'une de ses partitions (avec ses propres index)"""
+    # Partitions: ID_VENTE attribué par le chargement, unique sur l'ensemble des partitions
+    id_vente = 'INTEGER PRIMARY KEY AUTOINCREMENT' if table_name == 'FAIT_VENTES' else 'INTEGER PRIMARY KEY'
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {table_name} (
+            ID_VENTE {id_vente},
+            ID_TEMPS INTEGER,
+            ID_PRODUIT INTEGER NOT NULL,
             ID_MAGASIN INTEGER,
             QUANTITE_VENDUE INTEGER,
-            MONTANT_VENTE DECIMAL(10,2),
+            MONTANT_VENTE INTEGER,
             FOREIGN KEY (ID_TEMPS) REFERENCES DIM_TEMPS(ID_TEMPS),
-            FOREIGN KEY (ID_REFERENCE_PRODUIT) REFERENCES DIM_PRODUITS(ID_REFERENCE_PRODUIT),
+            FOREIGN KEY (ID_PRODUIT) REFERENCES DIM_PRODUITS(ID_PRODUIT),
             FOREIGN KEY (ID_MAGASIN) REFERENCES DIM_MAGASINS(ID_MAGASIN)
         )
     ''')
+    if table_name == 'FAIT_VENTES':
+        # Index de FAIT_VENTES: créés et maintenus par sync_indexes
+        return
+    
+    # Partitions: mêmes index que FAIT_VENTES, suffixés par la période (IDX_FAIT_VENTES_CLE_2023_05)
+    suffix = table_name[len('FAIT_VENTES'):]
+    for index_name, (indexed_table, columns, unique) in MANAGED_INDEXES.items():
+        if indexed_table == 'FAIT_VENTES':
+            cursor.execute(
+                f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {index_name}{suffix} "
+                f"ON {table_name}({', '.join(columns)})"
+            )
+
+def column_types(cursor, table_name):
+    """Types déclarés des colonnes d'une table (vide si la table n'existe pas)"""
+    cursor.execute(f"SELECT name, type FROM pragma_table_info('{table_name}')")
+    return dict(cursor.fetchall())
+
+def migrate_sales_schema(cursor):
+    """Mise à niveau d'une base existante: ID_PRODUIT entier dans les ventes, montants en centimes entiers, une date par ligne de DIM_TEMPS"""
+    migrated = False
+    
+    # Prix unitaires en euros (REAL): table reconstruite avec les prix en centimes
+    if column_types(cursor, 'DIM_PRODUITS').get('PRIX_UNITAIRE') != 'INTEGER':
+        create_product_table(cursor, 'DIM_PRODUITS_MIGRATION')
+        cursor.execute("""
+            INSERT INTO DIM_PRODUITS_MIGRATION (ID_PRODUIT, ID_REFERENCE_PRODUIT, NOM_PRODUIT, PRIX_UNITAIRE, STOCK_DISPONIBLE)
+            SELECT ID_PRODUIT, ID_REFERENCE_PRODUIT, NOM_PRODUIT, CAST(ROUND(PRIX_UNITAIRE * 100) AS INTEGER), STOCK_DISPONIBLE
+            FROM DIM_PRODUITS
+        """)
+        cursor.execute("DROP TABLE DIM_PRODUITS")
+        cursor.execute("ALTER TABLE DIM_PRODUITS_MIGRATION RENAME TO DIM_PRODUITS")
+    
+    fact_types = column_types(cursor, 'FAIT_VENTES')
+    product_reference = 'ID_REFERENCE_PRODUIT' in fact_types
+    if fact_types and (product_reference or fact_types['MONTANT_VENTE'] != 'INTEGER'):
+        migrate_fact_tables(cursor, product_reference)
+        migrated = True
+    if fact_types and migrate_calendar(cursor):
+        migrated = True
+    
+    # Agrégats en euros, indexés sur la référence ou sur des dates fusionnées, ou sans clé NULL (ventes
+    # sans date ou sans magasin écartées): supprimés, puis recalculés par le prochain chargement
+    cursor.execute("""
+        SELECT 1 FROM pragma_table_info('AGG_VENTES_JOUR_MAGASIN_PRODUIT') WHERE name = 'ID_TEMPS' AND "notnull"
+    """)
+    if migrated or cursor.fetchone() or column_types(cursor, 'AGG_VENTES_PRODUIT').get('MONTANT_TOTAL', 'INTEGER') != 'INTEGER':
+        for table_name in ('AGG_VENTES_JOUR_MAGASIN_PRODUIT', 'AGG_VENTES_MOIS_MAGASIN', 'AGG_VENTES_PRODUIT'):
+            cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
+
+def migrate_calendar(cursor):
+    """Calendrier de l'ancien chargement (une ligne par vente, dates horodatées): dates ISO et fusion des doublons"""
+    # Dates '2023-05-27 00:00:00' ramenées au format ISO avec lequel le chargement retrouve les jours déjà chargés
+    cursor.execute("SELECT 1 FROM DIM_TEMPS WHERE DATE_COMPLETE <> date(DATE_COMPLETE) LIMIT 1")
+    if cursor.fetchone() is not None:
+        # Les deux formats d'une même date peuvent coexister: index unique recréé par sync_indexes après fusion
+        cursor.execute("DROP INDEX IF EXISTS IDX_DIM_TEMPS_DATE")
+        cursor.execute("UPDATE DIM_TEMPS SET DATE_COMPLETE = date(DATE_COMPLETE) WHERE DATE_COMPLETE <> date(DATE_COMPLETE)")
+    
+    cursor.execute("SELECT 1 FROM DIM_TEMPS GROUP BY DATE_COMPLETE HAVING COUNT(*) > 1 LIMIT 1")
+    if cursor.fetchone() is None:
+        return False
+    
+    # Ligne conservée par date: la plus ancienne; les ventes rattachées à un doublon y sont reportées
+    cursor.execute("CREATE TEMP TABLE STG_DOUBLONS_TEMPS (ID_TEMPS INTEGER PRIMARY KEY, ID_CONSERVE INTEGER NOT NULL)")
+    cursor.execute("""
+        INSERT INTO STG_DOUBLONS_TEMPS (ID_TEMPS, ID_CONSERVE)
+        SELECT t.ID_TEMPS, d.ID_CONSERVE
+        FROM DIM_TEMPS t
+        JOIN (SELECT DATE_COMPLETE, MIN(ID_TEMPS) AS ID_CONSERVE FROM DIM_TEMPS GROUP BY DATE_COMPLETE) d
+        ON d.DATE_COMPLETE = t.DATE_COMPLETE
+        WHERE t.ID_TEMPS <> d.ID_CONSERVE
+    """)
+    cursor.execute("""
+        UPDATE FAIT_VENTES
+        SET ID_TEMPS = (SELECT d.ID_CONSERVE FROM STG_DOUBLONS_TEMPS d WHERE d.ID_TEMPS = FAIT_VENTES.ID_TEMPS)
+        WHERE ID_TEMPS IN (SELECT ID_TEMPS FROM STG_DOUBLONS_TEMPS)
+    """)
+    cursor.execute("DELETE FROM DIM_TEMPS WHERE ID_TEMPS IN (SELECT ID_TEMPS FROM STG_DOUBLONS_TEMPS)")
+    cursor.execute("DROP TABLE STG_DOUBLONS_TEMPS")
+    return True
+
+def migrate_fact_tables(cursor, product_reference):
+    """Reconstruction de FAIT_VENTES et de ses partitions au schéma courant (données, index, triggers, vue)"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'FAIT_VENTES_PARTITIONS'")
+    fact_tables = ['FAIT_VENTES']
+    if cursor.fetchone() is not None:
+        cursor.execute("SELECT NOM_PARTITION FROM FAIT_VENTES_PARTITIONS ORDER BY DATE_DEBUT")
+        fact_tables += [row[0] for row in cursor.fetchall()]
+    
+    if product_reference:
+        # Références vendues absentes du catalogue: inscrites pour qu'aucune vente ne soit perdue
+        cursor.execute(f"""
+            INSERT INTO DIM_PRODUITS (ID_REFERENCE_PRODUIT)
+            SELECT DISTINCT f.ID_REFERENCE_PRODUIT FROM ({' UNION ALL '.join(f"SELECT ID_REFERENCE_PRODUIT FROM {table_name}" for table_name in fact_tables)}) f
+            WHERE NOT EXISTS (SELECT 1 FROM DIM_PRODUITS p WHERE p.ID_REFERENCE_PRODUIT = f.ID_REFERENCE_PRODUIT)
+        """)
+        id_produit, product_join = 'p.ID_PRODUIT', 'JOIN DIM_PRODUITS p ON p.ID_REFERENCE_PRODUIT = f.ID_REFERENCE_PRODUIT'
+    else:
+        id_produit, product_join = 'f.ID_PRODUIT', ''
+    
+    # La vue unifiée référence les anciennes colonnes: recréée après la conversion
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'view' AND name = ?", (FACT_VIEW,))
+    has_view = cursor.fetchone() is not None
+    cursor.execute(f"DROP VIEW IF EXISTS {FACT_VIEW}")
+    for table_name in fact_tables:
+        # Triggers de gel des partitions: supprimés avec la table, recréés à l'identique
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?", (table_name,))
+        triggers = [row[0] for row in cursor.fetchall()]
+        # Montants en euros (DECIMAL) convertis en centimes, déjà en centimes (INTEGER) recopiés tels quels
+        montant = 'f.MONTANT_VENTE' if column_types(cursor, table_name)['MONTANT_VENTE'] == 'INTEGER' else 'CAST(ROUND(f.MONTANT_VENTE * 100) AS INTEGER)'
+        cursor.execute(f"ALTER TABLE {table_name} RENAME TO {table_name}_MIGRATION")
+        # Anciens index libérés: leurs noms sont repris par la nouvelle table
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+            (f"{table_name}_MIGRATION",)
+        )
+        for (index_name,) in cursor.fetchall():
+            cursor.execute(f"DROP INDEX {index_name}")
+        create_fact_table(cursor, table_name)
+        cursor.execute(f"""
+            INSERT INTO {table_name} ({FACT_COLUMNS})
+            SELECT f.ID_VENTE, f.ID_TEMPS, {id_produit}, f.ID_MAGASIN, f.QUANTITE_VENDUE, {montant}
+            FROM {table_name}_MIGRATION f {product_join}
+            ORDER BY f.ID_VENTE
+        """)
+        cursor.execute(f"DROP TABLE {table_name}_MIGRATION")
+        for sql in triggers:
+            cursor.execute(sql)
+    if has_view:
+        cursor.execute(
+            f"CREATE VIEW {FACT_VIEW} AS " + ' UNION ALL '.join(f"SELECT {FACT_COLUMNS} FROM {table_name}" for table_name in fact_tables)
+        )
+
+def sync_indexes(cursor):
+    """Création des index gérés manquants et recréation de ceux dont la définition a changé"""
+    for index_name, (table_name, columns, unique) in MANAGED_INDEXES.items():
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (index_name,))
+        if cursor.fetchone():
+            cursor.execute(f"PRAGMA index_list({table_name})")
+            is_unique = {row[1]: bool(row[2]) for row in cursor.fetchall()}.get(index_name)
+            cursor.execute(f"PRAGMA index_info({index_name})")
+            if tuple(row[2] for row in cursor.fetchall()) == columns and is_unique == unique:
+                continue
+            cursor.execute(f"DROP INDEX {index_name}")
+        cursor.execute(
+            f"CREATE {'UNIQUE ' if unique else ''}INDEX {index_name} ON {table_name}({', '.join(columns)})"
+        )
+
+def create_database_and_tables(db_path=DB_PATH):
+    """Création de la base de données et des tables vides selon le schéma MCD"""
+    
+    # Connexion à la base de données SQLite
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    
+    print("🔧 Création de la base de données et des tables...")
+    create_tables(cursor)
     
     # Validation de la création
     print("✅ Tables créées avec succès!")
@@ -82,7 +367,7 @@ def create_database_and_tables():
     conn.close()
     
     print("\n✅ Base de données créée avec succès!")
-    print("📍 Fichier: /data/sales_analysis.db")
+    print(f"📍 Fichier: {db_path}")
 
 if __name__ == "__main__":
     create_database_and_tables()
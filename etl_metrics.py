@@ -0,0 +1,137 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from create_database_table import create_tables
+
+try:
+    import resource
+except ImportError:
+    # Module Unix uniquement: sans lui, temps CPU du processus seul et pas de pic mémoire
+    resource = None
+
+REPORT_DIR = './data/reports'
+
+# Run en cours: les étapes mesurées y sont ajoutées (aucune collecte hors d'un run)
+_active_run = None
+
+def cpu_time():
+    """Temps CPU consommé par le processus et ses processus fils terminés (secondes)"""
+    if resource is None:
+        return time.process_time()
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+def current_rss_mb():
+    """Mémoire résidente actuelle du processus (Mo), lue dans /proc (Linux uniquement, None ailleurs)"""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+
+def peak_rss_mb():
+    """Pic de mémoire résidente du processus et de ses fils depuis leur démarrage (Mo): valeur cumulative,
+    qui ne redescend jamais"""
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss est en octets sur macOS, en kilo-octets ailleurs
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+def start_run():
+    """Début d'un run ETL instrumenté"""
+    global _active_run
+    _active_run = {
+        'debut': datetime.now().isoformat(),
+        'statut': None,
+        'etapes': []
+    }
+    return _active_run
+
+@contextmanager
+def measure(stage, table=None, rows_in=None):
+    """Mesure d'une étape (ou d'une sous-étape par table): temps, CPU, lignes, octets, mémoire.
+    Mémoire: résidente au début et à la fin de l'étape, et hausse du pic du processus pendant l'étape
+    (0 si l'étape est restée sous un pic atteint avant elle)"""
+    step = {
+        'etape': stage,
+        'table': table,
+        'lignes_entree': rows_in,
+        'lignes_sortie': None,
+        'octets_lus': None
+    }
+    wall_start, cpu_start = time.perf_counter(), cpu_time()
+    rss_start, peak_start = current_rss_mb(), peak_rss_mb()
+    try:
+        yield step
+    finally:
+        step['duree_s'] = round(time.perf_counter() - wall_start, 6)
+        step['cpu_s'] = round(cpu_time() - cpu_start, 6)
+        rows = step['lignes_sortie'] if step['lignes_sortie'] is not None else step['lignes_entree']
+        step['lignes_par_s'] = round(rows / step['duree_s']) if rows and step['duree_s'] > 0 else None
+        peak_end = peak_rss_mb()
+        step['rss_debut_mo'] = round(rss_start, 1) if rss_start is not None else None
+        step['rss_fin_mo'] = round(current_rss_mb(), 1) if rss_start is not None else None
+        step['hausse_pic_rss_mo'] = round(peak_end - peak_start, 1) if peak_end is not None else None
+        if _active_run is not None:
+            _active_run['etapes'].append(step)
+
+def finish_run(status, db_path, report_dir=REPORT_DIR):
+    """Fin du run: rapport JSON et ligne d'historique dans ETL_EXECUTIONS"""
+    global _active_run
+    report, _active_run = _active_run, None
+    if report is None:
+        return None
+    
+    stages = {step['etape']: step for step in report['etapes'] if step['table'] is None}
+    report['statut'] = status
+    report['fin'] = datetime.now().isoformat()
+    report['totaux'] = {
+        'duree_s': round(sum(step['duree_s'] for step in stages.values()), 6),
+        'cpu_s': round(sum(step['cpu_s'] for step in stages.values()), 6),
+        'lignes_extraites': stages.get('extraction', {}).get('lignes_sortie'),
+        'lignes_chargees': stages.get('chargement', {}).get('lignes_sortie'),
+        'octets_lus': sum(step['octets_lus'] or 0 for step in report['etapes'] if step['etape'] == 'extraction' and step['table']),
+        'rss_max_mo': peak_rss_mb()
+    }
+    
+    # Rapport lisible par machine, un fichier par run
+    os.makedirs(report_dir, exist_ok=True)
+    report_path = os.path.join(report_dir, f"etl_run_{datetime.now():%Y%m%d_%H%M%S_%f}.json")
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    
+    # Historique en base pour suivre les régressions d'un run à l'autre
+    totals = report['totaux']
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            cursor = conn.cursor()
+            create_tables(cursor)
+            cursor.execute("""
+                INSERT INTO ETL_EXECUTIONS (DEBUT, FIN, STATUT, DUREE_S, CPU_S, LIGNES_EXTRAITES,
+                                            LIGNES_CHARGEES, OCTETS_LUS, RSS_MAX_MO, RAPPORT)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (report['debut'], report['fin'], status, totals['duree_s'], totals['cpu_s'],
+                  totals['lignes_extraites'], totals['lignes_chargees'], totals['octets_lus'],
+                  totals['rss_max_mo'], json.dumps(report, ensure_ascii=False)))
+            # Statistiques rafraîchies par le chargement de ce run: rattachées à son identifiant
+            cursor.execute(
+                "UPDATE ETL_STATISTIQUES SET ID_EXECUTION = ? WHERE DERNIER_CHARGEMENT >= ?",
+                (cursor.lastrowid, report['debut'])
+            )
+    finally:
+        conn.close()
+    
+    print(f"\n⏱️ Run {status}: {totals['duree_s']:.2f} s, CPU {totals['cpu_s']:.2f} s, rapport: {report_path}")
+    for step in report['etapes']:
+        label = f"{step['etape']}/{step['table']}" if step['table'] else step['etape']
+        rate = f", {step['lignes_par_s']:,} lignes/s" if step['lignes_par_s'] else ""
+        print(f"   - {label}: {step['duree_s']:.3f} s{rate}")
+    return report_path
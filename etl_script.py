@@ -1,212 +1,868 @@
 import pandas as pd
+import numpy as np
 import sqlite3
 import requests
-import io
+import os
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from datetime import datetime
+from create_database_table import AGG_DAY_KEY, AGG_MONTH_KEY, DATA_VERSION_ROW, create_tables
+from etl_metrics import measure, start_run, finish_run
+from maintenance_database import needs_maintenance, maintain_database
+from partitioning import partition_names, ensure_partition, fact_source, refresh_fact_view, next_sale_id, freeze_partitions_before, list_partitions
+from snapshot_cache import SNAPSHOT_DIR, snapshot_key, frame_fingerprint, save_snapshot, load_snapshot
+from table_statistics import DIMENSION_TABLES, stale_tables, refresh_table_statistics, read_table_statistics
 
-def extract_data():
+DB_PATH = './data/sales_analysis.db'
+
+# Cache local des réponses brutes (corps CSV + métadonnées ETag/Last-Modified)
+CACHE_DIR = './data/cache'
+REQUEST_TIMEOUT = 60
+
+# Chargement SQLite: lignes converties par lot (chaque lot est inséré par requêtes INSERT multi-lignes,
+# dimensionnées à la limite de paramètres de SQLite) et PRAGMA appliqués pendant l'ingestion
+LOAD_BATCH_SIZE = 50_000
+LOAD_PRAGMAS = {
+    # Avant journal_mode: n'a d'effet qu'à la création de la base (espace libre récupérable sans VACUUM)
+    'auto_vacuum': 'INCREMENTAL',
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,
+    'temp_store': 'MEMORY'
+}
+# Au-delà de ce nombre de ventes, les index de FAIT_VENTES sont recréés après l'insertion
+LARGE_LOAD_ROWS = 500_000
+
+# Stockage partitionné de FAIT_VENTES: None (table unique), 'month' ou 'year'
+PARTITION_BY = None
+
+# Au-delà de ce nombre de ventes, la transformation est répartie sur tous les cœurs
+PARALLEL_TRANSFORM_ROWS = 1_000_000
+
+# Version de la logique de transformation: à incrémenter pour invalider les snapshots
+TRANSFORM_VERSION = 2
+STAR_SCHEMA_TABLES = ('DIM_TEMPS', 'DIM_PRODUITS', 'DIM_MAGASINS', 'FAIT_VENTES')
+
+# Lecture par blocs: taille des blocs HTTP (octets) et des blocs CSV (lignes). Les blocs CSV ne bornent
+# que les tampons du parseur: la source typée est ensuite réunie, sa taille en mémoire suit celle du fichier
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+CSV_CHUNK_ROWS = 100_000
+
+# Colonnes (et types explicites) réellement utilisées par transform_data.
+# Entiers nullables (Int32): une valeur manquante dans une ligne source est chargée en NULL
+SOURCE_COLUMNS = {
+    'ventes': {
+        'Date': 'str',
+        'ID Référence produit': 'str',
+        'Quantité': 'Int32',
+        'ID Magasin': 'Int32'
+    },
+    'produits': {
+        'ID Référence produit': 'str',
+        'Nom': 'str',
+        'Prix': 'float64',
+        'Stock': 'Int32'
+    },
+    'magasins': {
+        'ID Magasin': 'Int32',
+        'Ville': 'str',
+        'Nombre de salariés': 'Int32'
+    }
+}
+
+# URLs des fichiers de données
+SOURCES = {
+    'ventes': "https://docs.google.com/spreadsheets/d/e/2PACX-1vSawI56WBC64foMT9pKCiY594fBZk9Lyj8_bxfgmq-8ck_jw1Z49qDeMatCWqBxehEVoM6U1zdYx73V/pub?gid=760830694&single=true&output=csv",
+    'produits': "https://docs.google.com/spreadsheets/d/e/2PACX-1vSawI56WBC64foMT9pKCiY594fBZk9Lyj8_bxfgmq-8ck_jw1Z49qDeMatCWqBxehEVoM6U1zdYx73V/pub?gid=0&single=true&output=csv",
+    'magasins': "https://docs.google.com/spreadsheets/d/e/2PACX-1vSawI56WBC64foMT9pKCiY594fBZk9Lyj8_bxfgmq-8ck_jw1Z49qDeMatCWqBxehEVoM6U1zdYx73V/pub?gid=714623615&single=true&output=csv"
+}
+
+# DataFrames déjà parsés, indexés par (source, hash du contenu)
+_parsed_frames = {}
+
+def fetch_source(session, name, url, cache_dir=CACHE_DIR):
+    """Téléchargement conditionnel d'une source (ETag/Last-Modified) avec cache local"""
+    os.makedirs(cache_dir, exist_ok=True)
+    body_path = os.path.join(cache_dir, f"{name}.csv")
+    meta_path = os.path.join(cache_dir, f"{name}.json")
+    
+    meta = {}
+    if os.path.exists(meta_path) and os.path.exists(body_path):
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+    
+    headers = {}
+    if meta.get('etag'):
+        headers['If-None-Match'] = meta['etag']
+    if meta.get('last_modified'):
+        headers['If-Modified-Since'] = meta['last_modified']
+    
+    with session.get(url, headers=headers, timeout=REQUEST_TIMEOUT, stream=True) as response:
+        if response.status_code == 304:
+            return body_path, meta['sha256'], False
+        response.raise_for_status()
+        
+        # Le corps est écrit par blocs sur disque: jamais chargé entièrement en mémoire
+        digest = hashlib.sha256()
+        with open(body_path + '.tmp', 'wb') as f:
+            for block in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                digest.update(block)
+                f.write(block)
+    
+    sha256 = digest.hexdigest()
+    changed = sha256 != meta.get('sha256')
+    
+    # Remplacement atomique du corps puis des métadonnées
+    if changed:
+        os.replace(body_path + '.tmp', body_path)
+    else:
+        os.remove(body_path + '.tmp')
+    meta = {
+        'url': url,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'sha256': sha256,
+        'fetched_at': datetime.now().isoformat()
+    }
+    with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(meta_path + '.tmp', meta_path)
+    
+    return body_path, sha256, changed
+
+def iter_source_chunks(name, body_path, chunk_rows=CSV_CHUNK_ROWS):
+    """Lecture par blocs d'une source CSV, limitée aux colonnes utiles et typée (blocs réunis par parse_source)"""
+    columns = SOURCE_COLUMNS[name]
+    return pd.read_csv(
+        body_path,
+        encoding='utf-8',
+        usecols=list(columns),
+        dtype=columns,
+        chunksize=chunk_rows
+    )
+
+def parse_source(name, body_path, sha256, snapshot_dir=SNAPSHOT_DIR):
+    """Lecture d'une source en cache, sans re-parsing si son contenu est inchangé"""
+    key = (name, sha256)
+    if key not in _parsed_frames:
+        # Snapshot Arrow d'un run précédent, sinon parsing du CSV puis écriture du snapshot
+        snapshot = snapshot_key('source', name, sha256, SOURCE_COLUMNS[name])
+        frames = load_snapshot(snapshot, [name], snapshot_dir)
+        if frames is None:
+            # Les blocs sont réunis: le découpage borne les tampons du parseur, pas le DataFrame
+            # résultant, qui contient toute la source (colonnes utiles seulement)
+            with iter_source_chunks(name, body_path) as reader:
+                frames = {name: pd.concat(reader, ignore_index=True)}
+            save_snapshot(snapshot, frames, snapshot_dir)
+        _parsed_frames[key] = frames[name]
+        # Un seul DataFrame conservé par source
+        for old_key in [k for k in _parsed_frames if k[0] == name and k != key]:
+            del _parsed_frames[old_key]
+    return _parsed_frames[key]
+
+def extract_data(sources=None, cache_dir=CACHE_DIR):
     """Étape 1: Extraction des données depuis les URLs"""
     print("📥 Étape 1: Extraction des données...")
     
-    # URLs des fichiers de données
-    url_ventes = "https://docs.google.com/spreadsheets/d/e/2PACX-1vSawI56WBC64foMT9pKCiY594fBZk9Lyj8_bxfgmq-8ck_jw1Z49qDeMatCWqBxehEVoM6U1zdYx73V/pub?gid=760830694&single=true&output=csv"
-    url_produits = "https://docs.google.com/spreadsheets/d/e/2PACX-1vSawI56WBC64foMT9pKCiY594fBZk9Lyj8_bxfgmq-8ck_jw1Z49qDeMatCWqBxehEVoM6U1zdYx73V/pub?gid=0&single=true&output=csv"
-    url_magasins = "https://docs.google.com/spreadsheets/d/e/2PACX-1vSawI56WBC64foMT9pKCiY594fBZk9Lyj8_bxfgmq-8ck_jw1Z49qDeMatCWqBxehEVoM6U1zdYx73V/pub?gid=714623615&single=true&output=csv"
+    sources = sources or SOURCES
     
     try:
-        # Extraction des données ventes
-        response_ventes = requests.get(url_ventes)
-        response_ventes.raise_for_status()
-        df_ventes = pd.read_csv(io.StringIO(response_ventes.content.decode('utf-8')))
-        print(f"✅ Données ventes extraites: {len(df_ventes)} lignes")
-        
-        # Extraction des données produits
-        response_produits = requests.get(url_produits)
-        response_produits.raise_for_status()
-        df_produits = pd.read_csv(io.StringIO(response_produits.content.decode('utf-8')))
-        print(f"✅ Données produits extraites: {len(df_produits)} lignes")
-        
-        # Extraction des données magasins
-        response_magasins = requests.get(url_magasins)
-        response_magasins.raise_for_status()
-        df_magasins = pd.read_csv(io.StringIO(response_magasins.content.decode('utf-8')))
-        print(f"✅ Données magasins extraites: {len(df_magasins)} lignes")
-        
-        return df_ventes, df_produits, df_magasins
+        # Téléchargements concurrents sur une session HTTP partagée
+        with measure('extraction', 'telechargement') as step:
+            with requests.Session() as session:
+                adapter = requests.adapters.HTTPAdapter(pool_maxsize=len(sources))
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                with ThreadPoolExecutor(max_workers=len(sources)) as executor:
+                    futures = {
+                        name: executor.submit(fetch_source, session, name, url, cache_dir)
+                        for name, url in sources.items()
+                    }
+                    fetched = {name: future.result() for name, future in futures.items()}
+            step['octets_telecharges'] = sum(os.path.getsize(body_path) for body_path, _, changed in fetched.values() if changed)
+        
+        frames = {}
+        for name in ('ventes', 'produits', 'magasins'):
+            body_path, sha256, changed = fetched[name]
+            with measure('extraction', name) as step:
+                frames[name] = parse_source(name, body_path, sha256, os.path.join(cache_dir, 'snapshots'))
+                step['lignes_sortie'] = len(frames[name])
+                step['octets_lus'] = os.path.getsize(body_path)
+            status = "mises à jour" if changed else "inchangées (cache)"
+            print(f"✅ Données {name} extraites: {len(frames[name])} lignes, {status}")
         
+        return frames['ventes'], frames['produits'], frames['magasins']
+    
     except requests.RequestException as e:
         print(f"❌ Erreur lors de l'extraction: {e}")
         return None, None, None
+    except ValueError as e:
+        # Valeur non numérique dans une colonne typée (les valeurs manquantes sont acceptées)
+        print(f"❌ Données source invalides: {e}")
+        return None, None, None
+
+def build_calendar_dimension(dates, full_range=False):
+    """Construction de DIM_TEMPS: une ligne par jour distinct, attributs calculés une seule fois"""
+    dates = pd.to_datetime(dates).dt.normalize()
+    if full_range:
+        # Calendrier continu entre la première et la dernière date
+        calendar = pd.Series(pd.date_range(dates.min(), dates.max(), freq='D'))
+    else:
+        calendar = pd.Series(dates.dropna().unique()).sort_values(ignore_index=True)
+    
+    return pd.DataFrame({
+        'ID_TEMPS': range(1, len(calendar) + 1),
+        'DATE_COMPLETE': calendar,
+        'JOUR_SEMAINE': calendar.dt.day_name(),
+        'MOIS': calendar.dt.month_name(),
+        'ANNEE': calendar.dt.year,
+        'TRIMESTRE': calendar.dt.quarter
+    })
+
+def int32_dtypes(df, columns):
+    """int32 pour chaque colonne, ou entier nullable Int32 si des valeurs manquent (ligne source incomplète)"""
+    return {column: 'Int32' if df[column].isna().any() else 'int32' for column in columns}
+
+def compact_star_schema(df_dates, df_produits, df_magasins, df_faits):
+    """Réduction des types: catégories pour les libellés, int32 pour les identifiants et quantités"""
+    df_dates = df_dates.astype({
+        'ID_TEMPS': 'int32',
+        'JOUR_SEMAINE': 'category',
+        'MOIS': 'category',
+        'ANNEE': 'int32',
+        'TRIMESTRE': 'int32'
+    })
+    df_produits = df_produits.astype(int32_dtypes(df_produits, ['STOCK_DISPONIBLE']))
+    df_magasins = df_magasins.astype({
+        **int32_dtypes(df_magasins, ['ID_MAGASIN', 'NOMBRE_SALARIES']),
+        'VILLE': 'category',
+        'REGION': 'category',
+        'TAILLE_MAGASIN': pd.CategoricalDtype(['Petit', 'Moyen', 'Grand'])
+    })
+    
+    # Les références des ventes partagent les catégories de DIM_PRODUITS
+    # (les montants restent en centimes int64); référence manquante: valeur manquante, pas une catégorie
+    references = pd.CategoricalDtype(
+        pd.Index(df_produits['ID_REFERENCE_PRODUIT']).dropna().union(df_faits['ID_REFERENCE_PRODUIT'].dropna().unique())
+    )
+    df_faits = df_faits.astype({
+        **int32_dtypes(df_faits, ['ID_TEMPS', 'ID_MAGASIN', 'QUANTITE_VENDUE']),
+        'ID_REFERENCE_PRODUIT': references
+    })
+    return df_dates, df_produits, df_magasins, df_faits
 
-def transform_data(df_ventes, df_produits, df_magasins):
+def frame_memory_usage(frames):
+    """Empreinte mémoire (octets) de chaque DataFrame, chaînes comprises"""
+    return {name: int(df.memory_usage(deep=True).sum()) for name, df in frames.items()}
+
+def to_cents(amounts):
+    """Montants en euros -> centimes entiers (arrondi au centime; float64 conservé si un montant manque)"""
+    cents = np.rint(np.asarray(amounts, dtype='float64') * 100)
+    return cents if np.isnan(cents).any() else cents.astype('int64')
+
+def transform_sales_partition(df_partition, prix_produits):
+    """Calculs coûteux d'une partition de ventes: dates normalisées et montants (centimes)"""
+    dates = pd.to_datetime(df_partition['Date']).dt.normalize().to_numpy()
+    # Prix en centimes entiers x quantité: produit exact (NaN si le produit n'a pas de prix)
+    montants = df_partition['ID Référence produit'].map(prix_produits).to_numpy() * df_partition['Quantité'].to_numpy()
+    return dates, montants
+
+def transform_sales_parallel(df_ventes, prix_produits, workers):
+    """Calcul des dates et montants par partition (magasin) dans un pool de processus"""
+    partitions = df_ventes.groupby('ID Magasin', sort=False, dropna=False).indices
+    # Colonnes utiles extraites une seule fois: chaque partition n'en copie que ses lignes
+    subset = df_ventes[['Date', 'ID Référence produit', 'Quantité']]
+    
+    dates = None
+    montants = np.empty(len(df_ventes), dtype='float64')
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(transform_sales_partition, subset.take(positions), prix_produits): positions
+            for positions in partitions.values()
+        }
+        # Chaque résultat est replacé à ses positions d'origine: même ordre que le chemin série
+        for future, positions in futures.items():
+            partition_dates, partition_montants = future.result()
+            if dates is None:
+                dates = np.empty(len(df_ventes), dtype=partition_dates.dtype)
+            dates[positions] = partition_dates
+            montants[positions] = partition_montants
+    # Centimes entiers exacts en float64 pendant l'assemblage: int64 si aucun montant ne manque
+    return dates, montants if np.isnan(montants).any() else montants.astype('int64')
+
+def transform_data(df_ventes, df_produits, df_magasins, compact=False, workers=None):
     """Étape 2: Transformation des données selon le schéma MCD"""
     print("\n🔄 Étape 2: Transformation des données...")
     
+    # Dates et montants des ventes: en série ou partitionnés par magasin sur plusieurs processus
+    with measure('transformation', 'ventes', rows_in=len(df_ventes)) as step:
+        prix_produits = dict(zip(df_produits['ID Référence produit'], to_cents(df_produits['Prix'])))
+        if workers and workers > 1 and len(df_ventes) > 0:
+            print(f"⚙️ Calcul des ventes sur {workers} processus...")
+            dates_array, montants = transform_sales_parallel(df_ventes, prix_produits, workers)
+        else:
+            dates_array, montants = transform_sales_partition(df_ventes, prix_produits)
+        step['lignes_sortie'] = len(montants)
+    
     # Transformation des données temporelles (DIM_TEMPS)
     print("📅 Transformation des données temporelles...")
-    df_ventes['Date'] = pd.to_datetime(df_ventes['Date'])
-    
-    df_dates = pd.DataFrame({
-        'DATE_COMPLETE': df_ventes['Date'],
-        'JOUR_SEMAINE': pd.to_datetime(df_ventes['Date']).dt.day_name(),
-        'MOIS': pd.to_datetime(df_ventes['Date']).dt.month_name(),
-        'ANNEE': pd.to_datetime(df_ventes['Date']).dt.year,
-        'TRIMESTRE': pd.to_datetime(df_ventes['Date']).dt.quarter
-    })
+    with measure('transformation', 'DIM_TEMPS', rows_in=len(dates_array)) as step:
+        dates_ventes = pd.Series(dates_array)
+        df_dates = build_calendar_dimension(dates_ventes)
+        step['lignes_sortie'] = len(df_dates)
     
     # Transformation des données produits (DIM_PRODUITS)
     print("📦 Transformation des données produits...")
-    df_produits_transformed = df_produits.rename(columns={
-        'ID Référence produit': 'ID_REFERENCE_PRODUIT',
-        'Nom': 'NOM_PRODUIT',
-        'Prix': 'PRIX_UNITAIRE',
-        'Stock': 'STOCK_DISPONIBLE'
-    })
+    with measure('transformation', 'DIM_PRODUITS', rows_in=len(df_produits)) as step:
+        df_produits_transformed = df_produits.rename(columns={
+            'ID Référence produit': 'ID_REFERENCE_PRODUIT',
+            'Nom': 'NOM_PRODUIT',
+            'Prix': 'PRIX_UNITAIRE',
+            'Stock': 'STOCK_DISPONIBLE'
+        })
+        df_produits_transformed['PRIX_UNITAIRE'] = to_cents(df_produits_transformed['PRIX_UNITAIRE'])
+        step['lignes_sortie'] = len(df_produits_transformed)
     
     # Transformation des données magasins (DIM_MAGASINS)
     print("🏪 Transformation des données magasins...")
-    df_magasins_transformed = df_magasins.rename(columns={
-        'ID Magasin': 'ID_MAGASIN',
-        'Ville': 'VILLE',
-        'Nombre de salariés': 'NOMBRE_SALARIES'
-    })
-    
-    # Ajout des colonnes calculées pour les magasins
-    region_mapping = {
-        'Paris': 'Île-de-France',
-        'Marseille': 'Provence-Alpes-Côte d\'Azur',
-        'Lyon': 'Auvergne-Rhône-Alpes',
-        'Bordeaux': 'Nouvelle-Aquitaine',
-        'Lille': 'Hauts-de-France',
-        'Nantes': 'Pays de la Loire',
-        'Strasbourg': 'Grand Est'
-    }
-    
-    df_magasins_transformed['REGION'] = df_magasins_transformed['VILLE'].map(region_mapping)
-    df_magasins_transformed['TAILLE_MAGASIN'] = df_magasins_transformed['NOMBRE_SALARIES'].apply(
-        lambda x: 'Petit' if x < 5 else 'Moyen' if x <= 10 else 'Grand'
-    )
+    with measure('transformation', 'DIM_MAGASINS', rows_in=len(df_magasins)) as step:
+        df_magasins_transformed = df_magasins.rename(columns={
+            'ID Magasin': 'ID_MAGASIN',
+            'Ville': 'VILLE',
+            'Nombre de salariés': 'NOMBRE_SALARIES'
+        })
+        
+        # Ajout des colonnes calculées pour les magasins
+        region_mapping = {
+            'Paris': 'Île-de-France',
+            'Marseille': 'Provence-Alpes-Côte d\'Azur',
+            'Lyon': 'Auvergne-Rhône-Alpes',
+            'Bordeaux': 'Nouvelle-Aquitaine',
+            'Lille': 'Hauts-de-France',
+            'Nantes': 'Pays de la Loire',
+            'Strasbourg': 'Grand Est'
+        }
+        
+        df_magasins_transformed['REGION'] = df_magasins_transformed['VILLE'].map(region_mapping)
+        
+        # Classement vectorisé par effectif: < 5 Petit, <= 10 Moyen, sinon Grand (effectif manquant: Grand)
+        salaries = df_magasins_transformed['NOMBRE_SALARIES'].astype('float64').to_numpy()
+        df_magasins_transformed['TAILLE_MAGASIN'] = np.select(
+            [salaries < 5, salaries <= 10], ['Petit', 'Moyen'], default='Grand'
+        )
+        step['lignes_sortie'] = len(df_magasins_transformed)
     
     # Transformation des données de ventes (FAIT_VENTES)
     print("💰 Transformation des données de ventes...")
+    with measure('transformation', 'FAIT_VENTES', rows_in=len(df_ventes)) as step:
+        # Jointure vectorisée date -> ID_TEMPS (l'ordre des ventes est conservé)
+        id_temps = dates_ventes.to_frame('DATE_COMPLETE').merge(
+            df_dates[['DATE_COMPLETE', 'ID_TEMPS']], on='DATE_COMPLETE', how='left'
+        )['ID_TEMPS'].to_numpy()
+        
+        # Création de la table de faits à partir des seules colonnes utiles (pas de copie complète)
+        df_faits_final = pd.DataFrame({
+            'ID_TEMPS': id_temps,
+            'ID_REFERENCE_PRODUIT': df_ventes['ID Référence produit'].to_numpy(),
+            'ID_MAGASIN': df_ventes['ID Magasin'].to_numpy(),
+            'QUANTITE_VENDUE': df_ventes['Quantité'].to_numpy(),
+            'MONTANT_VENTE': montants
+        })
+        step['lignes_sortie'] = len(df_faits_final)
     
-    # Création du mapping date vers ID_TEMPS
-    date_to_id = dict(zip(df_dates['DATE_COMPLETE'], range(1, len(df_dates) + 1)))
+    frames = (df_dates, df_produits_transformed, df_magasins_transformed, df_faits_final)
+    if compact:
+        print("🗜️ Réduction des types de données...")
+        with measure('transformation', 'compaction', rows_in=sum(len(df) for df in frames)):
+            frames = compact_star_schema(*frames)
     
- 
+    # Empreinte mémoire par table
+    usage = frame_memory_usage(dict(zip(STAR_SCHEMA_TABLES, frames)))
+    for table_name, size in usage.items():
+        print(f"   - {table_name}: {size / 1024:,.1f} Ko en mémoire")
     
-    # Création de la table de faits
-    df_faits = df_ventes.copy()
-    df_faits['ID_TEMPS'] = df_faits['Date'].map(date_to_id)
-    df_faits['ID_MAGASIN'] = df_faits['ID Magasin']
-    df_faits['QUANTITE_VENDUE'] = df_faits['Quantité']
-    df_faits['ID_REFERENCE_PRODUIT'] = df_faits['ID Référence produit']
+    print("✅ Transformation terminée!")
+    return frames
+
+def transform_data_cached(df_ventes, df_produits, df_magasins, compact=False, workers=None, snapshot_dir=SNAPSHOT_DIR):
+    """Transformation avec snapshot Arrow: des entrées identiques ne sont transformées qu'une fois"""
+    key = snapshot_key(
+        'transform', TRANSFORM_VERSION, compact,
+        frame_fingerprint(df_ventes), frame_fingerprint(df_produits), frame_fingerprint(df_magasins)
+    )
+    frames = load_snapshot(key, STAR_SCHEMA_TABLES, snapshot_dir)
+    if frames is not None:
+        print("\n♻️ Étape 2: Transformation reprise d'un snapshot (entrées inchangées)")
+        return tuple(frames[table_name] for table_name in STAR_SCHEMA_TABLES)
     
-    # Calcul du montant de vente
-    prix_produits = dict(zip(df_produits_transformed['ID_REFERENCE_PRODUIT'], df_produits_transformed['PRIX_UNITAIRE']))
-    df_faits['MONTANT_VENTE'] = df_faits['ID Référence produit'].map(prix_produits) * df_faits['QUANTITE_VENDUE']
+    frames = transform_data(df_ventes, df_produits, df_magasins, compact=compact, workers=workers)
+    save_snapshot(key, dict(zip(STAR_SCHEMA_TABLES, frames)), snapshot_dir)
+    return frames
+
+def column_values(column):
+    """Scalaires Python natifs d'une colonne; valeurs manquantes des entiers nullables (Int32) -> None (NULL)"""
+    values = column.tolist()
+    if column.dtype.kind in 'iu' and column.hasnans:
+        return [None if value is pd.NA else value for value in values]
+    return values
+
+def iter_row_batches(df, batch_size=LOAD_BATCH_SIZE):
+    """Lots de tuples pré-construits à partir des colonnes (scalaires Python natifs)"""
+    for start in range(0, len(df), batch_size):
+        chunk = df.iloc[start:start + batch_size]
+        yield list(zip(*(column_values(chunk[column]) for column in chunk.columns)))
+
+def bulk_insert(cursor, table_name, df, batch_size=LOAD_BATCH_SIZE):
+    """Insertion en masse par requêtes INSERT multi-lignes, lot par lot, dans la transaction courante"""
+    columns = ', '.join(df.columns)
+    row_placeholder = f"({', '.join('?' for _ in df.columns)})"
+    # Autant de lignes par requête que le permet la limite de paramètres SQLite
+    rows_per_statement = max(1, cursor.connection.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER) // len(df.columns))
+    full_query = f"INSERT INTO {table_name} ({columns}) VALUES {', '.join([row_placeholder] * rows_per_statement)}"
     
-    # Sélection des colonnes finales pour FAIT_VENTES
-    df_faits_final = df_faits[['ID_TEMPS', 'ID_REFERENCE_PRODUIT', 'ID_MAGASIN', 'QUANTITE_VENDUE', 'MONTANT_VENTE']]
+    for batch in iter_row_batches(df, batch_size):
+        for start in range(0, len(batch), rows_per_statement):
+            rows = batch[start:start + rows_per_statement]
+            query = full_query if len(rows) == rows_per_statement else (
+                f"INSERT INTO {table_name} ({columns}) VALUES {', '.join([row_placeholder] * len(rows))}"
+            )
+            cursor.execute(query, [value for row in rows for value in row])
+
+def connect_for_load(db_path=DB_PATH, pragmas=LOAD_PRAGMAS):
+    """Connexion en mode transaction explicite avec les PRAGMA de chargement"""
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+def drop_indexes(cursor, table_name):
+    """Suppression des index secondaires d'une table (retourne leur DDL pour les recréer)"""
+    cursor.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+        (table_name,)
+    )
+    indexes = cursor.fetchall()
+    for name, _ in indexes:
+        cursor.execute(f"DROP INDEX {name}")
+    return [sql for _, sql in indexes]
+
+def stage_frame(cursor, table_name, df, key_columns=None, batch_size=LOAD_BATCH_SIZE):
+    """Chargement d'un DataFrame dans une table temporaire de staging (indexée sur sa clé)"""
+    cursor.execute(f"DROP TABLE IF EXISTS temp.{table_name}")
+    cursor.execute(f"CREATE TEMP TABLE {table_name} ({', '.join(df.columns)})")
+    bulk_insert(cursor, f"temp.{table_name}", df, batch_size)
+    if key_columns:
+        cursor.execute(f"CREATE INDEX temp.IDX_{table_name} ON {table_name} ({', '.join(key_columns)})")
+
+def find_new_keys(cursor, staging_table, target_table, key_columns):
+    """Clés du staging absentes de la table cible (anti-jointure indexée, sans liste IN (...))"""
+    columns = ', '.join(f"s.{column}" for column in key_columns)
+    condition = ' AND '.join(f"t.{column} = s.{column}" for column in key_columns)
+    cursor.execute(f"""
+        SELECT DISTINCT {columns}
+        FROM temp.{staging_table} s
+        WHERE NOT EXISTS (SELECT 1 FROM {target_table} t WHERE {condition})
+    """)
+    return pd.DataFrame(cursor.fetchall(), columns=key_columns)
+
+def resolve_product_keys(cursor, references, batch_size=LOAD_BATCH_SIZE):
+    """Références produit -> ID_PRODUIT entier (chaque référence distincte résolue une fois, référence manquante -> <NA>)"""
+    codes, uniques = pd.factorize(references)
+    stage_frame(cursor, 'STG_REFERENCES', pd.DataFrame({'ID_REFERENCE_PRODUIT': np.asarray(uniques, dtype=object)}), ['ID_REFERENCE_PRODUIT'], batch_size)
     
-    print("✅ Transformation terminée!")
-    return df_dates, df_produits_transformed, df_magasins_transformed, df_faits_final
+    # Références vendues absentes du catalogue: produit inscrit sans attributs plutôt que vente perdue
+    cursor.execute("""
+        INSERT INTO DIM_PRODUITS (ID_REFERENCE_PRODUIT)
+        SELECT s.ID_REFERENCE_PRODUIT FROM temp.STG_REFERENCES s
+        WHERE NOT EXISTS (SELECT 1 FROM DIM_PRODUITS p WHERE p.ID_REFERENCE_PRODUIT = s.ID_REFERENCE_PRODUIT)
+    """)
+    if cursor.rowcount > 0:
+        print(f"⚠️ {cursor.rowcount} référence(s) vendue(s) absente(s) du catalogue ajoutée(s) à DIM_PRODUITS")
+    
+    cursor.execute("""
+        SELECT s.ID_REFERENCE_PRODUIT, p.ID_PRODUIT
+        FROM temp.STG_REFERENCES s JOIN DIM_PRODUITS p ON p.ID_REFERENCE_PRODUIT = s.ID_REFERENCE_PRODUIT
+    """)
+    id_by_reference = dict(cursor.fetchall())
+    # Code -1 des références manquantes: <NA> (une indexation directe renverrait le dernier produit)
+    return pd.array([id_by_reference[reference] for reference in uniques], dtype='Int64').take(codes, allow_fill=True)
+
+def insert_into_partitions(cursor, df_faits, dates_iso, granularity, batch_size=LOAD_BATCH_SIZE, rebuild_indexes=False):
+    """Routage des ventes vers la partition de leur date (ID_VENTE attribués à la suite des existants)"""
+    names = partition_names(dates_iso, granularity).to_numpy()
+    first_id = next_sale_id(cursor)
+    df_faits = df_faits.assign(ID_VENTE=np.arange(first_id, first_id + len(df_faits)))
+    
+    inserted = {}
+    for partition_name, positions in pd.Series(names).groupby(names).indices.items():
+        # L'historique gelé n'est jamais réécrit: le chargement entier est annulé
+        if ensure_partition(cursor, partition_name, granularity):
+            raise ValueError(f"Partition {partition_name} en lecture seule: {len(positions)} ventes rejetées")
+        index_sql = drop_indexes(cursor, partition_name) if rebuild_indexes else []
+        bulk_insert(cursor, partition_name, df_faits.iloc[positions], batch_size)
+        for sql in index_sql:
+            cursor.execute(sql)
+        inserted[partition_name] = len(positions)
+    return inserted
 
-def load_data_conditionally(df_dates, df_produits, df_magasins, df_faits):
-    """Étape 3: Ingestion conditionnelle des données"""
-    print("\n💾 Étape 3: Ingestion conditionnelle des données...")
+def aggregate_sales(df_faits):
+    """Pré-agrégation des ventes au grain jour x magasin x produit (date ou magasin manquant: groupe NULL)"""
+    return df_faits.groupby(['ID_TEMPS', 'ID_MAGASIN', 'ID_PRODUIT'], sort=False, dropna=False).agg(
+        NB_VENTES=('QUANTITE_VENDUE', 'size'),
+        QUANTITE_TOTALE=('QUANTITE_VENDUE', 'sum'),
+        MONTANT_TOTAL=('MONTANT_VENTE', 'sum')
+    ).reset_index()
+
+def refresh_aggregates(cursor, staging_table):
+    """Report additif de ventes pré-agrégées (jour x magasin x produit) dans les tables d'agrégats"""
+    cursor.execute(f"""
+        INSERT INTO AGG_VENTES_JOUR_MAGASIN_PRODUIT
+            (ID_TEMPS, ID_MAGASIN, ID_PRODUIT, NB_VENTES, QUANTITE_TOTALE, MONTANT_TOTAL)
+        SELECT ID_TEMPS, ID_MAGASIN, ID_PRODUIT, NB_VENTES, QUANTITE_TOTALE, MONTANT_TOTAL
+        FROM temp.{staging_table} WHERE true
+        ON CONFLICT({AGG_DAY_KEY}) DO UPDATE SET
+            NB_VENTES = NB_VENTES + excluded.NB_VENTES,
+            QUANTITE_TOTALE = QUANTITE_TOTALE + excluded.QUANTITE_TOTALE,
+            MONTANT_TOTAL = MONTANT_TOTAL + excluded.MONTANT_TOTAL
+    """)
+    cursor.execute(f"""
+        INSERT INTO AGG_VENTES_MOIS_MAGASIN (ANNEE_MOIS, ID_MAGASIN, NB_VENTES, QUANTITE_TOTALE, MONTANT_TOTAL)
+        SELECT substr(t.DATE_COMPLETE, 1, 7), s.ID_MAGASIN, SUM(s.NB_VENTES), SUM(s.QUANTITE_TOTALE), SUM(s.MONTANT_TOTAL)
+        FROM temp.{staging_table} s LEFT JOIN DIM_TEMPS t ON t.ID_TEMPS = s.ID_TEMPS
+        GROUP BY substr(t.DATE_COMPLETE, 1, 7), s.ID_MAGASIN
+        ON CONFLICT({AGG_MONTH_KEY}) DO UPDATE SET
+            NB_VENTES = NB_VENTES + excluded.NB_VENTES,
+            QUANTITE_TOTALE = QUANTITE_TOTALE + excluded.QUANTITE_TOTALE,
+            MONTANT_TOTAL = MONTANT_TOTAL + excluded.MONTANT_TOTAL
+    """)
+    cursor.execute(f"""
+        INSERT INTO AGG_VENTES_PRODUIT (ID_PRODUIT, NB_VENTES, QUANTITE_TOTALE, MONTANT_TOTAL)
+        SELECT ID_PRODUIT, SUM(NB_VENTES), SUM(QUANTITE_TOTALE), SUM(MONTANT_TOTAL)
+        FROM temp.{staging_table}
+        GROUP BY ID_PRODUIT
+        ON CONFLICT(ID_PRODUIT) DO UPDATE SET
+            NB_VENTES = NB_VENTES + excluded.NB_VENTES,
+            QUANTITE_TOTALE = QUANTITE_TOTALE + excluded.QUANTITE_TOTALE,
+            MONTANT_TOTAL = MONTANT_TOTAL + excluded.MONTANT_TOTAL
+    """)
+
+def rebuild_aggregates(cursor, source='FAIT_VENTES'):
+    """Recalcul complet des agrégats à partir des ventes (base existante sans agrégats)"""
+    for table_name in ('AGG_VENTES_JOUR_MAGASIN_PRODUIT', 'AGG_VENTES_MOIS_MAGASIN', 'AGG_VENTES_PRODUIT'):
+        cursor.execute(f"DELETE FROM {table_name}")
+    cursor.execute("DROP TABLE IF EXISTS temp.STG_AGG_VENTES")
+    cursor.execute(f"""
+        CREATE TEMP TABLE STG_AGG_VENTES AS
+        SELECT ID_TEMPS, ID_MAGASIN, ID_PRODUIT,
+               COUNT(*) AS NB_VENTES, SUM(QUANTITE_VENDUE) AS QUANTITE_TOTALE, SUM(MONTANT_VENTE) AS MONTANT_TOTAL
+        FROM {source}
+        GROUP BY ID_TEMPS, ID_MAGASIN, ID_PRODUIT
+    """)
+    refresh_aggregates(cursor, 'STG_AGG_VENTES')
+
+def read_high_watermark(db_path=DB_PATH, table_name='FAIT_VENTES'):
+    """Dernière date de vente chargée (None si aucun chargement)"""
+    if not os.path.exists(db_path):
+        return None
+    conn = sqlite3.connect(db_path)
+    try:
+        row = conn.execute(
+            "SELECT DATE_MAX_CHARGEE FROM ETL_ETAT WHERE NOM_TABLE = ?", (table_name,)
+        ).fetchone()
+    except sqlite3.OperationalError:
+        row = None
+    finally:
+        conn.close()
+    return pd.Timestamp(row[0]) if row and row[0] else None
+
+def prune_sales(df_ventes, watermark):
+    """Élagage des ventes antérieures au high-watermark (la date du watermark est conservée)"""
+    if watermark is None:
+        return df_ventes
+    return df_ventes[pd.to_datetime(df_ventes['Date']).dt.normalize() >= watermark].reset_index(drop=True)
+
+def load_data_conditionally(df_dates, df_produits, df_magasins, df_faits, db_path=DB_PATH,
+                            batch_size=LOAD_BATCH_SIZE, rebuild_indexes=None, partition_by=None):
+    """Étape 3: Ingestion incrémentale des données (seul le delta est inséré)"""
+    print("\n💾 Étape 3: Ingestion incrémentale des données...")
     
+    inserted = {}
     try:
-        # Connexion à la base de données
-        conn = sqlite3.connect('./data/sales_analysis.db')
+        # Connexion à la base de données: une seule transaction explicite pour tout le chargement
+        conn = connect_for_load(db_path)
         cursor = conn.cursor()
+        cursor.execute("BEGIN")
+        create_tables(cursor)
+        
+        # Ventes déjà chargées sans agrégats (base antérieure aux tables d'agrégats)
+        cursor.execute(f"""
+            SELECT EXISTS (SELECT 1 FROM {fact_source(cursor)})
+               AND NOT EXISTS (SELECT 1 FROM AGG_VENTES_JOUR_MAGASIN_PRODUIT)
+        """)
+        aggregates_missing = bool(cursor.fetchone()[0])
         
-        # Fonction pour vérifier si des données existent déjà
-        def data_exists(table_name, check_column, check_values):
-            placeholders = ','.join(['?' for _ in check_values])
-            query = f"SELECT COUNT(*) FROM {table_name} WHERE {check_column} IN ({placeholders})"
-            cursor.execute(query, check_values)
-            return cursor.fetchone()[0] > 0
+        # Dates au format ISO: clé naturelle de DIM_TEMPS
+        dates_iso = df_dates['DATE_COMPLETE'].dt.strftime('%Y-%m-%d')
         
-        # Ingestion conditionnelle DIM_TEMPS
+        # Upsert DIM_TEMPS (les ID_TEMPS sont attribués par la base)
         print("📅 Ingestion DIM_TEMPS...")
-        if not data_exists('DIM_TEMPS', 'DATE_COMPLETE', df_dates['DATE_COMPLETE'].dt.strftime('%Y-%m-%d').tolist()):
-            df_dates.to_sql('DIM_TEMPS', conn, if_exists='append', index=False)
-            print(f"✅ {len(df_dates)} nouvelles dates insérées")
-        else:
-            print("ℹ️ Données temporelles déjà présentes")
+        with measure('chargement', 'DIM_TEMPS', rows_in=len(df_dates)) as step:
+            stage_frame(cursor, 'STG_DIM_TEMPS', df_dates.drop(columns='ID_TEMPS').assign(DATE_COMPLETE=dates_iso), ['DATE_COMPLETE'], batch_size)
+            new_dates = find_new_keys(cursor, 'STG_DIM_TEMPS', 'DIM_TEMPS', ['DATE_COMPLETE'])
+            # Anti-jointure plutôt que ON CONFLICT: aucun ID_TEMPS consommé pour les dates existantes
+            cursor.execute("""
+                INSERT INTO DIM_TEMPS (DATE_COMPLETE, JOUR_SEMAINE, MOIS, ANNEE, TRIMESTRE)
+                SELECT s.DATE_COMPLETE, s.JOUR_SEMAINE, s.MOIS, s.ANNEE, s.TRIMESTRE
+                FROM temp.STG_DIM_TEMPS s
+                WHERE NOT EXISTS (SELECT 1 FROM DIM_TEMPS t WHERE t.DATE_COMPLETE = s.DATE_COMPLETE)
+            """)
+            inserted['DIM_TEMPS'] = cursor.rowcount
+            print(f"✅ {inserted['DIM_TEMPS']} nouvelles dates insérées")
+            if len(new_dates) > 0:
+                print(f"   du {new_dates['DATE_COMPLETE'].min()} au {new_dates['DATE_COMPLETE'].max()}")
+            step['lignes_sortie'] = inserted['DIM_TEMPS']
         
-        # Ingestion conditionnelle DIM_PRODUITS
+        # Upsert DIM_PRODUITS (prix et stock mis à jour)
         print("📦 Ingestion DIM_PRODUITS...")
-        if not data_exists('DIM_PRODUITS', 'ID_REFERENCE_PRODUIT', df_produits['ID_REFERENCE_PRODUIT'].tolist()):
-            df_produits.to_sql('DIM_PRODUITS', conn, if_exists='append', index=False)
-            print(f"✅ {len(df_produits)} nouveaux produits insérés")
-        else:
-            print("ℹ️ Données produits déjà présentes")
+        with measure('chargement', 'DIM_PRODUITS', rows_in=len(df_produits)) as step:
+            stage_frame(cursor, 'STG_DIM_PRODUITS', df_produits[['ID_REFERENCE_PRODUIT', 'NOM_PRODUIT', 'PRIX_UNITAIRE', 'STOCK_DISPONIBLE']], ['ID_REFERENCE_PRODUIT'], batch_size)
+            new_produits = find_new_keys(cursor, 'STG_DIM_PRODUITS', 'DIM_PRODUITS', ['ID_REFERENCE_PRODUIT'])
+            cursor.execute("""
+                UPDATE DIM_PRODUITS SET
+                    NOM_PRODUIT = s.NOM_PRODUIT,
+                    PRIX_UNITAIRE = s.PRIX_UNITAIRE,
+                    STOCK_DISPONIBLE = s.STOCK_DISPONIBLE
+                FROM temp.STG_DIM_PRODUITS s
+                WHERE DIM_PRODUITS.ID_REFERENCE_PRODUIT = s.ID_REFERENCE_PRODUIT
+            """)
+            updated = cursor.rowcount
+            cursor.execute("""
+                INSERT INTO DIM_PRODUITS (ID_REFERENCE_PRODUIT, NOM_PRODUIT, PRIX_UNITAIRE, STOCK_DISPONIBLE)
+                SELECT s.ID_REFERENCE_PRODUIT, s.NOM_PRODUIT, s.PRIX_UNITAIRE, s.STOCK_DISPONIBLE
+                FROM temp.STG_DIM_PRODUITS s
+                WHERE NOT EXISTS (SELECT 1 FROM DIM_PRODUITS p WHERE p.ID_REFERENCE_PRODUIT = s.ID_REFERENCE_PRODUIT)
+            """)
+            inserted['DIM_PRODUITS'] = cursor.rowcount + updated
+            print(f"✅ {len(new_produits)} nouveaux produits insérés, {updated} mis à jour")
+            step['lignes_sortie'] = inserted['DIM_PRODUITS']
         
-        # Ingestion conditionnelle DIM_MAGASINS
+        # Upsert DIM_MAGASINS
         print("🏪 Ingestion DIM_MAGASINS...")
-        if not data_exists('DIM_MAGASINS', 'ID_MAGASIN', df_magasins['ID_MAGASIN'].tolist()):
-            df_magasins.to_sql('DIM_MAGASINS', conn, if_exists='append', index=False)
-            print(f"✅ {len(df_magasins)} nouveaux magasins insérés")
-        else:
-            print("ℹ️ Données magasins déjà présentes")
+        with measure('chargement', 'DIM_MAGASINS', rows_in=len(df_magasins)) as step:
+            stage_frame(cursor, 'STG_DIM_MAGASINS', df_magasins[['ID_MAGASIN', 'VILLE', 'NOMBRE_SALARIES', 'REGION', 'TAILLE_MAGASIN']], ['ID_MAGASIN'], batch_size)
+            new_magasins = find_new_keys(cursor, 'STG_DIM_MAGASINS', 'DIM_MAGASINS', ['ID_MAGASIN'])
+            cursor.execute("""
+                INSERT INTO DIM_MAGASINS (ID_MAGASIN, VILLE, NOMBRE_SALARIES, REGION, TAILLE_MAGASIN)
+                SELECT ID_MAGASIN, VILLE, NOMBRE_SALARIES, REGION, TAILLE_MAGASIN
+                FROM temp.STG_DIM_MAGASINS WHERE true
+                ON CONFLICT(ID_MAGASIN) DO UPDATE SET
+                    VILLE = excluded.VILLE,
+                    NOMBRE_SALARIES = excluded.NOMBRE_SALARIES,
+                    REGION = excluded.REGION,
+                    TAILLE_MAGASIN = excluded.TAILLE_MAGASIN
+            """)
+            inserted['DIM_MAGASINS'] = cursor.rowcount
+            print(f"✅ {len(new_magasins)} nouveaux magasins insérés, {inserted['DIM_MAGASINS'] - len(new_magasins)} mis à jour")
+            step['lignes_sortie'] = inserted['DIM_MAGASINS']
         
-        # Ingestion conditionnelle FAIT_VENTES
+        # Ingestion incrémentale FAIT_VENTES
         print("💰 Ingestion FAIT_VENTES...")
-        # Vérification basée sur la combinaison des clés
-        existing_ventes = pd.read_sql("""
-            SELECT ID_TEMPS, ID_REFERENCE_PRODUIT, ID_MAGASIN, COUNT(*) as count 
-            FROM FAIT_VENTES 
-            GROUP BY ID_TEMPS, ID_REFERENCE_PRODUIT, ID_MAGASIN
-        """, conn)
-        
-        if len(existing_ventes) == 0:
-            df_faits.to_sql('FAIT_VENTES', conn, if_exists='append', index=False)
-            print(f"✅ {len(df_faits)} nouvelles ventes insérées")
-        else:
-            print("ℹ️ Données de ventes déjà présentes")
+        with measure('chargement', 'FAIT_VENTES', rows_in=len(df_faits)) as step:
+            # ID_TEMPS attribués par la base aux dates du lot
+            cursor.execute("""
+                SELECT t.DATE_COMPLETE, t.ID_TEMPS
+                FROM DIM_TEMPS t JOIN temp.STG_DIM_TEMPS s ON s.DATE_COMPLETE = t.DATE_COMPLETE
+            """)
+            id_by_date = dict(cursor.fetchall())
+            id_temps = pd.Series(dates_iso.map(id_by_date).to_numpy(), index=df_dates['ID_TEMPS'])
+            
+            # Seule la clé entière du produit est stockée dans la table de faits
+            key_columns = ['ID_TEMPS', 'ID_PRODUIT', 'ID_MAGASIN']
+            df_stg_faits = pd.DataFrame({
+                'ID_TEMPS': id_temps.reindex(df_faits['ID_TEMPS']).to_numpy(),
+                'ID_PRODUIT': resolve_product_keys(cursor, df_faits['ID_REFERENCE_PRODUIT'], batch_size),
+                'ID_MAGASIN': df_faits['ID_MAGASIN'].to_numpy(),
+                'QUANTITE_VENDUE': df_faits['QUANTITE_VENDUE'].to_numpy(),
+                'MONTANT_VENTE': df_faits['MONTANT_VENTE'].to_numpy()
+            })
+            # Vente sans référence produit: aucune clé à stocker (ID_PRODUIT NOT NULL), écartée et signalée
+            missing_product = df_stg_faits['ID_PRODUIT'].isna()
+            if missing_product.any():
+                print(f"⚠️ {missing_product.sum()} vente(s) sans référence produit écartée(s)")
+                df_stg_faits = df_stg_faits[~missing_product]
+            df_stg_faits['ID_PRODUIT'] = df_stg_faits['ID_PRODUIT'].astype('int64')
+            
+            # Ventes déjà chargées pour les seules dates du lot (et leurs seules partitions),
+            # comptées par (date, produit, magasin); ventes sans date comptées à part si le lot en contient
+            undated_sales = ''
+            if df_stg_faits['ID_TEMPS'].isna().any():
+                undated_sales = f"""
+                    UNION ALL
+                    SELECT NULL, ID_PRODUIT, ID_MAGASIN, COUNT(*)
+                    FROM {fact_source(cursor)} WHERE ID_TEMPS IS NULL
+                    GROUP BY ID_PRODUIT, ID_MAGASIN
+                """
+            cursor.execute(f"""
+                SELECT f.ID_TEMPS, f.ID_PRODUIT, f.ID_MAGASIN, COUNT(*) AS NB
+                FROM temp.STG_DIM_TEMPS s
+                JOIN DIM_TEMPS t ON t.DATE_COMPLETE = s.DATE_COMPLETE
+                JOIN {fact_source(cursor, dates_iso.min(), dates_iso.max())} f ON f.ID_TEMPS = t.ID_TEMPS
+                GROUP BY f.ID_TEMPS, f.ID_PRODUIT, f.ID_MAGASIN
+                {undated_sales}
+            """)
+            df_existing = pd.DataFrame(cursor.fetchall(), columns=key_columns + ['NB'])
+            
+            # Les ventes n'ont pas d'identifiant source: chaque vente est numérotée parmi celles
+            # de même clé et seules les occurrences au-delà du nombre déjà chargé sont insérées.
+            # Clés manquantes (NULL) comparées comme une valeur: ni perdues, ni rechargées
+            if len(df_existing) > 0:
+                df_keys = df_stg_faits[key_columns].astype('Int64')
+                occurrence = df_keys.groupby(key_columns, sort=False, dropna=False).cumcount().to_numpy() + 1
+                nb_existing = df_keys.merge(
+                    df_existing.astype({column: 'Int64' for column in key_columns}), on=key_columns, how='left'
+                )['NB'].fillna(0).to_numpy()
+                df_delta = df_stg_faits[occurrence > nb_existing]
+            else:
+                df_delta = df_stg_faits
+            
+            # Gros volumes: les index sont supprimés puis reconstruits en une passe
+            if rebuild_indexes is None:
+                rebuild_indexes = len(df_delta) >= LARGE_LOAD_ROWS
+            if partition_by:
+                date_by_id = {id_temps_db: date for date, id_temps_db in id_by_date.items()}
+                partitions = insert_into_partitions(
+                    cursor, df_delta, df_delta['ID_TEMPS'].map(date_by_id), partition_by, batch_size, rebuild_indexes
+                )
+                refresh_fact_view(cursor)
+            else:
+                index_sql = drop_indexes(cursor, 'FAIT_VENTES') if rebuild_indexes else []
+                bulk_insert(cursor, 'FAIT_VENTES', df_delta, batch_size)
+                for sql in index_sql:
+                    cursor.execute(sql)
+            inserted['FAIT_VENTES'] = len(df_delta)
+            print(f"✅ {inserted['FAIT_VENTES']} nouvelles ventes insérées")
+            if partition_by:
+                print(f"   réparties en {len(partitions)} partition(s): {', '.join(partitions) or '-'}")
+            step['lignes_sortie'] = inserted['FAIT_VENTES']
         
-        # Validation finale
-        print("\n📊 Validation des données:")
-        cursor.execute("SELECT COUNT(*) FROM DIM_TEMPS")
-        print(f"- DIM_TEMPS: {cursor.fetchone()[0]} enregistrements")
+        # Agrégats: seul le delta est reporté (recalcul complet si la base n'en a pas encore)
+        print("🧮 Mise à jour des agrégats...")
+        with measure('chargement', 'AGREGATS', rows_in=len(df_delta)) as step:
+            if aggregates_missing:
+                rebuild_aggregates(cursor, fact_source(cursor))
+            else:
+                stage_frame(cursor, 'STG_AGG_VENTES', aggregate_sales(df_delta), batch_size=batch_size)
+                refresh_aggregates(cursor, 'STG_AGG_VENTES')
+            cursor.execute("SELECT COUNT(*) FROM AGG_VENTES_JOUR_MAGASIN_PRODUIT")
+            step['lignes_sortie'] = cursor.fetchone()[0]
+            print(f"✅ Agrégats à jour: {step['lignes_sortie']} lignes jour x magasin x produit")
+        
+        # Mise à jour du high-watermark
+        if len(df_faits) > 0:
+            cursor.execute("""
+                INSERT INTO ETL_ETAT (NOM_TABLE, DATE_MAX_CHARGEE, DERNIER_CHARGEMENT)
+                VALUES ('FAIT_VENTES', ?, ?)
+                ON CONFLICT(NOM_TABLE) DO UPDATE SET
+                    DATE_MAX_CHARGEE = MAX(COALESCE(DATE_MAX_CHARGEE, ''), excluded.DATE_MAX_CHARGEE),
+                    DERNIER_CHARGEMENT = excluded.DERNIER_CHARGEMENT
+            """, (dates_iso.max(), datetime.now().isoformat()))
+        
+        # Partitions entièrement antérieures au watermark: plus jamais alimentées, gelées
+        if partition_by:
+            cursor.execute("SELECT DATE_MAX_CHARGEE FROM ETL_ETAT WHERE NOM_TABLE = 'FAIT_VENTES'")
+            row = cursor.fetchone()
+            frozen = freeze_partitions_before(cursor, row[0]) if row else []
+            if frozen:
+                print(f"🧊 Partitions passées en lecture seule: {', '.join(frozen)}")
         
-        cursor.execute("SELECT COUNT(*) FROM DIM_PRODUITS")
-        print(f"- DIM_PRODUITS: {cursor.fetchone()[0]} enregistrements")
+        # Catalogue de statistiques: tables alimentées par ce chargement et tables pas encore cataloguées
+        loaded_at = datetime.now().isoformat()
+        with measure('chargement', 'STATISTIQUES') as step:
+            if partition_by:
+                loaded_sales_tables = list(partitions)
+            else:
+                loaded_sales_tables = ['FAIT_VENTES'] if inserted['FAIT_VENTES'] else []
+            tables = stale_tables(cursor, loaded_sales_tables, aggregates_missing or inserted['FAIT_VENTES'] > 0)
+            refresh_table_statistics(cursor, tables, loaded_at)
+            step['lignes_sortie'] = len(tables)
         
-        cursor.execute("SELECT COUNT(*) FROM DIM_MAGASINS")
-        print(f"- DIM_MAGASINS: {cursor.fetchone()[0]} enregistrements")
+        # Validation finale, lue dans le catalogue (aucun parcours des tables)
+        print("\n📊 Validation des données:")
+        stats = read_table_statistics(conn)
+        for table_name in DIMENSION_TABLES:
+            print(f"- {table_name}: {stats[table_name]['NB_LIGNES']} enregistrements")
+        sales_rows = sum(stats[table_name]['NB_LIGNES'] for table_name in ['FAIT_VENTES'] + list_partitions(cursor))
+        print(f"- FAIT_VENTES: {sales_rows} enregistrements")
         
-        cursor.execute("SELECT COUNT(*) FROM FAIT_VENTES")
-        print(f"- FAIT_VENTES: {cursor.fetchone()[0]} enregistrements")
+        # Nouvelle version des données, visible des lecteurs avec le reste du chargement (au COMMIT)
+        cursor.execute("""
+            INSERT INTO ETL_ETAT (NOM_TABLE, DERNIER_CHARGEMENT) VALUES (?, ?)
+            ON CONFLICT(NOM_TABLE) DO UPDATE SET DERNIER_CHARGEMENT = excluded.DERNIER_CHARGEMENT
+        """, (DATA_VERSION_ROW, loaded_at))
         
-        conn.commit()
+        cursor.execute("COMMIT")
         conn.close()
         print("\n✅ Ingestion terminée avec succès!")
-        
+        return inserted
+    
     except Exception as e:
         print(f"❌ Erreur lors de l'ingestion: {e}")
         if 'conn' in locals():
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
             conn.close()
+        return None
 
 def main():
     """Pipeline ETL principal"""
     print("🚀 Démarrage du pipeline ETL...")
+    start_run()
     
     # Étape 1: Extraction
-    df_ventes, df_produits, df_magasins = extract_data()
+    with measure('extraction') as step:
+        df_ventes, df_produits, df_magasins = extract_data()
+        if df_ventes is not None:
+            step['lignes_sortie'] = len(df_ventes) + len(df_produits) + len(df_magasins)
     if df_ventes is None:
         print("❌ Échec de l'extraction. Arrêt du pipeline.")
+        finish_run('echec', DB_PATH)
         return
     
+    # Élagage des ventes déjà chargées lors des runs précédents
+    with measure('elagage', rows_in=len(df_ventes)) as step:
+        watermark = read_high_watermark()
+        if watermark is not None:
+            df_ventes = prune_sales(df_ventes, watermark)
+            print(f"✂️ Ventes antérieures au {watermark:%Y-%m-%d} ignorées: {len(df_ventes)} lignes à traiter")
+        step['lignes_sortie'] = len(df_ventes)
+    
     # Étape 2: Transformation
-    df_dates, df_produits_transformed, df_magasins_transformed, df_faits = transform_data(
-        df_ventes, df_produits, df_magasins
-    )
+    with measure('transformation', rows_in=len(df_ventes)) as step:
+        workers = os.cpu_count() if len(df_ventes) >= PARALLEL_TRANSFORM_ROWS else None
+        df_dates, df_produits_transformed, df_magasins_transformed, df_faits = transform_data_cached(
+            df_ventes, df_produits, df_magasins, compact=True, workers=workers
+        )
+        step['lignes_sortie'] = len(df_faits)
+    
+    # Étape 3: Ingestion incrémentale
+    with measure('chargement', rows_in=len(df_faits)) as step:
+        inserted = load_data_conditionally(
+            df_dates, df_produits_transformed, df_magasins_transformed, df_faits, partition_by=PARTITION_BY
+        )
+        if inserted is not None:
+            step['lignes_sortie'] = sum(inserted.values())
     
-    # Étape 3: Ingestion conditionnelle
-    load_data_conditionally(df_dates, df_produits_transformed, df_magasins_transformed, df_faits)
+    # Maintenance après un gros chargement: statistiques, checkpoint du WAL, espace libre
+    if inserted is not None and needs_maintenance(DB_PATH, inserted['FAIT_VENTES']):
+        with measure('maintenance'):
+            maintain_database(DB_PATH)
+    
+    # Rapport JSON du run et historique dans ETL_EXECUTIONS
+    finish_run('succes' if inserted is not None else 'echec', DB_PATH)
+    if inserted is None:
+        print("❌ Échec de l'ingestion.")
+        return
     
     print("\n🎉 Pipeline ETL terminé avec succès!")
 
@@ -0,0 +1,123 @@
+import pandas as pd
+from query_backends import run_query
+
+# Tables d'agrégats, de la plus petite à la plus fine, et clés de dimension qu'elles portent
+AGGREGATE_TABLES = (
+    ('AGG_VENTES_PRODUIT', {'ID_PRODUIT'}),
+    ('AGG_VENTES_MOIS_MAGASIN', {'ID_MAGASIN'}),
+    ('AGG_VENTES_JOUR_MAGASIN_PRODUIT', {'ID_TEMPS', 'ID_MAGASIN', 'ID_PRODUIT'})
+)
+
+# Jointure de chaque dimension sur l'agrégat (alias a)
+DIMENSION_JOINS = {
+    'ID_TEMPS': "JOIN DIM_TEMPS dt ON a.ID_TEMPS = dt.ID_TEMPS",
+    'ID_PRODUIT': "JOIN DIM_PRODUITS dp ON a.ID_PRODUIT = dp.ID_PRODUIT",
+    'ID_MAGASIN': "JOIN DIM_MAGASINS dm ON a.ID_MAGASIN = dm.ID_MAGASIN"
+}
+
+# Attributs de regroupement: colonne de dimension et clé qui la relie aux agrégats
+GROUPING_ATTRIBUTES = {
+    'DATE_COMPLETE': ('dt.DATE_COMPLETE', 'ID_TEMPS'),
+    'MOIS': ('dt.MOIS', 'ID_TEMPS'),
+    'ANNEE': ('dt.ANNEE', 'ID_TEMPS'),
+    'TRIMESTRE': ('dt.TRIMESTRE', 'ID_TEMPS'),
+    'NOM_PRODUIT': ('dp.NOM_PRODUIT', 'ID_PRODUIT'),
+    'PRIX_UNITAIRE': ('dp.PRIX_UNITAIRE', 'ID_PRODUIT'),
+    'VILLE': ('dm.VILLE', 'ID_MAGASIN'),
+    'REGION': ('dm.REGION', 'ID_MAGASIN'),
+    'NOMBRE_SALARIES': ('dm.NOMBRE_SALARIES', 'ID_MAGASIN'),
+    'TAILLE_MAGASIN': ('dm.TAILLE_MAGASIN', 'ID_MAGASIN')
+}
+
+# Mesures additives des tables d'agrégats (sommes en centimes entiers), exactes à tout niveau de regroupement
+ADDITIVE_MEASURES = {
+    'nombre_ventes': 'SUM(a.NB_VENTES)',
+    'ca_total': 'SUM(a.MONTANT_TOTAL)',
+    'quantite_totale': 'SUM(a.QUANTITE_TOTALE)'
+}
+
+# Mêmes mesures calculées sur la table de faits, au grain des clés de dimension
+FACT_MEASURES = {
+    'NB_VENTES': 'COUNT(*)',
+    'MONTANT_TOTAL': 'SUM(a.MONTANT_VENTE)',
+    'QUANTITE_TOTALE': 'SUM(a.QUANTITE_VENDUE)'
+}
+
+# Agrégat ad hoc des faits au grain le plus fin demandé, calculé une fois puis regroupé par chaque ensemble
+GRAIN_TABLE = 'GRAIN_REGROUPEMENTS'
+
+def finest_grain(grouping_sets):
+    """Union ordonnée des attributs de tous les regroupements demandés"""
+    attributes = []
+    for grouping in grouping_sets.values():
+        for attribute in grouping:
+            if attribute not in GROUPING_ATTRIBUTES:
+                raise ValueError(f"Attribut de regroupement inconnu: {attribute}")
+            if attribute not in attributes:
+                attributes.append(attribute)
+    return attributes
+
+def dimension_keys(attributes):
+    """Clés de dimension des attributs, dans l'ordre des jointures"""
+    keys = {GROUPING_ATTRIBUTES[attribute][1] for attribute in attributes}
+    return [key for key in DIMENSION_JOINS if key in keys]
+
+def smallest_aggregate(attributes):
+    """Plus petite table d'agrégats portant les clés de dimension des attributs"""
+    keys = set(dimension_keys(attributes))
+    return next(name for name, table_keys in AGGREGATE_TABLES if keys <= table_keys)
+
+def grouping_select(name, grouping, attributes, source):
+    """Un regroupement sur une table d'agrégats (alias a): attributs absents à NULL, panier moyen recalculé"""
+    columns = [f"'{name}' as regroupement"]
+    columns += [
+        f"{GROUPING_ATTRIBUTES[attribute][0]} as {attribute}" if attribute in grouping else f"NULL as {attribute}"
+        for attribute in attributes
+    ]
+    columns += [f"COALESCE({expression}, 0) as {measure}" for measure, expression in ADDITIVE_MEASURES.items()]
+    columns.append(f"{ADDITIVE_MEASURES['ca_total']} * 1.0 / {ADDITIVE_MEASURES['nombre_ventes']} as panier_moyen")
+    
+    select = f"SELECT {', '.join(columns)}\nFROM {source} a"
+    for key in dimension_keys(grouping):
+        select += f"\n{DIMENSION_JOINS[key]}"
+    if grouping:
+        select += f"\nGROUP BY {', '.join(GROUPING_ATTRIBUTES[attribute][0] for attribute in grouping)}"
+    return select
+
+def grouping_sets_sql(grouping_sets, fact_table=None):
+    """Requête unique calculant plusieurs regroupements (équivalent de GROUPING SETS), en un seul résultat.
+    Sur les agrégats, chaque regroupement lit la plus petite table suffisante; sur `fact_table`, les faits
+    sont parcourus une seule fois, agrégés par clés de dimension, puis regroupés par chaque ensemble"""
+    attributes = finest_grain(grouping_sets)
+    query = ""
+    if fact_table is not None:
+        # Agrégat ad hoc matérialisé: un seul parcours des faits, quel que soit le nombre de regroupements
+        keys = dimension_keys(attributes)
+        columns = [f"a.{key}" for key in keys] + [f"{expression} as {measure}" for measure, expression in FACT_MEASURES.items()]
+        grain = f"SELECT {', '.join(columns)} FROM {fact_table} a"
+        if keys:
+            grain += f" GROUP BY {', '.join(f'a.{key}' for key in keys)}"
+        query = f"WITH {GRAIN_TABLE} AS MATERIALIZED ({grain})\n"
+    
+    selects = [
+        grouping_select(name, grouping, attributes, GRAIN_TABLE if fact_table else smallest_aggregate(grouping))
+        for name, grouping in grouping_sets.items()
+    ]
+    return query + "\nUNION ALL\n".join(selects) + "\nORDER BY regroupement, ca_total DESC"
+
+def compute_grouping_sets(conn, grouping_sets, fact_table=None, runner=run_query):
+    """Plusieurs regroupements (nom -> attributs, () pour le total) en une seule requête, séparés ensuite"""
+    df = runner(conn, grouping_sets_sql(grouping_sets, fact_table))
+    
+    # Séparation sur des tuples Python: résultat de quelques lignes, plus rapide que des filtres pandas
+    columns = list(df.columns)
+    measures = list(ADDITIVE_MEASURES) + ['panier_moyen']
+    rows = list(df.itertuples(index=False, name=None))
+    breakdowns = {}
+    for name, grouping in grouping_sets.items():
+        positions = [columns.index(column) for column in list(grouping) + measures]
+        breakdowns[name] = pd.DataFrame.from_records(
+            [tuple(row[position] for position in positions) for row in rows if row[0] == name],
+            columns=list(grouping) + measures
+        )
+    return breakdowns
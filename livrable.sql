@@ -1,24 +1,37 @@
+-- Montants stockés en centimes entiers, convertis en euros dans les résultats
+
 --Chiffre d'affaire total
 SELECT
-SUM(MONTANT_VENTE) AS MONTANT_VENTE_TOTAL
-FROM FAIT_VENTES
+SUM(MONTANT_TOTAL) / 100.0 AS MONTANT_VENTE_TOTAL
+FROM AGG_VENTES_PRODUIT
 
 -- Ventes par produits
 SELECT 
     NOM_PRODUIT,
-    SUM(MONTANT_VENTE) AS MONTANT_VENTE
-FROM FAIT_VENTES 
+    SUM(MONTANT_TOTAL) / 100.0 AS MONTANT_VENTE
+FROM AGG_VENTES_PRODUIT 
 INNER JOIN DIM_PRODUITS 
-USING(ID_REFERENCE_PRODUIT)
+USING(ID_PRODUIT)
 GROUP BY NOM_PRODUIT
 
 -- Ventes par region
 SELECT 
     dm.REGION,
-    COUNT(*) as nombre_ventes,
-    SUM(fv.MONTANT_VENTE) as ca_total,
-    AVG(fv.MONTANT_VENTE) as panier_moyen
-FROM FAIT_VENTES fv
-JOIN DIM_MAGASINS dm ON fv.ID_MAGASIN = dm.ID_MAGASIN
+    SUM(a.NB_VENTES) as nombre_ventes,
+    SUM(a.MONTANT_TOTAL) / 100.0 as ca_total,
+    SUM(a.MONTANT_TOTAL) / 100.0 / SUM(a.NB_VENTES) as panier_moyen
+FROM AGG_VENTES_MOIS_MAGASIN a
+JOIN DIM_MAGASINS dm ON a.ID_MAGASIN = dm.ID_MAGASIN
 GROUP BY dm.REGION
 ORDER BY ca_total DESC
+
+-- Ventes du dernier jour (détail: vue V_FAIT_VENTES, partitions comprises)
+SELECT
+    dp.NOM_PRODUIT,
+    dm.VILLE,
+    v.QUANTITE_VENDUE,
+    v.MONTANT_VENTE / 100.0 AS MONTANT_VENTE
+FROM V_FAIT_VENTES v
+JOIN DIM_PRODUITS dp ON v.ID_PRODUIT = dp.ID_PRODUIT
+JOIN DIM_MAGASINS dm ON v.ID_MAGASIN = dm.ID_MAGASIN
+WHERE v.ID_TEMPS = (SELECT MAX(ID_TEMPS) FROM DIM_TEMPS)
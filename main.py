@@ -1,11 +1,44 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
 import os
+import hashlib
+import threading
+from queries import ANALYSIS_QUERIES, EXAMPLE_QUERIES, MONEY_COLUMNS, OVERVIEW_GROUPING_SETS
+from grouping_sets import compute_grouping_sets
+from query_backends import QUERY_BACKEND, create_pool, pooled_connection, connect_readonly, is_duckdb, list_tables, table_columns
+from query_export import EXPORT_DIR, EXPORT_FORMATS, export_query
+from query_pages import PAGE_SIZE, MAX_ROWS, fetch_page, count_rows
+from query_budget import EXPORT_TIMEOUT_S, query_budget, run_cancellable, check_query, log_violation
+from result_cache import create_cache, cached_query, cache_stats
+from table_statistics import read_table_statistics
+from table_browser import BROWSE_PAGE_SIZE, FILTER_OPERATORS, table_layout, fetch_browse_page
+
+DB_PATH = './data/sales_analysis.db'
+
+# Nombre de filtres proposés par l'explorateur de tables
+BROWSE_FILTERS = 3
+
+# URL des exports (dossier static/exports) et taille maximale servie par le service de fichiers statiques
+EXPORT_URL = 'app/static/exports'
+STATIC_MAX_BYTES = 200 * 1024 ** 2
+
+@st.cache_resource
+def get_connection_pool(db_path, backend):
+    """Pool de connexions en lecture seule, partagé par tous les reruns et toutes les sessions"""
+    return create_pool(db_path, backend)
+
+@st.cache_resource
+def get_result_cache():
+    """Cache des résultats des analyses, partagé par toutes les sessions et persisté sur disque"""
+    return create_cache()
+
+def run_cached(conn, query):
+    """Résultat d'une analyse, réutilisé tant qu'aucun chargement ETL n'a modifié la base"""
+    return cached_query(get_result_cache(), conn, query, DB_PATH)
 
 def connect_to_database():
-    """Connexion à la base de données SQLite"""
-    db_path = './data/sales_analysis.db'
+    """Pool de connexions à la base de données SQLite (backend de requêtes choisi par QUERY_BACKEND)"""
+    db_path = DB_PATH
     
     if not os.path.exists(db_path):
         st.error(f"❌ Base de données non trouvée: {db_path}")
@@ -13,34 +46,45 @@ def connect_to_database():
         return None
     
     try:
-        conn = sqlite3.connect(db_path)
-        return conn
+        return get_connection_pool(db_path, QUERY_BACKEND)
     except Exception as e:
         st.error(f"❌ Erreur de connexion à la base de données: {e}")
         return None
 
+def to_euros(df):
+    """Conversion des colonnes monétaires (centimes entiers) en euros pour l'affichage"""
+    return df.assign(**{column: df[column] / 100 for column in MONEY_COLUMNS if column in df.columns})
+
+def format_euros(cents):
+    """Montant en centimes formaté en euros"""
+    return f"{cents / 100:,.2f} €"
+
 def get_table_info(conn):
     """Récupérer les informations sur les tables"""
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-    tables = cursor.fetchall()
-    
     table_info = {}
-    for table in tables:
-        table_name = table[0]
-        cursor.execute(f"PRAGMA table_info({table_name})")
-        columns = cursor.fetchall()
-        table_info[table_name] = [col[1] for col in columns]
+    for table_name in list_tables(conn):
+        table_info[table_name] = table_columns(conn, table_name)
     
     return table_info
 
-def execute_query(conn, query):
-    """Exécuter une requête SQL et retourner les résultats"""
+def run_budgeted(conn, query, fn, status):
+    """Exécuter fn() sous budget dans un thread de travail, la durée d'attente étant affichée dans `status`"""
+    cancel = threading.Event()
+    def budgeted():
+        with query_budget(conn, query, cancel=cancel):
+            return fn()
+    
+    result = run_cancellable(budgeted, cancel, lambda elapsed: status.text(f"⏳ Exécution en cours ({elapsed:.0f} s)"))
+    status.empty()
+    return result
+
+def execute_query(conn, query, page=0, status=None):
+    """Exécuter une requête SQL sous budget et retourner une page de résultats (page suivante ?, limite atteinte ?)"""
     try:
-        df = pd.read_sql_query(query, conn)
-        return df, None
+        df, has_next, capped = run_budgeted(conn, query, lambda: fetch_page(conn, query, page), status or st.empty())
+        return df, has_next, capped, None
     except Exception as e:
-        return None, str(e)
+        return None, False, False, str(e)
 
 def show_overview(conn):
     """Afficher la vue d'ensemble de la base de données"""
@@ -51,21 +95,64 @@ def show_overview(conn):
     
     col1, col2 = st.columns(2)
     
+    # Catalogue de statistiques tenu à jour par l'ETL: une petite table lue, quelle que soit la taille des tables
+    stats = read_table_statistics(conn)
+    
     with col1:
         st.subheader("📋 Tables disponibles")
         for table_name, columns in table_info.items():
             with st.expander(f"📋 {table_name} ({len(columns)} colonnes)"):
+                show_table_statistics(stats.get(table_name))
                 st.write("**Colonnes:**")
                 for col in columns:
                     st.write(f"- {col}")
     
     with col2:
         st.subheader("📊 Statistiques")
-        cursor = conn.cursor()
         for table_name in table_info.keys():
-            cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-            count = cursor.fetchone()[0]
-            st.metric(f"Enregistrements {table_name}", count)
+            st.metric(f"Enregistrements {table_name}", row_count(conn, stats, table_name))
+
+def row_count(conn, stats, table_name):
+    """Nombre de lignes d'une table: catalogue de l'ETL, sinon COUNT(*) (tables techniques, base non chargée par l'ETL)"""
+    if table_name in stats:
+        return stats[table_name]['NB_LIGNES']
+    return conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+
+def show_table_statistics(table_stats):
+    """Période des ventes, magasins et produits distincts et dernier chargement d'une table cataloguée"""
+    if table_stats is None:
+        return
+    if table_stats['DATE_MIN_VENTE'] is not None:
+        st.write(f"**Ventes** du {table_stats['DATE_MIN_VENTE']} au {table_stats['DATE_MAX_VENTE']}, "
+                 f"{table_stats['NB_MAGASINS']} magasins, {table_stats['NB_PRODUITS']} produits")
+    run = f" (exécution n°{table_stats['ID_EXECUTION']})" if table_stats['ID_EXECUTION'] is not None else ""
+    st.caption(f"Dernier chargement: {str(table_stats['DERNIER_CHARGEMENT'])[:19].replace('T', ' ')}{run}")
+
+def get_table_layout(conn, table_name):
+    """Clé primaire et index d'une table, lus dans le catalogue SQLite (y compris avec le backend DuckDB)"""
+    if not is_duckdb(conn):
+        return table_layout(conn, table_name)
+    sqlite_conn = connect_readonly(DB_PATH)
+    try:
+        return table_layout(sqlite_conn, table_name)
+    finally:
+        sqlite_conn.close()
+
+def show_browse_filters(layout):
+    """Filtres simples (colonne, opérateur, valeur), appliqués dans la requête de chaque page"""
+    filters = []
+    with st.expander("🔎 Filtres"):
+        for i in range(BROWSE_FILTERS):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                column = st.selectbox("Colonne", ['—'] + layout['colonnes'], key=f"filtre_colonne_{i}")
+            with col2:
+                operator = st.selectbox("Opérateur", FILTER_OPERATORS, key=f"filtre_operateur_{i}")
+            with col3:
+                value = st.text_input("Valeur", key=f"filtre_valeur_{i}")
+            if column != '—':
+                filters.append((column, operator, value))
+    return filters
 
 def show_tables(conn):
     """Afficher le contenu des tables"""
@@ -76,104 +163,223 @@ def show_tables(conn):
     
     if selected_table:
         st.subheader(f"📊 Contenu de la table: {selected_table}")
+        layout = get_table_layout(conn, selected_table)
+        
+        # Projection, tri sur un ordre servi par un index et filtres, tous poussés dans la requête
+        columns = st.multiselect("Colonnes affichées:", layout['colonnes'], default=layout['colonnes'])
+        col1, col2 = st.columns(2)
+        with col1:
+            order = st.selectbox("Trier par (colonnes indexées):", list(layout['ordres']))
+        with col2:
+            descending = st.checkbox("Ordre décroissant")
+        filters = show_browse_filters(layout)
+        
+        # Clé de début de chaque page visitée: pages suivantes lues par clé (keyset), sans OFFSET.
+        # Retour à la première page quand la table, l'ordre ou les filtres changent
+        browse_key = (selected_table, order, descending, tuple(filters))
+        state = st.session_state.get('browse')
+        if state is None or state['cle'] != browse_key:
+            state = st.session_state['browse'] = {'cle': browse_key, 'debuts': [None]}
+        
+        try:
+            df, next_key = fetch_browse_page(conn, selected_table, layout, columns, order, descending,
+                                             filters, state['debuts'][-1])
+        except ValueError as e:
+            st.error(f"❌ {e}")
+            return
+        except Exception as e:
+            st.error(f"❌ Erreur lors de la lecture de la table: {e}")
+            return
         
-        # Afficher les premières lignes
-        df = pd.read_sql_query(f"SELECT * FROM {selected_table} LIMIT 100", conn)
+        page = len(state['debuts'])
+        first_row = (page - 1) * BROWSE_PAGE_SIZE + 1
         st.dataframe(df, use_container_width=True)
+        if df.empty:
+            st.caption("Aucune ligne ne correspond aux filtres")
+        else:
+            st.caption(f"Page {page} — lignes {first_row:,} à {first_row + len(df) - 1:,}")
         
-        # Statistiques de la table
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.button("⏮️ Première page", disabled=page == 1, on_click=lambda: state.update(debuts=[None]))
+        with col2:
+            st.button("◀️ Page précédente", disabled=page == 1, on_click=lambda: state['debuts'].pop())
+        with col3:
+            st.button("Page suivante ▶️", disabled=next_key is None,
+                      on_click=lambda: state['debuts'].append(next_key))
+        
+        # Statistiques de la table: nombre de lignes de la table entière, lu dans le catalogue de l'ETL
         st.subheader("📊 Statistiques de la table")
+        stats = read_table_statistics(conn)
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            st.metric("Nombre de lignes", len(df))
+            st.metric("Nombre de lignes", row_count(conn, stats, selected_table))
         
         with col2:
-            st.metric("Nombre de colonnes", len(df.columns))
+            st.metric("Nombre de colonnes", len(layout['colonnes']))
         
         with col3:
             numeric_cols = df.select_dtypes(include=['number']).columns
-            st.metric("Colonnes numériques", len(numeric_cols))
+            st.metric("Colonnes numériques affichées", len(numeric_cols))
+        
+        show_table_statistics(stats.get(selected_table))
 
 def show_sql_queries(conn):
     """Interface pour exécuter des requêtes SQL personnalisées"""
     st.header("🔍 Requêtes SQL personnalisées")
     
-    # Requêtes d'exemple
-    example_queries = {
-        "Sélection simple": "SELECT * FROM DIM_PRODUITS LIMIT 5",
-        "Chiffre d'affaire total": """
-        SELECT
-        SUM(MONTANT_VENTE) AS MONTANT_VENTE_TOTAL
-        FROM FAIT_VENTES
-        """,
-        "Ventes par produits": """
-        SELECT 
-            NOM_PRODUIT,
-            SUM(MONTANT_VENTE) AS MONTANT_VENTE
-        FROM FAIT_VENTES 
-        INNER JOIN DIM_PRODUITS 
-        USING(ID_REFERENCE_PRODUIT)
-        GROUP BY NOM_PRODUIT
-        """,
-        "Ventes par region": """
-        SELECT 
-            dm.REGION,
-            COUNT(*) as nombre_ventes,
-            SUM(fv.MONTANT_VENTE) as ca_total,
-            AVG(fv.MONTANT_VENTE) as panier_moyen
-        FROM FAIT_VENTES fv
-        JOIN DIM_MAGASINS dm ON fv.ID_MAGASIN = dm.ID_MAGASIN
-        GROUP BY dm.REGION
-        ORDER BY ca_total DESC
-        """
-    }
-    
-    # Sélection d'une requête d'exemple
-    selected_example = st.selectbox("Choisir une requête d'exemple:", list(example_queries.keys()))
+    # Sélection d'une requête d'exemple (définies dans queries.py)
+    selected_example = st.selectbox("Choisir une requête d'exemple:", list(EXAMPLE_QUERIES.keys()))
     
     # Zone de texte pour la requête SQL
     query = st.text_area(
         "Votre requête SQL:",
-        value=example_queries[selected_example],
+        value=EXAMPLE_QUERIES[selected_example],
         height=200,
-        help="Écrivez votre requête SQL ici. Utilisez les tables: DIM_TEMPS, DIM_PRODUITS, DIM_MAGASINS, FAIT_VENTES"
+        help="Écrivez votre requête SQL ici. Utilisez les tables: DIM_TEMPS, DIM_PRODUITS, DIM_MAGASINS, "
+             "V_FAIT_VENTES (toutes les ventes) et les agrégats AGG_VENTES_*"
+    )
+    st.caption(
+        "ℹ️ Interrogez les ventes via la vue V_FAIT_VENTES: avec le stockage partitionné, FAIT_VENTES ne contient "
+        "que les ventes antérieures au partitionnement. L'élagage des partitions par date ne s'applique qu'aux "
+        "requêtes internes de l'ETL, pas à cette page."
     )
     
-    # Bouton d'exécution
+    # Bouton d'exécution: la requête est conservée, ses pages sont lues à la demande
     if st.button("🚀 Exécuter la requête", type="primary"):
         if query.strip():
-            with st.spinner("Exécution de la requête..."):
-                df, error = execute_query(conn, query)
-                
-                if error:
-                    st.error(f"❌ Erreur SQL: {error}")
-                else:
-                    if df is not None and len(df) > 0:
-                        st.success(f"✅ Requête exécutée avec succès! ({len(df)} lignes)")
-                        
-                        # Affichage des résultats
-                        st.subheader("📊 Résultats")
-                        st.dataframe(df, use_container_width=True)
-                        
-                        # Statistiques des résultats
-                        st.subheader("📈 Statistiques des résultats")
-                        col1, col2, col3 = st.columns(3)
-                        
-                        with col1:
-                            st.metric("Nombre de lignes", len(df))
-                        
-                        with col2:
-                            st.metric("Nombre de colonnes", len(df.columns))
-                        
-                        with col3:
-                            numeric_cols = df.select_dtypes(include=['number']).columns
-                            if len(numeric_cols) > 0:
-                                st.metric("Colonnes numériques", len(numeric_cols))
-                    else:
-                        st.warning("⚠️ Aucun résultat retourné")
+            st.session_state['sql_page'] = {'query': query, 'page': 0, 'count': None}
         else:
             st.warning("⚠️ Veuillez saisir une requête SQL")
+    
+    if 'sql_page' in st.session_state:
+        show_query_page(conn, st.session_state['sql_page'])
+    
+    show_query_export(conn, query)
+
+def show_query_page(conn, state):
+    """Page courante du résultat (lue avec fetchmany, jamais le résultat complet), navigation et comptage à la demande"""
+    if state.get('annulee'):
+        st.info("⏹️ Requête annulée")
+        return
+    
+    # Plan vérifié une fois par requête, avant exécution: produit cartésien refusé, ou signalé s'il reste petit
+    if 'verification' not in state:
+        try:
+            state['verification'] = (check_query(conn, state['query']), None)
+        except ValueError as e:
+            state['verification'] = ([], str(e))
+    warnings, rejection = state['verification']
+    if rejection:
+        st.error(f"❌ {rejection}")
+        return
+    for warning in warnings:
+        st.warning(f"⚠️ {warning}")
+    
+    # Le clic relance le script pendant l'exécution: la requête en cours est interrompue
+    cancel_button = st.empty()
+    cancel_button.button("⏹️ Annuler la requête", on_click=lambda: state.update(annulee=True))
+    with st.spinner("Exécution de la requête..."):
+        df, has_next, capped, error = execute_query(conn, state['query'], state['page'], st.empty())
+    cancel_button.empty()
+    
+    if error:
+        st.error(f"❌ Erreur SQL: {error}")
+        return
+    if len(df) == 0 and state['page'] == 0:
+        st.warning("⚠️ Aucun résultat retourné")
+        return
+    
+    first_row = state['page'] * PAGE_SIZE + 1
+    st.success(f"✅ Requête exécutée avec succès! (lignes {first_row:,} à {first_row + len(df) - 1:,})")
+    
+    # Affichage des résultats
+    st.subheader("📊 Résultats")
+    st.dataframe(df, use_container_width=True)
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.button("◀ Page précédente", disabled=state['page'] == 0,
+                  on_click=lambda: state.update(page=state['page'] - 1))
+    with col2:
+        st.button("Page suivante ▶", disabled=not has_next,
+                  on_click=lambda: state.update(page=state['page'] + 1))
+    with col3:
+        # Comptage borné, seulement sur demande: il parcourt tout le résultat
+        if state['count'] is None:
+            if st.button("🔢 Compter les lignes"):
+                try:
+                    state['count'] = run_budgeted(conn, state['query'], lambda: count_rows(conn, state['query']), st.empty())
+                except Exception as e:
+                    st.error(f"❌ Comptage impossible: {e}")
+        if state['count'] is not None:
+            count, exact = state['count']
+            st.write(f"**{count:,} lignes**" if exact else f"**Plus de {count:,} lignes**")
+    
+    if capped:
+        # Limite de lignes du budget: journalisée une fois par requête, pas à chaque réaffichage
+        if not state.get('limite_journalisee'):
+            log_violation(state['query'], 'lignes', {'lignes_max': MAX_ROWS})
+            state['limite_journalisee'] = True
+        st.info(f"💡 Seules les {MAX_ROWS:,} premières lignes sont consultables ici: utilisez l'export pour le résultat complet")
+    
+    # Statistiques des résultats
+    st.subheader("📈 Statistiques des résultats")
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.metric("Lignes de la page", len(df))
+    
+    with col2:
+        st.metric("Nombre de colonnes", len(df.columns))
+    
+    with col3:
+        numeric_cols = df.select_dtypes(include=['number']).columns
+        if len(numeric_cols) > 0:
+            st.metric("Colonnes numériques", len(numeric_cols))
+
+def show_query_export(conn, query):
+    """Export du résultat complet de la requête en CSV ou Parquet, écrit par blocs sans le charger en mémoire"""
+    st.subheader("📤 Export du résultat complet")
+    export_fmt = st.radio("Format d'export:", EXPORT_FORMATS, horizontal=True)
+    
+    if st.button("📤 Exporter"):
+        if not query.strip():
+            st.warning("⚠️ Veuillez saisir une requête SQL")
+            return
+        
+        # Un fichier par requête et par format: un nouvel export de la même requête le remplace
+        digest = hashlib.sha1(query.encode('utf-8')).hexdigest()[:12]
+        path = os.path.join(EXPORT_DIR, f"export_{digest}.{export_fmt}")
+        status = st.empty()
+        def progress(rows, nbytes):
+            status.text(f"⏳ {rows:,} lignes exportées ({nbytes / 1024 ** 2:.1f} Mo)")
+        
+        try:
+            for warning in check_query(conn, query):
+                st.warning(f"⚠️ {warning}")
+            # Export du résultat complet: durée plus longue, sans limite d'instructions
+            with query_budget(conn, query, timeout_s=EXPORT_TIMEOUT_S, max_steps=None):
+                st.session_state['export'] = export_query(conn, query, path, progress=progress)
+            st.session_state['export']['chemin'] = path
+        except Exception as e:
+            st.session_state.pop('export', None)
+            st.error(f"❌ Erreur d'export: {e}")
+            return
+        status.empty()
+    
+    export = st.session_state.get('export')
+    if export and os.path.exists(export['chemin']):
+        st.success(f"✅ {export['lignes']:,} lignes exportées ({export['octets'] / 1024 ** 2:.1f} Mo)")
+        # Lien vers le service de fichiers statiques: le fichier n'est jamais chargé en mémoire
+        # (st.download_button en garderait le contenu entier dans le processus du dashboard)
+        file_name = os.path.basename(export['chemin'])
+        if export['octets'] <= STATIC_MAX_BYTES:
+            st.markdown(f'<a href="{EXPORT_URL}/{file_name}" download="{file_name}">💾 Télécharger</a>', unsafe_allow_html=True)
+        else:
+            st.info(f"💡 Fichier de plus de {STATIC_MAX_BYTES // 1024 ** 2} Mo (limite du service de fichiers statiques): "
+                    f"disponible sur le serveur dans {export['chemin']}")
 
 def show_predefined_analyses(conn):
     """Afficher des analyses prédéfinies"""
@@ -205,21 +411,7 @@ def show_ca_by_city(conn):
     """Afficher le CA par ville"""
     st.subheader("💰 Chiffre d'affaires par ville")
     
-    query = """
-    SELECT 
-        dm.VILLE,
-        dm.REGION,
-        COUNT(*) as nombre_ventes,
-        SUM(fv.MONTANT_VENTE) as ca_total,
-        AVG(fv.MONTANT_VENTE) as panier_moyen,
-        SUM(fv.QUANTITE_VENDUE) as quantite_totale
-    FROM FAIT_VENTES fv
-    JOIN DIM_MAGASINS dm ON fv.ID_MAGASIN = dm.ID_MAGASIN
-    GROUP BY dm.VILLE, dm.REGION
-    ORDER BY ca_total DESC
-    """
-    
-    df = pd.read_sql_query(query, conn)
+    df = to_euros(run_cached(conn, ANALYSIS_QUERIES['ca_par_ville']))
     
     col1, col2 = st.columns(2)
     
@@ -233,20 +425,7 @@ def show_top_products(conn):
     """Afficher les top produits"""
     st.subheader("📦 Top produits par CA")
     
-    query = """
-    SELECT 
-        dp.NOM_PRODUIT,
-        dp.PRIX_UNITAIRE,
-        SUM(fv.QUANTITE_VENDUE) as quantite_totale,
-        SUM(fv.MONTANT_VENTE) as ca_total,
-        COUNT(*) as nombre_ventes
-    FROM FAIT_VENTES fv
-    JOIN DIM_PRODUITS dp ON fv.ID_REFERENCE_PRODUIT = dp.ID_REFERENCE_PRODUIT
-    GROUP BY dp.NOM_PRODUIT, dp.PRIX_UNITAIRE
-    ORDER BY ca_total DESC
-    """
-    
-    df = pd.read_sql_query(query, conn)
+    df = to_euros(run_cached(conn, ANALYSIS_QUERIES['top_produits']))
     
     col1, col2 = st.columns(2)
     
@@ -260,21 +439,7 @@ def show_temporal_evolution(conn):
     """Afficher l'évolution temporelle"""
     st.subheader("📅 Évolution des ventes dans le temps")
     
-    query = """
-    SELECT 
-        dt.DATE_COMPLETE,
-        dt.MOIS,
-        dt.ANNEE,
-        SUM(fv.MONTANT_VENTE) as ca_jour,
-        SUM(fv.QUANTITE_VENDUE) as quantite_jour,
-        COUNT(*) as nombre_ventes
-    FROM FAIT_VENTES fv
-    JOIN DIM_TEMPS dt ON fv.ID_TEMPS = dt.ID_TEMPS
-    GROUP BY dt.DATE_COMPLETE, dt.MOIS, dt.ANNEE
-    ORDER BY dt.DATE_COMPLETE
-    """
-    
-    df = pd.read_sql_query(query, conn)
+    df = to_euros(run_cached(conn, ANALYSIS_QUERIES['evolution_temporelle']))
     df['DATE_COMPLETE'] = pd.to_datetime(df['DATE_COMPLETE'])
     
     col1, col2 = st.columns(2)
@@ -289,22 +454,7 @@ def show_store_performance(conn):
     """Afficher la performance des magasins"""
     st.subheader("🏪 Performance des magasins")
     
-    query = """
-    SELECT 
-        dm.VILLE,
-        dm.NOMBRE_SALARIES,
-        dm.TAILLE_MAGASIN,
-        COUNT(*) as nombre_ventes,
-        SUM(fv.MONTANT_VENTE) as ca_total,
-        AVG(fv.MONTANT_VENTE) as panier_moyen,
-        SUM(fv.QUANTITE_VENDUE) as quantite_totale
-    FROM FAIT_VENTES fv
-    JOIN DIM_MAGASINS dm ON fv.ID_MAGASIN = dm.ID_MAGASIN
-    GROUP BY dm.VILLE, dm.NOMBRE_SALARIES, dm.TAILLE_MAGASIN
-    ORDER BY ca_total DESC
-    """
-    
-    df = pd.read_sql_query(query, conn)
+    df = to_euros(run_cached(conn, ANALYSIS_QUERIES['performance_magasins']))
     
     st.dataframe(df, use_container_width=True)
     
@@ -321,31 +471,23 @@ def show_sales_overview(conn):
     """Afficher la vue d'ensemble des ventes"""
     st.subheader("📊 Vue d'ensemble des ventes")
     
-    # KPIs principaux
-    kpi_query = """
-    SELECT 
-        COUNT(*) as total_ventes,
-        SUM(MONTANT_VENTE) as ca_total,
-        AVG(MONTANT_VENTE) as panier_moyen,
-        SUM(QUANTITE_VENDUE) as quantite_totale
-    FROM FAIT_VENTES
-    """
-    
-    kpi_df = pd.read_sql_query(kpi_query, conn)
+    # KPIs, CA par ville et CA par produit: un seul parcours des agrégats
+    breakdowns = compute_grouping_sets(conn, OVERVIEW_GROUPING_SETS, runner=run_cached)
+    kpi = breakdowns['total'].to_dict('records')[0]
     
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("Total ventes", f"{kpi_df['total_ventes'].iloc[0]:,}")
+        st.metric("Total ventes", f"{kpi['nombre_ventes']:,}")
     
     with col2:
-        st.metric("CA total", f"{kpi_df['ca_total'].iloc[0]:,.2f} €")
+        st.metric("CA total", format_euros(kpi['ca_total']))
     
     with col3:
-        st.metric("Panier moyen", f"{kpi_df['panier_moyen'].iloc[0]:.2f} €")
+        st.metric("Panier moyen", format_euros(kpi['panier_moyen']))
     
     with col4:
-        st.metric("Quantité totale", f"{kpi_df['quantite_totale'].iloc[0]:,}")
+        st.metric("Quantité totale", f"{kpi['quantite_totale']:,}")
     
     # Répartition par dimension
     st.subheader("📈 Répartition par dimension")
@@ -354,27 +496,13 @@ def show_sales_overview(conn):
     
     with col1:
         # Par ville
-        city_query = """
-        SELECT dm.VILLE, SUM(fv.MONTANT_VENTE) as ca
-        FROM FAIT_VENTES fv
-        JOIN DIM_MAGASINS dm ON fv.ID_MAGASIN = dm.ID_MAGASIN
-        GROUP BY dm.VILLE
-        ORDER BY ca DESC
-        """
-        city_df = pd.read_sql_query(city_query, conn)
+        city_df = to_euros(breakdowns['ville'][['VILLE', 'ca_total']])
         st.write("**CA par ville:**")
         st.dataframe(city_df)
     
     with col2:
         # Par produit
-        product_query = """
-        SELECT dp.NOM_PRODUIT, SUM(fv.MONTANT_VENTE) as ca
-        FROM FAIT_VENTES fv
-        JOIN DIM_PRODUITS dp ON fv.ID_REFERENCE_PRODUIT = dp.ID_REFERENCE_PRODUIT
-        GROUP BY dp.NOM_PRODUIT
-        ORDER BY ca DESC
-        """
-        product_df = pd.read_sql_query(product_query, conn)
+        product_df = to_euros(breakdowns['produit'][['NOM_PRODUIT', 'ca_total']])
         st.write("**CA par produit:**")
         st.dataframe(product_df)
 
@@ -388,9 +516,9 @@ def main():
     st.title("📊 Dashboard d'Analyse des Ventes - PME Française")
     st.markdown("---")
     
-    # Connexion à la base de données
-    conn = connect_to_database()
-    if conn is None:
+    # Pool de connexions à la base de données
+    pool = connect_to_database()
+    if pool is None:
         st.stop()
     
     # Sidebar pour la navigation
@@ -399,17 +527,28 @@ def main():
         "Choisir une section:",
         ["🏠 Vue d'ensemble", "📋 Tables", "🔍 Requêtes SQL", "📈 Analyses prédéfinies"]
     )
+    st.sidebar.caption(f"⚙️ Moteur de requêtes: {QUERY_BACKEND}")
     
-    if page == "🏠 Vue d'ensemble":
-        show_overview(conn)
-    elif page == "📋 Tables":
-        show_tables(conn)
-    elif page == "🔍 Requêtes SQL":
-        show_sql_queries(conn)
-    elif page == "📈 Analyses prédéfinies":
-        show_predefined_analyses(conn)
-    
-    conn.close()
+    # Connexion empruntée au pool pour ce rerun (vérifiée, rouverte si l'ETL a remplacé la base)
+    try:
+        with pooled_connection(pool) as conn:
+            if page == "🏠 Vue d'ensemble":
+                show_overview(conn)
+            elif page == "📋 Tables":
+                show_tables(conn)
+            elif page == "🔍 Requêtes SQL":
+                show_sql_queries(conn)
+            elif page == "📈 Analyses prédéfinies":
+                show_predefined_analyses(conn)
+    except (FileNotFoundError, TimeoutError) as e:
+        st.error(f"❌ Base de données indisponible: {e}")
+    
+    # Compteurs du cache après le rendu de la page (succès et échecs de ce rerun inclus)
+    stats = cache_stats(get_result_cache())
+    st.sidebar.caption(
+        f"🗃️ Cache des résultats: {stats['succes']} succès ({stats['succes_disque']} disque), "
+        f"{stats['echecs']} échecs, {stats['entrees']} entrées ({stats['octets'] / 1024 ** 2:.1f} Mo)"
+    )
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
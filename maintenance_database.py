@@ -0,0 +1,100 @@
+import os
+import sys
+import time
+import sqlite3
+
+DB_PATH = './data/sales_analysis.db'
+
+# Chargements d'au moins ce nombre de ventes: maintenance déclenchée automatiquement par l'ETL
+MAINTENANCE_MIN_ROWS = 100_000
+
+# Lignes échantillonnées par index pour ANALYZE (statistiques approchées, coût borné): 0 = analyse complète
+ANALYSIS_LIMIT = 1000
+
+AUTO_VACUUM_MODES = {0: 'NONE', 1: 'FULL', 2: 'INCREMENTAL'}
+
+def database_stats(conn, db_path):
+    """Taille du fichier et de son journal WAL, pages libres et mode auto_vacuum"""
+    wal_path = f"{db_path}-wal"
+    return {
+        'taille_fichier': os.path.getsize(db_path),
+        'taille_wal': os.path.getsize(wal_path) if os.path.exists(wal_path) else 0,
+        'pages': conn.execute("PRAGMA page_count").fetchone()[0],
+        'pages_libres': conn.execute("PRAGMA freelist_count").fetchone()[0],
+        'taille_page': conn.execute("PRAGMA page_size").fetchone()[0],
+        'auto_vacuum': AUTO_VACUUM_MODES[conn.execute("PRAGMA auto_vacuum").fetchone()[0]]
+    }
+
+def needs_maintenance(db_path=DB_PATH, rows_loaded=0):
+    """Maintenance utile: gros chargement ou planificateur sans statistiques"""
+    if rows_loaded >= MAINTENANCE_MIN_ROWS:
+        return True
+    if not os.path.exists(db_path):
+        return False
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone() is None
+    finally:
+        conn.close()
+
+def maintain_database(db_path=DB_PATH, vacuum=False, analysis_limit=ANALYSIS_LIMIT):
+    """Maintenance après chargement: statistiques du planificateur, checkpoint du WAL, récupération de l'espace libre"""
+    print(f"\n🧹 Maintenance de la base: {db_path}")
+    
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    steps = {}
+    try:
+        before = database_stats(conn, db_path)
+        
+        # Statistiques du planificateur: ANALYZE échantillonné, puis PRAGMA optimize
+        start = time.perf_counter()
+        conn.execute(f"PRAGMA analysis_limit = {analysis_limit}")
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA optimize")
+        steps['analyze'] = time.perf_counter() - start
+        
+        # Récupération des pages libres: incrémentale si la base le permet, sinon VACUUM complet sur demande
+        start = time.perf_counter()
+        if before['auto_vacuum'] == 'INCREMENTAL':
+            # executescript exécute le PRAGMA jusqu'au bout (execute ne libère qu'une page par pas)
+            conn.executescript("PRAGMA incremental_vacuum;")
+        elif vacuum:
+            # VACUUM complet: une seule fois, la base passe ensuite en auto_vacuum incrémental
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+        steps['vacuum'] = time.perf_counter() - start
+        
+        # Report du WAL dans la base et troncature du journal (busy = lecteurs encore actifs)
+        start = time.perf_counter()
+        busy, _, _ = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        steps['checkpoint'] = time.perf_counter() - start
+        
+        after = database_stats(conn, db_path)
+    finally:
+        conn.close()
+    
+    report = {
+        'avant': before,
+        'apres': after,
+        'durees_s': {step: round(duration, 6) for step, duration in steps.items()},
+        'checkpoint_bloque': bool(busy)
+    }
+    
+    print(f"   - Statistiques (ANALYZE, optimize): {steps['analyze']:.3f} s")
+    print(f"   - Vacuum ({after['auto_vacuum']}): {steps['vacuum']:.3f} s, pages libres {before['pages_libres']} -> {after['pages_libres']}")
+    print(f"   - Checkpoint WAL: {steps['checkpoint']:.3f} s, journal {before['taille_wal'] / 1024 ** 2:.1f} Mo -> {after['taille_wal'] / 1024 ** 2:.1f} Mo")
+    if busy:
+        print("   ⚠️ Checkpoint incomplet: des lecteurs utilisent encore la base")
+    if before['auto_vacuum'] != 'INCREMENTAL' and not vacuum and before['pages_libres'] > 0:
+        print("   💡 Espace libre non récupérable sans VACUUM: python maintenance_database.py --vacuum")
+    print(f"✅ Fichier: {before['taille_fichier'] / 1024 ** 2:.1f} Mo -> {after['taille_fichier'] / 1024 ** 2:.1f} Mo")
+    return report
+
+if __name__ == "__main__":
+    arguments = [argument for argument in sys.argv[1:] if not argument.startswith('--')]
+    db_path = arguments[0] if arguments else DB_PATH
+    
+    if not os.path.exists(db_path):
+        print(f"❌ Base de données non trouvée: {db_path}")
+        sys.exit(1)
+    maintain_database(db_path, vacuum='--vacuum' in sys.argv, analysis_limit=0 if '--full' in sys.argv else ANALYSIS_LIMIT)
@@ -0,0 +1,95 @@
+import pandas as pd
+from create_database_table import FACT_COLUMNS, FACT_VIEW, create_fact_table
+
+# Stockage partitionné de FAIT_VENTES: une table par mois ('month') ou par année ('year')
+PARTITION_FORMATS = {
+    'month': ('%Y_%m', 'MS'),
+    'year': ('%Y', 'YS')
+}
+PARTITION_PREFIX = 'FAIT_VENTES_'
+
+def partition_names(dates_iso, granularity):
+    """Nom de la partition de chaque date ISO (FAIT_VENTES_2023_05 ou FAIT_VENTES_2023)"""
+    name_format, _ = PARTITION_FORMATS[granularity]
+    return PARTITION_PREFIX + pd.to_datetime(pd.Series(dates_iso)).dt.strftime(name_format)
+
+def ensure_partition(cursor, partition_name, granularity):
+    """Création d'une partition (même schéma et mêmes index que FAIT_VENTES) et inscription au catalogue"""
+    cursor.execute("SELECT LECTURE_SEULE FROM FAIT_VENTES_PARTITIONS WHERE NOM_PARTITION = ?", (partition_name,))
+    row = cursor.fetchone()
+    if row is not None:
+        return bool(row[0])
+    
+    # Même schéma que FAIT_VENTES, index suffixés par la période
+    create_fact_table(cursor, partition_name)
+    suffix = partition_name[len(PARTITION_PREFIX):]
+    
+    # Bornes de la période couverte, utilisées pour l'élagage des partitions
+    name_format, period_start = PARTITION_FORMATS[granularity]
+    start = pd.to_datetime(suffix, format=name_format)
+    end = start + pd.tseries.frequencies.to_offset(period_start) - pd.Timedelta(days=1)
+    cursor.execute(
+        "INSERT INTO FAIT_VENTES_PARTITIONS (NOM_PARTITION, DATE_DEBUT, DATE_FIN, LECTURE_SEULE) VALUES (?, ?, ?, 0)",
+        (partition_name, f"{start:%Y-%m-%d}", f"{end:%Y-%m-%d}")
+    )
+    return False
+
+def list_partitions(cursor, date_debut=None, date_fin=None):
+    """Partitions dont la période recoupe [date_debut, date_fin] (toutes si les bornes sont absentes)"""
+    cursor.execute("""
+        SELECT NOM_PARTITION FROM FAIT_VENTES_PARTITIONS
+        WHERE (? IS NULL OR DATE_FIN >= ?) AND (? IS NULL OR DATE_DEBUT <= ?)
+        ORDER BY DATE_DEBUT
+    """, (date_debut, date_debut, date_fin, date_fin))
+    return [row[0] for row in cursor.fetchall()]
+
+def fact_source(cursor, date_debut=None, date_fin=None):
+    """Source des ventes pour une clause FROM, limitée aux partitions de la période demandée"""
+    # FAIT_VENTES conserve les ventes chargées avant le passage au stockage partitionné
+    tables = ['FAIT_VENTES'] + list_partitions(cursor, date_debut, date_fin)
+    if len(tables) == 1:
+        return 'FAIT_VENTES'
+    return f"({union_all(tables)})"
+
+def union_all(tables):
+    """Union des ventes de plusieurs tables (colonnes explicites, dans le même ordre)"""
+    return ' UNION ALL '.join(f"SELECT {FACT_COLUMNS} FROM {table_name}" for table_name in tables)
+
+def refresh_fact_view(cursor):
+    """Vue unifiée V_FAIT_VENTES sur FAIT_VENTES et toutes ses partitions"""
+    tables = ['FAIT_VENTES'] + list_partitions(cursor)
+    cursor.execute(f"DROP VIEW IF EXISTS {FACT_VIEW}")
+    cursor.execute(
+        f"CREATE VIEW {FACT_VIEW} AS {union_all(tables)}"
+    )
+
+def next_sale_id(cursor):
+    """Prochain ID_VENTE libre sur FAIT_VENTES et ses partitions (MAX sur la clé: lecture directe)"""
+    tables = ['FAIT_VENTES'] + list_partitions(cursor)
+    cursor.execute(
+        "SELECT MAX(ID_VENTE) FROM (" + ' UNION ALL '.join(f"SELECT MAX(ID_VENTE) AS ID_VENTE FROM {table_name}" for table_name in tables) + ")"
+    )
+    return (cursor.fetchone()[0] or 0) + 1
+
+def freeze_partition(cursor, partition_name):
+    """Passage d'une partition en lecture seule: toute écriture est rejetée par des triggers"""
+    for operation in ('INSERT', 'UPDATE', 'DELETE'):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS TRG_{partition_name}_{operation}
+            BEFORE {operation} ON {partition_name}
+            BEGIN
+                SELECT RAISE(ABORT, 'Partition {partition_name} en lecture seule');
+            END
+        ''')
+    cursor.execute("UPDATE FAIT_VENTES_PARTITIONS SET LECTURE_SEULE = 1 WHERE NOM_PARTITION = ?", (partition_name,))
+
+def freeze_partitions_before(cursor, date_iso):
+    """Gel des partitions entièrement antérieures à une date (retourne les partitions gelées)"""
+    cursor.execute(
+        "SELECT NOM_PARTITION FROM FAIT_VENTES_PARTITIONS WHERE DATE_FIN < ? AND LECTURE_SEULE = 0",
+        (date_iso,)
+    )
+    frozen = [row[0] for row in cursor.fetchall()]
+    for partition_name in frozen:
+        freeze_partition(cursor, partition_name)
+    return frozen
@@ -0,0 +1,179 @@
+import sqlite3
+import sys
+from grouping_sets import GRAIN_TABLE, grouping_sets_sql
+
+DB_PATH = './data/sales_analysis.db'
+
+# Regroupements de la vue d'ensemble des ventes (total, par ville, par produit), calculés en un seul parcours
+OVERVIEW_GROUPING_SETS = {
+    'total': (),
+    'ville': ('VILLE',),
+    'produit': ('NOM_PRODUIT',)
+}
+
+# Requêtes des analyses prédéfinies du dashboard, servies par la plus petite table
+# d'agrégats capable d'y répondre (AGG_VENTES_PRODUIT < AGG_VENTES_MOIS_MAGASIN
+# < AGG_VENTES_JOUR_MAGASIN_PRODUIT), jamais par FAIT_VENTES.
+# Les montants sont sommés en centimes entiers (exacts) et convertis en euros à l'affichage
+ANALYSIS_QUERIES = {
+    'ca_par_ville': """
+    SELECT
+        dm.VILLE,
+        dm.REGION,
+        SUM(a.NB_VENTES) as nombre_ventes,
+        SUM(a.MONTANT_TOTAL) as ca_total,
+        SUM(a.MONTANT_TOTAL) * 1.0 / SUM(a.NB_VENTES) as panier_moyen,
+        SUM(a.QUANTITE_TOTALE) as quantite_totale
+    FROM AGG_VENTES_MOIS_MAGASIN a
+    JOIN DIM_MAGASINS dm ON a.ID_MAGASIN = dm.ID_MAGASIN
+    GROUP BY dm.VILLE, dm.REGION
+    ORDER BY ca_total DESC
+    """,
+    'top_produits': """
+    SELECT
+        dp.NOM_PRODUIT,
+        dp.PRIX_UNITAIRE,
+        SUM(a.QUANTITE_TOTALE) as quantite_totale,
+        SUM(a.MONTANT_TOTAL) as ca_total,
+        SUM(a.NB_VENTES) as nombre_ventes
+    FROM AGG_VENTES_PRODUIT a
+    JOIN DIM_PRODUITS dp ON a.ID_PRODUIT = dp.ID_PRODUIT
+    GROUP BY dp.NOM_PRODUIT, dp.PRIX_UNITAIRE
+    ORDER BY ca_total DESC
+    """,
+    'evolution_temporelle': """
+    SELECT
+        dt.DATE_COMPLETE,
+        dt.MOIS,
+        dt.ANNEE,
+        SUM(a.MONTANT_TOTAL) as ca_jour,
+        SUM(a.QUANTITE_TOTALE) as quantite_jour,
+        SUM(a.NB_VENTES) as nombre_ventes
+    FROM AGG_VENTES_JOUR_MAGASIN_PRODUIT a
+    JOIN DIM_TEMPS dt ON a.ID_TEMPS = dt.ID_TEMPS
+    GROUP BY dt.DATE_COMPLETE, dt.MOIS, dt.ANNEE
+    ORDER BY dt.DATE_COMPLETE
+    """,
+    'performance_magasins': """
+    SELECT
+        dm.VILLE,
+        dm.NOMBRE_SALARIES,
+        dm.TAILLE_MAGASIN,
+        SUM(a.NB_VENTES) as nombre_ventes,
+        SUM(a.MONTANT_TOTAL) as ca_total,
+        SUM(a.MONTANT_TOTAL) * 1.0 / SUM(a.NB_VENTES) as panier_moyen,
+        SUM(a.QUANTITE_TOTALE) as quantite_totale
+    FROM AGG_VENTES_MOIS_MAGASIN a
+    JOIN DIM_MAGASINS dm ON a.ID_MAGASIN = dm.ID_MAGASIN
+    GROUP BY dm.VILLE, dm.NOMBRE_SALARIES, dm.TAILLE_MAGASIN
+    ORDER BY ca_total DESC
+    """,
+    # Vue d'ensemble des ventes: KPIs, CA par ville et CA par produit en une seule requête
+    'vue_ensemble': grouping_sets_sql(OVERVIEW_GROUPING_SETS)
+}
+
+# Requêtes d'exemple de la page "Requêtes SQL" (mêmes requêtes que livrable.sql, montants en euros)
+EXAMPLE_QUERIES = {
+    "Sélection simple": "SELECT * FROM DIM_PRODUITS LIMIT 5",
+    "Chiffre d'affaire total": """
+    SELECT
+    SUM(MONTANT_TOTAL) / 100.0 AS MONTANT_VENTE_TOTAL
+    FROM AGG_VENTES_PRODUIT
+    """,
+    "Ventes par produits": """
+    SELECT
+        NOM_PRODUIT,
+        SUM(MONTANT_TOTAL) / 100.0 AS MONTANT_VENTE
+    FROM AGG_VENTES_PRODUIT
+    INNER JOIN DIM_PRODUITS
+    USING(ID_PRODUIT)
+    GROUP BY NOM_PRODUIT
+    """,
+    "Ventes par region": """
+    SELECT
+        dm.REGION,
+        SUM(a.NB_VENTES) as nombre_ventes,
+        SUM(a.MONTANT_TOTAL) / 100.0 as ca_total,
+        SUM(a.MONTANT_TOTAL) / 100.0 / SUM(a.NB_VENTES) as panier_moyen
+    FROM AGG_VENTES_MOIS_MAGASIN a
+    JOIN DIM_MAGASINS dm ON a.ID_MAGASIN = dm.ID_MAGASIN
+    GROUP BY dm.REGION
+    ORDER BY ca_total DESC
+    """,
+    # Détail des ventes: vue V_FAIT_VENTES (FAIT_VENTES et ses partitions éventuelles), jamais FAIT_VENTES seule
+    "Ventes du dernier jour": """
+    SELECT
+        dp.NOM_PRODUIT,
+        dm.VILLE,
+        v.QUANTITE_VENDUE,
+        v.MONTANT_VENTE / 100.0 AS MONTANT_VENTE
+    FROM V_FAIT_VENTES v
+    JOIN DIM_PRODUITS dp ON v.ID_PRODUIT = dp.ID_PRODUIT
+    JOIN DIM_MAGASINS dm ON v.ID_MAGASIN = dm.ID_MAGASIN
+    WHERE v.ID_TEMPS = (SELECT MAX(ID_TEMPS) FROM DIM_TEMPS)
+    """
+}
+
+# Colonnes monétaires des analyses prédéfinies (centimes)
+MONEY_COLUMNS = ('ca_total', 'panier_moyen', 'ca_jour', 'PRIX_UNITAIRE')
+
+# Tables de dimension et d'agrégats (et grain fin des regroupements): volumétrie faible, leur parcours complet est accepté
+SCANNABLE_TABLES = {
+    'DIM_TEMPS', 'DIM_PRODUITS', 'DIM_MAGASINS',
+    'AGG_VENTES_JOUR_MAGASIN_PRODUIT', 'AGG_VENTES_MOIS_MAGASIN', 'AGG_VENTES_PRODUIT',
+    GRAIN_TABLE
+}
+
+def explain_query(conn, query):
+    """Plan d'exécution d'une requête (lignes 'detail' de EXPLAIN QUERY PLAN)"""
+    cursor = conn.execute(f"EXPLAIN QUERY PLAN {query}")
+    return [row[3] for row in cursor.fetchall()]
+
+def find_full_scans(conn, queries=None):
+    """Requêtes intégrées dont le plan parcourt la table de faits sans index"""
+    if queries is None:
+        queries = {**ANALYSIS_QUERIES, **EXAMPLE_QUERIES}
+    
+    full_scans = {}
+    for name, query in queries.items():
+        aliases = table_aliases(query)
+        for detail in explain_query(conn, query):
+            # "SCAN fv" sans "USING ... INDEX": parcours complet de la table
+            words = detail.split()
+            if words[0] != 'SCAN' or 'INDEX' in words:
+                continue
+            if aliases.get(words[1], words[1]) not in SCANNABLE_TABLES:
+                full_scans.setdefault(name, []).append(detail)
+    return full_scans
+
+def table_aliases(query):
+    """Alias de tables d'une requête (FROM FAIT_VENTES fv -> {'fv': 'FAIT_VENTES'})"""
+    words = query.split()
+    return {
+        alias: table_name
+        for keyword, table_name, alias in zip(words, words[1:], words[2:])
+        if keyword.upper() in ('FROM', 'JOIN')
+    }
+
+def check_query_plans(db_path=DB_PATH):
+    """Vérification des plans de toutes les requêtes intégrées (False si un parcours complet est détecté)"""
+    conn = sqlite3.connect(db_path)
+    try:
+        full_scans = find_full_scans(conn)
+        for name, query in {**ANALYSIS_QUERIES, **EXAMPLE_QUERIES}.items():
+            status = "❌" if name in full_scans else "✅"
+            print(f"{status} {name}")
+            for detail in explain_query(conn, query):
+                print(f"   {detail}")
+    finally:
+        conn.close()
+    
+    if full_scans:
+        print(f"\n❌ {len(full_scans)} requête(s) en parcours complet de table: {', '.join(full_scans)}")
+        return False
+    print("\n✅ Aucune requête intégrée ne parcourt une table de faits sans index")
+    return True
+
+if __name__ == "__main__":
+    db_path = sys.argv[1] if len(sys.argv) > 1 else DB_PATH
+    sys.exit(0 if check_query_plans(db_path) else 1)
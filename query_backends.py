@@ -0,0 +1,274 @@
+import os
+import json
+import queue
+import shutil
+import sqlite3
+import threading
+import pandas as pd
+from contextlib import contextmanager
+
+try:
+    import duckdb
+except ImportError:
+    # Moteur colonnaire optionnel: sans lui, seul le backend SQLite est disponible
+    duckdb = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+DB_PATH = './data/sales_analysis.db'
+
+# Backend des requêtes du dashboard: 'sqlite' (par défaut) ou 'duckdb'
+QUERY_BACKEND = os.environ.get('QUERY_BACKEND', 'sqlite')
+
+# Exports Parquet lus par DuckDB quand l'extension sqlite n'est pas disponible
+PARQUET_DIR = './data/parquet'
+EXPORT_CHUNK_ROWS = 500_000
+
+# Pool de connexions en lecture seule du dashboard, partagé par toutes les sessions du processus
+POOL_SIZE = 4
+POOL_TIMEOUT_S = 30
+READ_PRAGMAS = {
+    'mmap_size': 256 * 1024 ** 2,
+    'cache_size': -64000,
+    'temp_store': 'MEMORY'
+}
+
+def source_mtime(db_path):
+    """Date de dernière modification de la base (fichier principal et journal WAL)"""
+    return max(os.path.getmtime(path) for path in (db_path, f"{db_path}-wal") if os.path.exists(path))
+
+def list_tables(conn):
+    """Tables (et vues) interrogeables, quel que soit le backend"""
+    if is_duckdb(conn):
+        rows = conn.execute("SELECT table_name FROM information_schema.tables ORDER BY table_name").fetchall()
+    else:
+        rows = conn.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()
+    return [row[0] for row in rows]
+
+def table_columns(conn, table_name):
+    """Colonnes d'une table, quel que soit le backend"""
+    if is_duckdb(conn):
+        rows = conn.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = ? ORDER BY ordinal_position",
+            [table_name]
+        ).fetchall()
+        return [row[0] for row in rows]
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table_name})").fetchall()]
+
+def export_parquet(db_path=DB_PATH, parquet_dir=PARQUET_DIR, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Export de toutes les tables SQLite en Parquet, par blocs (jamais une table entière en mémoire)"""
+    if pa is None:
+        raise ImportError("pyarrow est requis pour l'export Parquet")
+    
+    tmp_dir = f"{parquet_dir}.{os.getpid()}.tmp"
+    os.makedirs(tmp_dir, exist_ok=True)
+    mtime = source_mtime(db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        tables = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'").fetchall()
+        # Vues (V_FAIT_VENTES): définitions recréées telles quelles côté DuckDB, sur les vues des tables
+        views = dict(conn.execute("SELECT name, sql FROM sqlite_master WHERE type='view'").fetchall())
+        for (table_name,) in tables:
+            writer = None
+            for chunk in pd.read_sql_query(f"SELECT * FROM {table_name}", conn, chunksize=chunk_rows):
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(os.path.join(tmp_dir, f"{table_name}.parquet"), table.schema)
+                writer.write_table(table.cast(writer.schema))
+            if writer is None:
+                # Table vide: schéma seul, à partir des colonnes SQLite
+                columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table_name})").fetchall()]
+                pq.write_table(pa.Table.from_pandas(pd.DataFrame(columns=columns), preserve_index=False),
+                               os.path.join(tmp_dir, f"{table_name}.parquet"))
+            else:
+                writer.close()
+    finally:
+        conn.close()
+    
+    with open(os.path.join(tmp_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump({'source': os.path.abspath(db_path), 'source_mtime': mtime, 'vues': views}, f)
+    
+    # Remplacement de l'export précédent en une fois
+    if os.path.exists(parquet_dir):
+        shutil.rmtree(parquet_dir)
+    os.replace(tmp_dir, parquet_dir)
+    return [table_name for (table_name,) in tables]
+
+def parquet_is_fresh(db_path=DB_PATH, parquet_dir=PARQUET_DIR):
+    """L'export Parquet correspond-il à l'état actuel de la base ?"""
+    manifest_path = os.path.join(parquet_dir, 'manifest.json')
+    if not os.path.exists(manifest_path):
+        return False
+    with open(manifest_path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    return manifest['source'] == os.path.abspath(db_path) and manifest['source_mtime'] >= source_mtime(db_path)
+
+def connect_duckdb(db_path=DB_PATH, parquet_dir=PARQUET_DIR):
+    """Connexion DuckDB sur le schéma en étoile: base SQLite attachée, sinon exports Parquet"""
+    if duckdb is None:
+        raise ImportError("duckdb n'est pas installé: utilisez QUERY_BACKEND=sqlite")
+    
+    conn = duckdb.connect()
+    
+    # Lecture directe du fichier SQLite si l'extension sqlite est déjà installée (pas de téléchargement)
+    installed = conn.execute(
+        "SELECT installed FROM duckdb_extensions() WHERE extension_name = 'sqlite'"
+    ).fetchone()
+    if installed and installed[0]:
+        conn.execute("LOAD sqlite")
+        conn.execute(f"ATTACH '{db_path}' AS ventes (TYPE SQLITE, READ_ONLY)")
+        conn.execute("USE ventes")
+        return conn
+    
+    # Vues sur les exports Parquet, régénérés si la base a changé depuis
+    if not parquet_is_fresh(db_path, parquet_dir):
+        export_parquet(db_path, parquet_dir)
+    for file_name in sorted(os.listdir(parquet_dir)):
+        if file_name.endswith('.parquet'):
+            path = os.path.join(parquet_dir, file_name)
+            conn.execute(f"CREATE VIEW {file_name[:-len('.parquet')]} AS SELECT * FROM read_parquet('{path}')")
+    with open(os.path.join(parquet_dir, 'manifest.json'), encoding='utf-8') as f:
+        for sql in json.load(f).get('vues', {}).values():
+            conn.execute(sql)
+    return conn
+
+def connect_readonly(db_path=DB_PATH, pragmas=READ_PRAGMAS):
+    """Connexion SQLite en lecture seule (URI mode=ro), utilisable depuis n'importe quel thread"""
+    conn = sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True, check_same_thread=False)
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+def connect_backend(backend=QUERY_BACKEND, db_path=DB_PATH, parquet_dir=PARQUET_DIR):
+    """Connexion au backend de requêtes choisi par configuration"""
+    if backend == 'duckdb':
+        return connect_duckdb(db_path, parquet_dir)
+    if backend == 'sqlite':
+        return sqlite3.connect(db_path)
+    raise ValueError(f"Backend de requêtes inconnu: {backend} (attendu: sqlite ou duckdb)")
+
+def file_identity(db_path, backend='sqlite'):
+    """Identité du fichier de base: inode (fichier remplacé ou recréé par l'ETL), et date de
+    modification pour DuckDB qui lit un export figé de la base"""
+    try:
+        stat = os.stat(db_path)
+    except FileNotFoundError:
+        return None
+    if backend == 'duckdb':
+        return (stat.st_dev, stat.st_ino, source_mtime(db_path))
+    return (stat.st_dev, stat.st_ino)
+
+def create_pool(db_path=DB_PATH, backend=QUERY_BACKEND, size=POOL_SIZE, parquet_dir=PARQUET_DIR):
+    """Pool de connexions en lecture seule: au plus `size` connexions, chacune utilisée par un seul thread à la fois"""
+    if backend not in ('sqlite', 'duckdb'):
+        raise ValueError(f"Backend de requêtes inconnu: {backend} (attendu: sqlite ou duckdb)")
+    return {
+        'db_path': db_path,
+        'backend': backend,
+        'parquet_dir': parquet_dir,
+        'size': size,
+        'idle': queue.LifoQueue(),
+        'lock': threading.Lock(),
+        'open': 0,
+        'generation': 0,
+        'identity': file_identity(db_path, backend)
+    }
+
+def check_pool(pool):
+    """Contrôle de santé du pool: fichier remplacé ou supprimé -> connexions inactives fermées (False si absent)"""
+    identity = file_identity(pool['db_path'], pool['backend'])
+    with pool['lock']:
+        if identity != pool['identity']:
+            # Connexions ouvertes sur l'ancien fichier: fermées maintenant (inactives) ou à leur retour (empruntées)
+            pool['identity'] = identity
+            pool['generation'] += 1
+            while not pool['idle'].empty():
+                _, conn = pool['idle'].get_nowait()
+                if conn is not None:
+                    conn.close()
+                pool['open'] -= 1
+    return identity is not None
+
+def open_pooled_connection(pool):
+    """Nouvelle connexion du pool selon son backend"""
+    if pool['backend'] == 'duckdb':
+        return connect_duckdb(pool['db_path'], pool['parquet_dir'])
+    return connect_readonly(pool['db_path'])
+
+def is_alive(conn):
+    """La connexion répond-elle encore ?"""
+    try:
+        conn.execute("SELECT 1").fetchone()
+        return True
+    except Exception:
+        return False
+
+@contextmanager
+def pooled_connection(pool, timeout=POOL_TIMEOUT_S):
+    """Emprunt d'une connexion du pool, vérifiée avant usage et rendue (ou fermée si obsolète) à la sortie"""
+    if not check_pool(pool):
+        raise FileNotFoundError(f"Base de données non trouvée: {pool['db_path']}")
+    
+    # Entrées du pool: (génération, connexion), ou connexion None pour une place libre à ouvrir
+    with pool['lock']:
+        entry = None
+        if pool['idle'].empty() and pool['open'] < pool['size']:
+            pool['open'] += 1
+            entry = (pool['generation'], None)
+    if entry is None:
+        try:
+            entry = pool['idle'].get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"Aucune connexion disponible après {timeout} s ({pool['size']} connexions utilisées)")
+    generation, conn = entry
+    
+    try:
+        # Place libre ou connexion qui ne répond plus: (re)connexion hors verrou
+        if conn is not None and not is_alive(conn):
+            conn.close()
+            conn = None
+        if conn is None:
+            conn = open_pooled_connection(pool)
+    except Exception:
+        pool['idle'].put((generation, None))
+        raise
+    
+    try:
+        yield conn
+    finally:
+        with pool['lock']:
+            if generation != pool['generation']:
+                # Connexion sur un fichier remplacé: fermée, sa place est rendue
+                conn.close()
+                conn, generation = None, pool['generation']
+            pool['idle'].put((generation, conn))
+
+def close_pool(pool):
+    """Fermeture des connexions inactives du pool"""
+    with pool['lock']:
+        while not pool['idle'].empty():
+            _, conn = pool['idle'].get_nowait()
+            if conn is not None:
+                conn.close()
+            pool['open'] -= 1
+
+def is_duckdb(conn):
+    """La connexion est-elle une connexion DuckDB ?"""
+    return duckdb is not None and isinstance(conn, duckdb.DuckDBPyConnection)
+
+def run_query(conn, query, params=None):
+    """Exécution d'une requête sur l'un ou l'autre backend, résultat en DataFrame"""
+    if is_duckdb(conn):
+        result = conn.execute(query, params or [])
+        # SUM d'entiers en HUGEINT (128 bits), converti en flottant par pandas: retour en int64 comme SQLite
+        hugeint_columns = [column[0] for column in result.description if str(column[1]) == 'HUGEINT']
+        df = result.df()
+        for column in hugeint_columns:
+            if df[column].notna().all():
+                df[column] = df[column].astype('int64')
+        return df
+    return pd.read_sql_query(query, conn, params=params)
@@ -0,0 +1,185 @@
+import os
+import re
+import json
+import math
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from etl_metrics import REPORT_DIR
+from queries import table_aliases
+from query_backends import is_duckdb, list_tables
+
+# Budget des requêtes personnalisées du dashboard: durée et instructions de la machine virtuelle SQLite
+# (environ 80 millions d'instructions par seconde: 500 millions, quelques secondes de calcul)
+QUERY_TIMEOUT_S = 10
+QUERY_MAX_STEPS = 500_000_000
+
+# Exports du résultat complet: durée seule, plus longue
+EXPORT_TIMEOUT_S = 600
+
+# Instructions exécutées entre deux appels du gestionnaire de progression (coût du contrôle négligeable)
+PROGRESS_STEPS = 10_000
+
+# Produit cartésien refusé au-delà de ce nombre de lignes estimé (averti en deçà)
+CROSS_JOIN_MAX_ROWS = 10_000_000
+
+# Dépassements de budget et annulations, une ligne JSON par événement
+BUDGET_LOG = os.path.join(REPORT_DIR, 'budget_requetes.jsonl')
+
+# "SCAN t" ou "SCAN t USING COVERING INDEX ...": parcours complet d'une table
+SCAN_DETAIL = re.compile(r'^SCAN (\w+)')
+
+def log_violation(query, reason, details=None, log_path=BUDGET_LOG):
+    """Journalisation d'un dépassement de budget (requête, motif, mesures) dans un fichier JSON lines"""
+    entry = {'date': datetime.now().isoformat(), 'motif': reason, 'requete': query, **(details or {})}
+    os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+    with open(log_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+    print(f"⚠️ Requête hors budget ({reason}): {' '.join(query.split())[:200]}")
+
+def budget_exceeded(state, cancel, timeout_s, max_steps):
+    """Gestionnaire de progression SQLite: valeur non nulle pour interrompre l'instruction en cours"""
+    state['pas'] += PROGRESS_STEPS
+    if cancel.is_set():
+        state['motif'] = 'annulation'
+    elif timeout_s is not None and time.perf_counter() - state['debut'] > timeout_s:
+        state['motif'] = 'duree'
+    elif max_steps is not None and state['pas'] > max_steps:
+        state['motif'] = 'instructions'
+    return 1 if state['motif'] else 0
+
+def watch_duckdb(conn, state, cancel, done, timeout_s):
+    """DuckDB n'a pas de gestionnaire de progression: interruption depuis un thread à l'échéance ou à l'annulation,
+    renouvelée jusqu'à la fin du bloc (une instruction lancée après la première interruption l'est aussi)"""
+    deadline = None if timeout_s is None else state['debut'] + timeout_s
+    while not done.is_set():
+        if state['motif'] is None and cancel.is_set():
+            state['motif'] = 'annulation'
+        elif state['motif'] is None and deadline is not None and time.perf_counter() > deadline:
+            state['motif'] = 'duree'
+        if state['motif']:
+            conn.interrupt()
+        done.wait(0.05)
+
+@contextmanager
+def query_budget(conn, query, timeout_s=QUERY_TIMEOUT_S, max_steps=QUERY_MAX_STEPS, cancel=None, log_path=BUDGET_LOG):
+    """Exécution sous budget: l'instruction en cours est interrompue au-delà de la durée ou du nombre
+    d'instructions (SQLite), ou quand `cancel` (threading.Event) est positionné; le dépassement est journalisé
+    et lève TimeoutError (budget) ou InterruptedError (annulation)"""
+    state = {'debut': time.perf_counter(), 'pas': 0, 'motif': None}
+    cancel = cancel if cancel is not None else threading.Event()
+    done = threading.Event()
+    watcher = None
+    if is_duckdb(conn):
+        watcher = threading.Thread(target=watch_duckdb, args=(conn, state, cancel, done, timeout_s), daemon=True)
+        watcher.start()
+    else:
+        conn.set_progress_handler(lambda: budget_exceeded(state, cancel, timeout_s, max_steps), PROGRESS_STEPS)
+    
+    try:
+        yield state
+    except Exception as e:
+        if state['motif'] is None:
+            raise
+        elapsed = time.perf_counter() - state['debut']
+        details = {'duree_s': round(elapsed, 3), 'instructions': None if watcher else state['pas']}
+        log_violation(query, state['motif'], details, log_path)
+        if state['motif'] == 'annulation':
+            raise InterruptedError(f"Requête annulée après {elapsed:.1f} s") from e
+        if state['motif'] == 'duree':
+            raise TimeoutError(f"Requête interrompue: durée maximale de {timeout_s} s dépassée") from e
+        raise TimeoutError(f"Requête interrompue: plus de {max_steps:,} instructions exécutées") from e
+    finally:
+        done.set()
+        if watcher:
+            watcher.join()
+        else:
+            # Connexion rendue au pool sans gestionnaire: les requêtes du dashboard ne sont pas bornées
+            conn.set_progress_handler(None, 0)
+
+def run_cancellable(fn, cancel, on_wait=None, poll_s=0.2):
+    """Exécution de fn dans un thread de travail: le thread appelant appelle on_wait(durée) toutes les `poll_s`
+    secondes (point d'interruption de Streamlit); s'il est interrompu (clic pendant l'exécution), la requête est
+    annulée et le thread de travail attendu avant que la connexion ne soit rendue"""
+    result = {}
+    def target():
+        try:
+            result['valeur'] = fn()
+        except BaseException as e:
+            result['erreur'] = e
+    
+    start = time.perf_counter()
+    worker = threading.Thread(target=target, daemon=True)
+    worker.start()
+    try:
+        while worker.is_alive():
+            worker.join(poll_s)
+            if worker.is_alive() and on_wait:
+                on_wait(time.perf_counter() - start)
+    except BaseException:
+        cancel.set()
+        worker.join()
+        raise
+    if 'erreur' in result:
+        raise result['erreur']
+    return result['valeur']
+
+def table_rows(conn, table_name):
+    """Nombre de lignes d'une table: statistiques du planificateur (ANALYZE) si présentes, sinon COUNT(*)"""
+    try:
+        row = conn.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = ? LIMIT 1", [table_name]).fetchone()
+    except sqlite3.Error:
+        # Base jamais analysée: pas de table sqlite_stat1
+        row = None
+    if row:
+        return int(row[0].split()[0])
+    return conn.execute(f'SELECT COUNT(*) FROM "{table_name}"').fetchone()[0]
+
+def find_cross_joins(conn, query):
+    """Produits cartésiens du plan (EXPLAIN QUERY PLAN): plusieurs tables parcourues entièrement dans la même
+    boucle imbriquée (jointure sans condition ou sans index), avec leur nombre de lignes estimé (None si inconnu)"""
+    if is_duckdb(conn):
+        return []
+    try:
+        plan = conn.execute(f"EXPLAIN QUERY PLAN {query}").fetchall()
+    except sqlite3.Error:
+        # Requête invalide ou non explicable (PRAGMA...): l'erreur éventuelle est signalée à l'exécution
+        return []
+    
+    tables = {name.upper(): name for name in list_tables(conn)}
+    aliases = table_aliases(query)
+    scans = {}
+    for _, parent, _, detail in plan:
+        match = SCAN_DETAIL.match(detail)
+        if match is None or detail.startswith('SCAN CONSTANT ROW'):
+            continue
+        name = match.group(1)
+        # Nom de table, sinon alias de la requête, sinon CTE ou sous-requête (taille inconnue)
+        table = tables.get(name.upper()) or tables.get(aliases.get(name, '').upper())
+        scans.setdefault(parent, []).append((name, table))
+    
+    cross_joins = []
+    for scanned in scans.values():
+        if len(scanned) > 1:
+            sizes = [table_rows(conn, table) if table else None for _, table in scanned]
+            rows = None if None in sizes else math.prod(sizes)
+            cross_joins.append(([table or name for name, table in scanned], rows))
+    return cross_joins
+
+def check_query(conn, query, max_rows=CROSS_JOIN_MAX_ROWS, log_path=BUDGET_LOG):
+    """Vérification du plan avant exécution: produit cartésien refusé (ValueError, journalisé) au-delà de
+    `max_rows` combinaisons estimées, avertissements pour les autres"""
+    warnings = []
+    for tables, rows in find_cross_joins(conn, query):
+        product = ' × '.join(tables)
+        if rows is not None and rows > max_rows:
+            log_violation(query, 'produit_cartesien', {'tables': tables, 'lignes_estimees': rows}, log_path)
+            raise ValueError(
+                f"Produit cartésien refusé: {product} (~{rows:,} combinaisons, limite {max_rows:,}). "
+                "Ajoutez une condition de jointure sur une clé"
+            )
+        estimate = f" (~{rows:,} combinaisons)" if rows is not None else ""
+        warnings.append(f"Produit cartésien ou jointure sans index: {product}{estimate}")
+    return warnings
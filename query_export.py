@@ -0,0 +1,170 @@
+import io
+import os
+import csv
+import sys
+import uuid
+from query_backends import DB_PATH, connect_readonly
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Exports du dashboard, servis en téléchargement par le service de fichiers statiques de Streamlit
+# (app/static/exports, activé dans .streamlit/config.toml): le fichier est envoyé par blocs
+EXPORT_DIR = './static/exports'
+
+# Lignes lues par fetchmany: seule la mémoire d'un bloc est utilisée, quelle que soit la taille du résultat
+STREAM_CHUNK_ROWS = 10_000
+
+EXPORT_FORMATS = ('csv', 'parquet')
+
+def iter_row_chunks(conn, query, params=None, chunk_rows=STREAM_CHUNK_ROWS):
+    """Colonnes du résultat et générateur de blocs de lignes (fetchmany), SQLite ou DuckDB"""
+    cursor = conn.execute(query, params or [])
+    if cursor.description is None:
+        raise ValueError("La requête ne retourne aucune colonne (export réservé aux requêtes SELECT)")
+    columns = [column[0] for column in cursor.description]
+    
+    def chunks():
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                return
+            yield rows
+    
+    return columns, chunks()
+
+def iter_csv_bytes(conn, query, params=None, chunk_rows=STREAM_CHUNK_ROWS, progress=None):
+    """Résultat en CSV UTF-8, par blocs d'octets (fichier ou flux de téléchargement)"""
+    columns, chunks = iter_row_chunks(conn, query, params, chunk_rows)
+    rows_written, bytes_written = 0, 0
+    
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in chunks:
+        writer.writerows(rows)
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        
+        rows_written += len(rows)
+        bytes_written += len(data)
+        if progress:
+            progress(rows_written, bytes_written)
+        yield data
+    
+    # Résultat vide: en-tête seul
+    if rows_written == 0:
+        data = buffer.getvalue().encode('utf-8')
+        if progress:
+            progress(0, len(data))
+        yield data
+
+def stream_csv(conn, query, output, params=None, chunk_rows=STREAM_CHUNK_ROWS, progress=None):
+    """Écriture du résultat en CSV dans un fichier binaire ouvert, bloc par bloc"""
+    rows_written = 0
+    def count(rows, nbytes):
+        nonlocal rows_written
+        rows_written = rows
+        if progress:
+            progress(rows, nbytes)
+    
+    for data in iter_csv_bytes(conn, query, params, chunk_rows, count):
+        output.write(data)
+    return rows_written
+
+def rows_to_arrow(columns, rows, schema=None):
+    """Bloc de lignes en table Arrow, au schéma du premier bloc si fourni"""
+    arrays = [pa.array(values) for values in zip(*rows)]
+    table = pa.Table.from_arrays(arrays, names=columns)
+    if schema is None:
+        # Colonne entièrement NULL dans le premier bloc: type inconnu, exportée en texte
+        return table.cast(pa.schema([
+            pa.field(field.name, pa.string()) if pa.types.is_null(field.type) else field
+            for field in table.schema
+        ]))
+    return table.cast(schema)
+
+def stream_parquet(conn, query, output, params=None, chunk_rows=STREAM_CHUNK_ROWS, progress=None):
+    """Écriture du résultat en Parquet dans un fichier binaire ouvert, un groupe de lignes par bloc"""
+    if pa is None:
+        raise ImportError("pyarrow est requis pour l'export Parquet")
+    
+    columns, chunks = iter_row_chunks(conn, query, params, chunk_rows)
+    writer = None
+    rows_written = 0
+    try:
+        for rows in chunks:
+            try:
+                table = rows_to_arrow(columns, rows, writer.schema if writer else None)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+                # Typage dynamique SQLite: une colonne peut changer de type d'un bloc à l'autre
+                raise ValueError(f"Types de colonnes incohérents entre les blocs (utilisez l'export CSV): {e}")
+            if writer is None:
+                writer = pq.ParquetWriter(output, table.schema)
+            writer.write_table(table)
+            
+            rows_written += len(rows)
+            if progress:
+                progress(rows_written, output.tell())
+        if writer is None:
+            # Résultat vide: schéma seul, colonnes en texte
+            writer = pq.ParquetWriter(output, pa.schema([pa.field(column, pa.string()) for column in columns]))
+    finally:
+        if writer is not None:
+            writer.close()
+    if progress and rows_written == 0:
+        progress(0, output.tell())
+    return rows_written
+
+def export_format(path):
+    """Format d'export déduit de l'extension du fichier"""
+    fmt = os.path.splitext(path)[1].lstrip('.').lower()
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Format d'export inconnu: {path} (attendu: .csv ou .parquet)")
+    return fmt
+
+def export_query(conn, query, path, params=None, chunk_rows=STREAM_CHUNK_ROWS, progress=None):
+    """Export du résultat d'une requête dans un fichier CSV ou Parquet (fichier temporaire puis remplacement)"""
+    fmt = export_format(path)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # Suffixe unique par appel: deux sessions du dashboard peuvent exporter la même requête en même temps
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, 'wb') as output:
+            if fmt == 'parquet':
+                rows = stream_parquet(conn, query, output, params, chunk_rows, progress)
+            else:
+                rows = stream_csv(conn, query, output, params, chunk_rows, progress)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return {'lignes': rows, 'octets': os.path.getsize(path), 'format': fmt}
+
+def print_progress(rows, nbytes):
+    """Progression de l'export sur une seule ligne"""
+    print(f"\r   - {rows:,} lignes, {nbytes / 1024 ** 2:.1f} Mo", end='', flush=True)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print('Usage: python query_export.py "<requête SQL>" <sortie.csv|sortie.parquet> [base]')
+        sys.exit(1)
+    query, path = sys.argv[1], sys.argv[2]
+    db_path = sys.argv[3] if len(sys.argv) > 3 else DB_PATH
+    
+    if not os.path.exists(db_path):
+        print(f"❌ Base de données non trouvée: {db_path}")
+        sys.exit(1)
+    
+    print(f"📤 Export vers {path}")
+    conn = connect_readonly(db_path)
+    try:
+        result = export_query(conn, query, path, progress=print_progress)
+    finally:
+        conn.close()
+    print(f"\n✅ {result['lignes']:,} lignes exportées ({result['octets'] / 1024 ** 2:.1f} Mo, {result['format']})")
@@ -0,0 +1,70 @@
+import pandas as pd
+from query_backends import is_duckdb
+
+# Pagination des requêtes personnalisées: lignes par page et lignes consultables au plus (au-delà: export)
+PAGE_SIZE = 100
+MAX_ROWS = 10_000
+
+# Comptage à la demande, borné: au-delà, seul un minorant est affiché
+COUNT_LIMIT = 1_000_000
+
+# Premier mot des requêtes englobées dans une sous-requête
+SUBQUERY_KEYWORDS = ('SELECT', 'WITH', 'VALUES')
+
+def strip_query(query):
+    """Requête sans espaces ni point-virgule final, pour l'englober dans une sous-requête"""
+    return query.strip().rstrip(';').strip()
+
+def is_subquery(query):
+    """Requête utilisable comme sous-requête (SELECT, WITH, VALUES); les autres (PRAGMA...) sont lues au curseur"""
+    words = strip_query(query).split(None, 1)
+    return bool(words) and words[0].upper() in SUBQUERY_KEYWORDS
+
+def close_cursor(conn, cursor):
+    """Fin d'une lecture partielle: le curseur SQLite garderait sinon sa transaction de lecture ouverte
+    (le checkpoint du WAL serait bloqué); avec DuckDB, le curseur est la connexion elle-même"""
+    if not is_duckdb(conn):
+        cursor.close()
+
+def fetch_rows(conn, query, offset, limit):
+    """Lignes [offset, offset + limit) du résultat: LIMIT/OFFSET dans une sous-requête (SELECT, WITH, VALUES),
+    sinon parcours du curseur (PRAGMA...); seules ces lignes sont lues. Aucune nouvelle tentative sans LIMIT
+    si la sous-requête échoue: une requête interrompue par son budget n'est pas relancée"""
+    if is_subquery(query):
+        # Retours à la ligne: un commentaire final (-- ...) ne masque pas la parenthèse fermante
+        cursor = conn.execute(f"SELECT * FROM (\n{strip_query(query)}\n) LIMIT ? OFFSET ?", [limit, offset])
+    else:
+        cursor = conn.execute(query)
+        if cursor.description is not None:
+            while offset > 0 and cursor.fetchmany(min(offset, 1000)):
+                offset -= min(offset, 1000)
+    
+    try:
+        if cursor.description is None:
+            return [], []
+        columns = [column[0] for column in cursor.description]
+        return columns, cursor.fetchmany(limit)
+    finally:
+        close_cursor(conn, cursor)
+
+def fetch_page(conn, query, page, page_size=PAGE_SIZE, max_rows=MAX_ROWS):
+    """Page `page` (à partir de 0) du résultat, sans dépasser `max_rows` lignes consultables:
+    (DataFrame, page suivante disponible ?, limite atteinte ?)"""
+    offset = page * page_size
+    limit = min(page_size, max_rows - offset)
+    if limit <= 0:
+        raise ValueError(f"Page {page + 1} au-delà des {max_rows:,} lignes consultables")
+    
+    # Une ligne de plus que la page: existence d'une page suivante sans compter le résultat
+    columns, rows = fetch_rows(conn, query, offset, limit + 1)
+    more = len(rows) > limit
+    df = pd.DataFrame.from_records(rows[:limit], columns=columns)
+    capped = more and offset + limit >= max_rows
+    return df, more and not capped, capped
+
+def count_rows(conn, query, limit=COUNT_LIMIT):
+    """Nombre de lignes du résultat, calculé à la demande et borné: (nombre, exact ?)"""
+    count = conn.execute(
+        f"SELECT COUNT(*) FROM (SELECT 1 FROM (\n{strip_query(query)}\n) LIMIT ?)", [limit + 1]
+    ).fetchone()[0]
+    return min(count, limit), count <= limit
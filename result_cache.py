@@ -0,0 +1,177 @@
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+from create_database_table import DATA_VERSION_ROW
+from query_backends import file_identity, source_mtime, run_query
+from snapshot_cache import snapshot_key
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    # Sans pyarrow, le cache reste en mémoire (pas de persistance entre redémarrages)
+    pa = None
+
+# Cache des résultats de requêtes du dashboard: en mémoire (LRU borné en octets) et sur disque
+RESULT_CACHE_DIR = './data/cache/results'
+RESULT_CACHE_MAX_BYTES = 64 * 1024 ** 2
+RESULT_CACHE_DISK_MAX_BYTES = 256 * 1024 ** 2
+
+# Durée de vie des résultats (None: jusqu'au prochain chargement ETL)
+RESULT_CACHE_TTL_S = None
+
+# Chaînes SQL entre quotes: conservées telles quelles par la normalisation
+SQL_LITERALS = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")""")
+
+def normalize_sql(query):
+    """Requête normalisée pour la clé du cache: espaces et retours à la ligne réduits hors littéraux"""
+    parts = SQL_LITERALS.split(query.strip().rstrip(';'))
+    return ''.join(part if i % 2 else ' '.join(part.split()) for i, part in enumerate(parts)).strip()
+
+def data_version(conn, db_path):
+    """Version des données: fichier de la base et horodatage du dernier chargement ETL validé
+    (date de modification de la base si elle n'a jamais été chargée par cette version de l'ETL)"""
+    try:
+        row = conn.execute("SELECT DERNIER_CHARGEMENT FROM ETL_ETAT WHERE NOM_TABLE = ?", [DATA_VERSION_ROW]).fetchone()
+    except Exception:
+        row = None
+    loaded_at = row[0] if row and row[0] else source_mtime(db_path)
+    return f"{file_identity(db_path)}:{loaded_at}"
+
+def create_cache(max_bytes=RESULT_CACHE_MAX_BYTES, ttl_s=RESULT_CACHE_TTL_S, cache_dir=RESULT_CACHE_DIR,
+                 disk_max_bytes=RESULT_CACHE_DISK_MAX_BYTES):
+    """Cache de résultats: clé -> (version, DataFrame, taille, date de création), du moins au plus récemment utilisé"""
+    return {
+        'entries': OrderedDict(),
+        'lock': threading.Lock(),
+        'bytes': 0,
+        'version': None,
+        'max_bytes': max_bytes,
+        'ttl_s': ttl_s,
+        'cache_dir': cache_dir if pa is not None else None,
+        'disk_max_bytes': disk_max_bytes,
+        'hits': 0,
+        'disk_hits': 0,
+        'misses': 0,
+        'evictions': 0
+    }
+
+def is_expired(cache, created):
+    """Résultat plus ancien que la durée de vie du cache ?"""
+    return cache['ttl_s'] is not None and time.time() - created > cache['ttl_s']
+
+def store_entry(cache, key, version, df, created):
+    """Ajout d'un résultat en mémoire, puis éviction LRU jusqu'à la taille maximale (verrou tenu par l'appelant)"""
+    if version != cache['version']:
+        # Résultat calculé sur une version remplacée entre-temps par un nouveau chargement
+        return
+    if key in cache['entries']:
+        cache['bytes'] -= cache['entries'].pop(key)[2]
+    size = int(df.memory_usage(index=False, deep=True).sum())
+    cache['entries'][key] = (version, df, size, created)
+    cache['bytes'] += size
+    while cache['bytes'] > cache['max_bytes'] and len(cache['entries']) > 1:
+        _, (_, _, evicted_size, _) = cache['entries'].popitem(last=False)
+        cache['bytes'] -= evicted_size
+        cache['evictions'] += 1
+
+def invalidate(cache, version):
+    """Nouvelle version des données: résultats des versions précédentes retirés de la mémoire (verrou tenu par l'appelant)"""
+    if cache['version'] == version:
+        return
+    for key in [key for key, entry in cache['entries'].items() if entry[0] != version]:
+        cache['bytes'] -= cache['entries'].pop(key)[2]
+    cache['version'] = version
+
+def load_result(cache, key):
+    """Résultat persisté sur disque (None s'il est absent ou expiré)"""
+    path = os.path.join(cache['cache_dir'], f"{key}.arrow")
+    try:
+        table = feather.read_table(path)
+    except FileNotFoundError:
+        return None
+    created = float(table.schema.metadata[b'cree_le'])
+    if is_expired(cache, created):
+        return None
+    
+    # La date de modification sert d'horodatage de dernier accès pour l'éviction
+    os.utime(path)
+    return table.to_pandas(), created
+
+def save_result(cache, key, df, created):
+    """Persistance d'un résultat au format Arrow IPC (publication atomique), puis éviction du disque"""
+    os.makedirs(cache['cache_dir'], exist_ok=True)
+    path = os.path.join(cache['cache_dir'], f"{key}.arrow")
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), b'cree_le': str(created).encode()})
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    feather.write_feather(table, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
+    evict_results(cache)
+
+def evict_results(cache):
+    """Éviction des résultats persistés expirés, puis des moins récemment utilisés au-delà de la taille maximale"""
+    results = []
+    for entry in os.scandir(cache['cache_dir']):
+        if entry.is_file() and entry.name.endswith('.arrow'):
+            stat = entry.stat()
+            results.append((stat.st_mtime, stat.st_size, entry.path))
+    
+    now = time.time()
+    total = sum(size for _, size, _ in results)
+    for mtime, size, path in sorted(results):
+        if total > cache['disk_max_bytes'] or (cache['ttl_s'] is not None and now - mtime > cache['ttl_s']):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+def cached_query(cache, conn, query, db_path, params=None):
+    """Résultat d'une requête depuis le cache (mémoire, puis disque), sinon exécution et mise en cache"""
+    version = data_version(conn, db_path)
+    key = snapshot_key(normalize_sql(query), params, version)
+    
+    with cache['lock']:
+        invalidate(cache, version)
+        entry = cache['entries'].get(key)
+        if entry is not None and not is_expired(cache, entry[3]):
+            cache['entries'].move_to_end(key)
+            cache['hits'] += 1
+            # Copie: les pages modifient parfois le DataFrame retourné (conversions de colonnes)
+            return entry[1].copy()
+    
+    persisted = load_result(cache, key) if cache['cache_dir'] else None
+    if persisted is not None:
+        df, created = persisted
+        with cache['lock']:
+            cache['hits'] += 1
+            cache['disk_hits'] += 1
+            store_entry(cache, key, version, df, created)
+        return df.copy()
+    
+    # Exécution hors verrou: deux sessions peuvent calculer le même résultat, la dernière écriture l'emporte
+    df = run_query(conn, query, params)
+    created = time.time()
+    with cache['lock']:
+        cache['misses'] += 1
+        store_entry(cache, key, version, df, created)
+    if cache['cache_dir']:
+        save_result(cache, key, df, created)
+    return df.copy()
+
+def cache_stats(cache):
+    """Compteurs du cache: succès (dont disque), échecs, évictions, occupation mémoire"""
+    with cache['lock']:
+        lookups = cache['hits'] + cache['misses']
+        return {
+            'succes': cache['hits'],
+            'succes_disque': cache['disk_hits'],
+            'echecs': cache['misses'],
+            'taux_succes': cache['hits'] / lookups if lookups else 0.0,
+            'evictions': cache['evictions'],
+            'entrees': len(cache['entries']),
+            'octets': cache['bytes']
+        }
@@ -0,0 +1,89 @@
+import os
+import time
+import shutil
+import hashlib
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    # pyarrow est installé avec streamlit; sans lui, les snapshots sont désactivés
+    pa = None
+
+# Snapshots Arrow des DataFrames extraits et transformés
+SNAPSHOT_DIR = './data/cache/snapshots'
+SNAPSHOT_MAX_BYTES = 2 * 1024 ** 3
+SNAPSHOT_MAX_AGE_DAYS = 30
+
+def snapshot_key(*parts):
+    """Clé de snapshot dérivée du contenu (hashs des entrées et paramètres)"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def frame_fingerprint(df):
+    """Empreinte du contenu d'un DataFrame (valeurs, noms et types des colonnes)"""
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    digest.update(str([(column, str(dtype)) for column, dtype in df.dtypes.items()]).encode('utf-8'))
+    return digest.hexdigest()
+
+def save_snapshot(key, frames, snapshot_dir=SNAPSHOT_DIR):
+    """Écriture des DataFrames au format Arrow IPC non compressé (relu par memory-map)"""
+    if pa is None:
+        return False
+    
+    target = os.path.join(snapshot_dir, key)
+    tmp_target = f"{target}.{os.getpid()}.tmp"
+    os.makedirs(tmp_target, exist_ok=True)
+    for name, df in frames.items():
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        feather.write_feather(table, os.path.join(tmp_target, f"{name}.arrow"), compression='uncompressed')
+    
+    # Publication atomique: un snapshot est complet ou absent
+    if os.path.exists(target):
+        shutil.rmtree(tmp_target)
+    else:
+        os.replace(tmp_target, target)
+    evict_snapshots(snapshot_dir)
+    return True
+
+def load_snapshot(key, names, snapshot_dir=SNAPSHOT_DIR):
+    """Lecture memory-mappée d'un snapshot (None s'il est absent ou incomplet)"""
+    if pa is None:
+        return None
+    
+    target = os.path.join(snapshot_dir, key)
+    paths = {name: os.path.join(target, f"{name}.arrow") for name in names}
+    if not all(os.path.exists(path) for path in paths.values()):
+        return None
+    
+    # La date de modification sert d'horodatage de dernier accès pour l'éviction
+    os.utime(target)
+    return {name: feather.read_table(path, memory_map=True).to_pandas() for name, path in paths.items()}
+
+def evict_snapshots(snapshot_dir=SNAPSHOT_DIR, max_bytes=SNAPSHOT_MAX_BYTES, max_age_days=SNAPSHOT_MAX_AGE_DAYS):
+    """Éviction des snapshots trop anciens, puis des moins récemment utilisés au-delà de la taille maximale"""
+    if not os.path.isdir(snapshot_dir):
+        return []
+    
+    snapshots = []
+    for name in os.listdir(snapshot_dir):
+        path = os.path.join(snapshot_dir, name)
+        if not os.path.isdir(path) or name.endswith('.tmp'):
+            continue
+        size = sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+        snapshots.append((os.path.getmtime(path), size, path))
+    
+    evicted = []
+    now = time.time()
+    total = sum(size for _, size, _ in snapshots)
+    for mtime, size, path in sorted(snapshots):
+        if now - mtime > max_age_days * 86400 or total > max_bytes:
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            evicted.append(os.path.basename(path))
+    return evicted
@@ -0,0 +1,156 @@
+import pandas as pd
+from query_backends import is_duckdb
+
+# Explorateur de tables: pages lues par clé (keyset), sans OFFSET, quelle que soit la profondeur
+BROWSE_PAGE_SIZE = 100
+
+# Filtres poussés dans la requête (valeur passée en paramètre, jamais dans le texte SQL)
+FILTER_OPERATORS = ('=', '!=', '<', '<=', '>', '>=', 'LIKE', 'IS NULL', 'IS NOT NULL')
+
+# Clé des tables sans clé primaire déclarée
+ROWID_COLUMN = 'rowid'
+ROWID_ALIAS = 'CLE_LIGNE'
+
+# Ordre de la clé primaire dans les ordres de tri proposés
+PRIMARY_KEY_ORDER = 'Clé primaire'
+
+def table_layout(conn, table_name):
+    """Colonnes, clé primaire et ordres de tri servis par un index (colonnes de l'index puis clé primaire),
+    lus dans le catalogue SQLite"""
+    info = conn.execute(f"PRAGMA table_info({table_name})").fetchall()
+    if not info:
+        raise ValueError(f"Table inconnue: {table_name}")
+    columns = [row[1] for row in info]
+    primary_key = [row[1] for row in sorted(info, key=lambda row: row[5]) if row[5] > 0] or [ROWID_COLUMN]
+    # Colonnes sans NULL possible: NOT NULL, clé entière (rowid) ou rowid lui-même
+    not_null = {row[1] for row in info if row[3] or (row[5] and row[2].upper() == 'INTEGER' and len(primary_key) == 1)}
+    not_null.add(ROWID_COLUMN)
+    
+    orders = {PRIMARY_KEY_ORDER: primary_key}
+    for _, index_name, _, origin, partial in conn.execute(f"PRAGMA index_list({table_name})").fetchall():
+        key_columns = [row[2] for row in conn.execute(f"PRAGMA index_xinfo({index_name})").fetchall() if row[5]]
+        # Index partiel ou sur expression: ne couvre pas toutes les lignes dans l'ordre des colonnes
+        if partial or None in key_columns or origin == 'pk':
+            continue
+        order = key_columns + [column for column in primary_key if column not in key_columns]
+        orders[', '.join(key_columns)] = order
+    affinities = {row[1]: column_affinity(row[2]) for row in info}
+    return {'colonnes': columns, 'cle': primary_key, 'ordres': orders, 'non_nul': not_null, 'affinites': affinities}
+
+def column_affinity(declared_type):
+    """Affinité SQLite d'un type déclaré (règles de https://www.sqlite.org/datatype3.html)"""
+    declared_type = (declared_type or '').upper()
+    if 'INT' in declared_type:
+        return 'INTEGER'
+    if any(name in declared_type for name in ('CHAR', 'CLOB', 'TEXT')):
+        return 'TEXT'
+    if not declared_type or 'BLOB' in declared_type:
+        return 'BLOB'
+    if any(name in declared_type for name in ('REAL', 'FLOA', 'DOUB')):
+        return 'REAL'
+    return 'NUMERIC'
+
+def filter_value(text, affinity=None):
+    """Valeur saisie d'un filtre, convertie comme SQLite le ferait pour la colonne: texte pour une colonne
+    TEXT, sinon entier ou décimal si elle en a la forme. La colonne préfixée d'un + unaire perd son
+    affinité: la valeur doit donc déjà avoir le type des valeurs stockées ('123' pour un texte)"""
+    if affinity == 'TEXT':
+        return text
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except (TypeError, ValueError):
+            pass
+    return text
+
+def filter_clause(layout, filters, leading_column=None):
+    """Conditions des filtres (colonne, opérateur, valeur): colonnes et opérateurs vérifiés, valeurs en paramètres.
+    Sauf sur `leading_column`, la colonne est préfixée d'un + unaire: SQLite ne choisit plus l'index du filtre
+    (puis un tri de toutes les lignes filtrées) mais parcourt l'index de l'ordre en filtrant, jusqu'à remplir la page"""
+    conditions, params = [], []
+    for column, operator, value in filters:
+        if column not in layout['colonnes']:
+            raise ValueError(f"Colonne inconnue: {column}")
+        if operator not in FILTER_OPERATORS:
+            raise ValueError(f"Opérateur non supporté: {operator} (attendu: {', '.join(FILTER_OPERATORS)})")
+        term = column if leading_column is None or column == leading_column else f"+{column}"
+        if operator in ('IS NULL', 'IS NOT NULL'):
+            conditions.append(f"{term} {operator}")
+        else:
+            conditions.append(f"{term} {operator} ?")
+            params.append(value if operator == 'LIKE' else filter_value(value, layout['affinites'].get(column)))
+    return conditions, params
+
+def keyset_segments(columns, last, descending=False, null_equal='IS', not_null=()):
+    """Lignes suivant `last` dans l'ordre des colonnes, en plages disjointes résolues chacune par une
+    recherche dans l'index: égalité sur les premières colonnes, puis colonne suivante au-delà de sa valeur.
+    Les NULL suivent l'ordre de SQLite (en premier en ordre croissant, en dernier en ordre décroissant);
+    aucune plage de NULL pour les colonnes `not_null` (SQLite la parcourrait sans pouvoir l'exclure)"""
+    segments = []
+    for position, column in enumerate(columns):
+        equal = [f"{previous} {null_equal} ?" for previous in columns[:position]]
+        value = last[position]
+        if descending:
+            after = [(f"{column} < ?", [value])] if value is not None else []
+            if value is not None and column not in not_null:
+                after.append((f"{column} IS NULL", []))
+        else:
+            after = [(f"{column} > ?", [value])] if value is not None else [(f"{column} IS NOT NULL", [])]
+        for condition, params in after:
+            segments.append((equal + [condition], list(last[:position]) + params))
+    return segments
+
+def browse_query(table_name, layout, columns, order, descending=False, filters=(), last=None,
+                 page_size=BROWSE_PAGE_SIZE, null_equal='IS'):
+    """Requête d'une page: projection des colonnes demandées et des colonnes de l'ordre, filtres et
+    plages de la clé poussés dans chaque sous-requête, bornée à la taille de la page"""
+    order_columns = layout['ordres'][order]
+    selected = [column for column in columns if column not in order_columns] + order_columns
+    select = ', '.join(
+        f"{ROWID_COLUMN} AS {ROWID_ALIAS}" if column == ROWID_COLUMN else column for column in selected
+    )
+    sort_names = [ROWID_ALIAS if column == ROWID_COLUMN else column for column in order_columns]
+    direction = ' DESC' if descending else ''
+    order_by = ', '.join(f"{column}{direction}" for column in order_columns)
+    outer_order_by = ', '.join(f"{column}{direction}" for column in sort_names)
+    
+    conditions, params = filter_clause(layout, filters, order_columns[0] if null_equal == 'IS' else None)
+    segments = [([], [])] if last is None else keyset_segments(order_columns, last, descending, null_equal, layout['non_nul'])
+    if not segments:
+        return None, []
+    
+    # Une ligne de plus que la page: existence d'une page suivante sans compter
+    subqueries, query_params = [], []
+    for segment_conditions, segment_params in segments:
+        where = conditions + segment_conditions
+        subquery = f"SELECT {select} FROM {table_name}"
+        if where:
+            subquery += f" WHERE {' AND '.join(where)}"
+        subqueries.append(f"SELECT * FROM ({subquery} ORDER BY {order_by} LIMIT ?)")
+        query_params += params + segment_params + [page_size + 1]
+    if len(subqueries) == 1:
+        return subqueries[0], query_params
+    query = "\nUNION ALL\n".join(subqueries) + f"\nORDER BY {outer_order_by} LIMIT ?"
+    return query, query_params + [page_size + 1]
+
+def fetch_browse_page(conn, table_name, layout, columns=None, order=PRIMARY_KEY_ORDER, descending=False,
+                      filters=(), last=None, page_size=BROWSE_PAGE_SIZE):
+    """Page suivant la clé `last` (None: première page): (DataFrame des colonnes demandées,
+    clé de la dernière ligne pour la page suivante, ou None s'il n'y en a pas)"""
+    columns = list(columns or layout['colonnes'])
+    null_equal = 'IS NOT DISTINCT FROM' if is_duckdb(conn) else 'IS'
+    query, params = browse_query(table_name, layout, columns, order, descending, filters, last, page_size, null_equal)
+    if query is None:
+        return pd.DataFrame(columns=columns), None
+    
+    cursor = conn.execute(query, params)
+    names = [column[0] for column in cursor.description]
+    rows = cursor.fetchall()
+    more = len(rows) > page_size
+    rows = rows[:page_size]
+    
+    sort_names = [ROWID_ALIAS if column == ROWID_COLUMN else column for column in layout['ordres'][order]]
+    positions = [names.index(column) for column in sort_names]
+    next_key = tuple(rows[-1][position] for position in positions) if more else None
+    df = pd.DataFrame.from_records(rows, columns=names)
+    return df[columns], next_key
@@ -0,0 +1,78 @@
+from partitioning import list_partitions
+
+# Catalogue de statistiques des tables: calculé par l'ETL dans la transaction de chargement,
+# lu par le dashboard en une requête sur une table de quelques lignes
+STATISTICS_TABLE = 'ETL_STATISTIQUES'
+STATISTICS_COLUMNS = ('NB_LIGNES', 'DATE_MIN_VENTE', 'DATE_MAX_VENTE', 'NB_MAGASINS', 'NB_PRODUITS', 'DERNIER_CHARGEMENT', 'ID_EXECUTION')
+
+# Tables suivies à chaque chargement (FAIT_VENTES et ses partitions s'y ajoutent)
+DIMENSION_TABLES = ('DIM_TEMPS', 'DIM_PRODUITS', 'DIM_MAGASINS')
+SUMMARY_TABLES = ('AGG_VENTES_JOUR_MAGASIN_PRODUIT', 'AGG_VENTES_MOIS_MAGASIN', 'AGG_VENTES_PRODUIT')
+
+def sales_statistics(cursor, table_name):
+    """Statistiques d'une table de ventes: lignes, période des ventes, magasins et produits distincts.
+    Chaque borne et chaque comptage distinct parcourt la dimension (petite) et sonde l'index de la table
+    de ventes dont la clé est en tête: jamais de tri ni de DISTINCT sur les ventes"""
+    cursor.execute(f"""
+        SELECT
+            (SELECT COUNT(*) FROM {table_name}),
+            (SELECT t.DATE_COMPLETE FROM DIM_TEMPS t
+             WHERE EXISTS (SELECT 1 FROM {table_name} f WHERE f.ID_TEMPS = t.ID_TEMPS)
+             ORDER BY t.DATE_COMPLETE LIMIT 1),
+            (SELECT t.DATE_COMPLETE FROM DIM_TEMPS t
+             WHERE EXISTS (SELECT 1 FROM {table_name} f WHERE f.ID_TEMPS = t.ID_TEMPS)
+             ORDER BY t.DATE_COMPLETE DESC LIMIT 1),
+            (SELECT COUNT(*) FROM DIM_MAGASINS m
+             WHERE EXISTS (SELECT 1 FROM {table_name} f WHERE f.ID_MAGASIN = m.ID_MAGASIN)),
+            (SELECT COUNT(*) FROM DIM_PRODUITS p
+             WHERE EXISTS (SELECT 1 FROM {table_name} f WHERE f.ID_PRODUIT = p.ID_PRODUIT))
+    """)
+    return cursor.fetchone()
+
+def stale_tables(cursor, loaded_sales_tables, aggregates_changed):
+    """Tables dont les statistiques sont à recalculer: dimensions (petites, toujours), tables de ventes
+    alimentées et agrégats modifiés par le chargement, et toute table suivie encore absente du catalogue"""
+    cursor.execute(f"SELECT NOM_TABLE FROM {STATISTICS_TABLE}")
+    catalogued = {row[0] for row in cursor.fetchall()}
+    
+    tables = list(DIMENSION_TABLES)
+    for table_name in ['FAIT_VENTES'] + list_partitions(cursor):
+        if table_name in loaded_sales_tables or table_name not in catalogued:
+            tables.append(table_name)
+    for table_name in SUMMARY_TABLES:
+        if aggregates_changed or table_name not in catalogued:
+            tables.append(table_name)
+    return tables
+
+def refresh_table_statistics(cursor, tables, loaded_at):
+    """Mise à jour du catalogue pour les tables données, dans la transaction du chargement
+    (l'identifiant d'exécution est renseigné à la fin du run, voir etl_metrics.finish_run)"""
+    sales_tables = set(['FAIT_VENTES'] + list_partitions(cursor))
+    for table_name in tables:
+        if table_name in sales_tables:
+            stats = sales_statistics(cursor, table_name)
+        else:
+            cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
+            stats = (cursor.fetchone()[0], None, None, None, None)
+        cursor.execute(f"""
+            INSERT INTO {STATISTICS_TABLE} (NOM_TABLE, NB_LIGNES, DATE_MIN_VENTE, DATE_MAX_VENTE, NB_MAGASINS,
+                                            NB_PRODUITS, DERNIER_CHARGEMENT, ID_EXECUTION)
+            VALUES (?, ?, ?, ?, ?, ?, ?, NULL)
+            ON CONFLICT(NOM_TABLE) DO UPDATE SET
+                NB_LIGNES = excluded.NB_LIGNES,
+                DATE_MIN_VENTE = excluded.DATE_MIN_VENTE,
+                DATE_MAX_VENTE = excluded.DATE_MAX_VENTE,
+                NB_MAGASINS = excluded.NB_MAGASINS,
+                NB_PRODUITS = excluded.NB_PRODUITS,
+                DERNIER_CHARGEMENT = excluded.DERNIER_CHARGEMENT,
+                ID_EXECUTION = NULL
+        """, (table_name, *stats, loaded_at))
+
+def read_table_statistics(conn):
+    """Catalogue des statistiques: nom de table -> statistiques (vide pour une base jamais chargée
+    par cette version de l'ETL), SQLite ou DuckDB"""
+    try:
+        rows = conn.execute(f"SELECT NOM_TABLE, {', '.join(STATISTICS_COLUMNS)} FROM {STATISTICS_TABLE}").fetchall()
+    except Exception:
+        return {}
+    return {row[0]: dict(zip(STATISTICS_COLUMNS, row[1:])) for row in rows}
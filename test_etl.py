@@ -1,7 +1,104 @@
 import sqlite3
 import pandas as pd
 import os
-from etl_script import extract_data, transform_data, load_data_conditionally
+import io
+import json
+import hashlib
+import tempfile
+import threading
+import time
+import tracemalloc
+import etl_script
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from etl_script import (
+    extract_data, transform_data, load_data_conditionally, iter_source_chunks, frame_memory_usage,
+    read_high_watermark, prune_sales, stage_frame, find_new_keys, transform_data_cached
+)
+from snapshot_cache import save_snapshot, load_snapshot, evict_snapshots
+from etl_metrics import measure, start_run, finish_run
+from queries import ANALYSIS_QUERIES, EXAMPLE_QUERIES, OVERVIEW_GROUPING_SETS, find_full_scans
+from grouping_sets import compute_grouping_sets, grouping_sets_sql
+from partitioning import fact_source
+from maintenance_database import maintain_database, needs_maintenance
+from query_backends import connect_backend, connect_readonly, run_query, list_tables, duckdb, create_pool, pooled_connection, close_pool
+from query_export import export_query, iter_csv_bytes, pa
+from result_cache import create_cache, cached_query, cache_stats
+from query_pages import fetch_page, count_rows
+from query_budget import query_budget, check_query, run_cancellable
+from table_statistics import read_table_statistics
+from table_browser import table_layout, browse_query, fetch_browse_page
+
+# Jeu de données réduit servi par le serveur HTTP local
+SAMPLE_CSV = {
+    'ventes': (
+        "Date,ID Référence produit,Quantité,ID Magasin\n"
+        "2023-05-27,REF001,4,1\n"
+        "2023-05-27,REF002,1,2\n"
+        "2023-05-28,REF003,2,3\n"
+        "2023-05-29,REF001,5,1\n"
+        "2023-05-29,REF002,3,2\n"
+    ),
+    'produits': (
+        "Nom,ID Référence produit,Prix,Stock\n"
+        "Produit A,REF001,49.99,100\n"
+        "Produit B,REF002,19.99,50\n"
+        "Produit C,REF003,29.99,75\n"
+    ),
+    'magasins': (
+        "ID Magasin,Ville,Nombre de salariés\n"
+        "1,Paris,10\n"
+        "2,Marseille,3\n"
+        "3,Lyon,12\n"
+    )
+}
+
+def sample_frames(files=SAMPLE_CSV):
+    """DataFrames sources construits à partir du jeu de données réduit"""
+    return tuple(pd.read_csv(io.StringIO(files[name])) for name in ('ventes', 'produits', 'magasins'))
+
+def synthetic_frames(n_ventes, n_jours=365, seed=42):
+    """Jeu de données synthétique de taille arbitraire (mêmes colonnes que les sources)"""
+    rng = pd.Series(range(n_ventes))
+    df_produits, df_magasins = sample_frames()[1:]
+    dates = pd.date_range('2023-01-01', periods=n_jours, freq='D').strftime('%Y-%m-%d')
+    df_ventes = pd.DataFrame({
+        'Date': dates[(rng * 7919 + seed) % n_jours],
+        'ID Référence produit': df_produits['ID Référence produit'].to_numpy()[(rng * 31 + seed) % len(df_produits)],
+        'Quantité': (rng * 13 + seed) % 10 + 1,
+        'ID Magasin': df_magasins['ID Magasin'].to_numpy()[(rng * 17 + seed) % len(df_magasins)]
+    })
+    return df_ventes, df_produits, df_magasins
+
+def start_local_server(files):
+    """Serveur HTTP local (avec ETag) remplaçant les URLs Google Sheets"""
+    request_log = []
+    
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            name = self.path.strip('/')
+            body = files[name].encode('utf-8')
+            etag = '"' + hashlib.md5(body).hexdigest() + '"'
+            if self.headers.get('If-None-Match') == etag:
+                request_log.append((name, 304))
+                self.send_response(304)
+                self.end_headers()
+                return
+            request_log.append((name, 200))
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/csv; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, *args):
+            pass
+    
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    return server, {name: f"{base_url}/{name}" for name in files}, request_log
 
 def test_extraction():
     """Test de l'étape d'extraction"""
@@ -25,6 +122,102 @@ def test_extraction():
         print("❌ Échec de l'extraction")
         return False
 
+def test_conditional_extraction():
+    """Test de l'extraction concurrente et conditionnelle (serveur HTTP local)"""
+    print("\n🧪 Test: Extraction conditionnelle avec cache")
+    print("=" * 50)
+    
+    files = dict(SAMPLE_CSV)
+    server, sources, request_log = start_local_server(files)
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            first = extract_data(sources, cache_dir)
+            second = extract_data(sources, cache_dir)
+            statuses = sorted(status for _, status in request_log)
+            if statuses != [200, 200, 200, 304, 304, 304]:
+                print(f"❌ Statuts HTTP inattendus: {request_log}")
+                return False
+            if any(a is not b for a, b in zip(first, second)):
+                print("❌ Les sources inchangées ont été re-parsées")
+                return False
+            
+            # Seule la source modifiée est re-téléchargée
+            files['ventes'] += "2023-05-30,REF003,1,3\n"
+            del request_log[:]
+            third = extract_data(sources, cache_dir)
+            if sorted(request_log) != [('magasins', 304), ('produits', 304), ('ventes', 200)]:
+                print(f"❌ Statuts HTTP inattendus: {request_log}")
+                return False
+            if len(third[0]) != len(first[0]) + 1:
+                print("❌ La source modifiée n'a pas été rechargée")
+                return False
+    finally:
+        server.shutdown()
+    
+    print("✅ Une source inchangée ne coûte qu'un 304 sans re-parsing")
+    return True
+
+def test_streaming_extraction():
+    """Test de la lecture en flux: colonnes utiles uniquement, types explicites"""
+    print("\n🧪 Test: Extraction en flux")
+    print("=" * 50)
+    
+    files = dict(SAMPLE_CSV)
+    # Colonne supplémentaire non utilisée par transform_data
+    lines = SAMPLE_CSV['ventes'].splitlines()
+    files['ventes'] = "\n".join([lines[0] + ",Commentaire"] + [line + ",RAS" for line in lines[1:]]) + "\n"
+    server, sources, _ = start_local_server(files)
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            df_ventes, _, _ = extract_data(sources, cache_dir)
+            if 'Commentaire' in df_ventes.columns:
+                print("❌ Colonne inutile chargée")
+                return False
+            if str(df_ventes['Quantité'].dtype) != 'Int32':
+                print(f"❌ Type inattendu: {df_ventes['Quantité'].dtype}")
+                return False
+            
+            # Des blocs de 2 lignes reconstituent exactement le même DataFrame
+            with iter_source_chunks('ventes', os.path.join(cache_dir, 'ventes.csv'), chunk_rows=2) as reader:
+                chunks = list(reader)
+            if len(chunks) != 3 or not pd.concat(chunks, ignore_index=True).equals(df_ventes):
+                print("❌ Lecture par blocs incohérente")
+                return False
+    finally:
+        server.shutdown()
+    
+    # Lignes sources incomplètes: chargées avec des NULL; valeur non numérique: extraction refusée, signalée
+    dirty = dict(SAMPLE_CSV)
+    dirty['ventes'] = SAMPLE_CSV['ventes'] + "2023-05-30,REF001,,1\n2023-05-30,REF002,2,\n"
+    invalid = dict(SAMPLE_CSV)
+    invalid['ventes'] = SAMPLE_CSV['ventes'] + "2023-05-30,REF001,deux,1\n"
+    server, sources, _ = start_local_server(dirty)
+    invalid_server, invalid_sources, _ = start_local_server(invalid)
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            frames = extract_data(sources, cache_dir)
+            db_path = os.path.join(cache_dir, 'sales_analysis.db')
+            load_data_conditionally(*transform_data(*frames, compact=True), db_path=db_path)
+            conn = sqlite3.connect(db_path)
+            missing = conn.execute(
+                "SELECT SUM(QUANTITE_VENDUE IS NULL), SUM(ID_MAGASIN IS NULL), COUNT(*) FROM FAIT_VENTES"
+            ).fetchone()
+            conn.close()
+        with tempfile.TemporaryDirectory() as cache_dir:
+            rejected = extract_data(invalid_sources, cache_dir)
+    finally:
+        server.shutdown()
+        invalid_server.shutdown()
+    if missing != (1, 1, 7):
+        print(f"❌ Lignes incomplètes mal chargées: {missing}")
+        return False
+    if rejected != (None, None, None):
+        print("❌ Valeur non numérique acceptée")
+        return False
+    
+    print("✅ Lecture en flux réussie!")
+    return True
+
 def test_transformation():
     """Test de l'étape de transformation"""
     print("\n🧪 Test 2: Transformation des données")
@@ -56,6 +249,1349 @@ def test_transformation():
     
     return True
 
+def test_calendar_dimension():
+    """Test de DIM_TEMPS: une ligne par jour distinct et jointure correcte des ventes"""
+    print("\n🧪 Test: Dimension calendrier")
+    print("=" * 50)
+    
+    df_ventes, df_produits, df_magasins = sample_frames()
+    df_dates, _, _, df_faits = transform_data(df_ventes, df_produits, df_magasins)
+    
+    if len(df_dates) != df_ventes['Date'].nunique() or not df_dates['DATE_COMPLETE'].is_unique:
+        print(f"❌ DIM_TEMPS contient {len(df_dates)} lignes au lieu d'une par jour")
+        return False
+    
+    # Chaque vente doit pointer vers sa propre date
+    dates_faits = df_faits[['ID_TEMPS']].merge(df_dates, on='ID_TEMPS', how='left')['DATE_COMPLETE']
+    if not (dates_faits.dt.strftime('%Y-%m-%d') == df_ventes['Date']).all():
+        print("❌ ID_TEMPS incohérents avec les dates de vente")
+        return False
+    
+    print(f"✅ {len(df_dates)} dates distinctes pour {len(df_faits)} ventes")
+    return True
+
+def test_compact_transform():
+    """Test du mode compact: mêmes valeurs, empreinte mémoire réduite"""
+    print("\n🧪 Test: Transformation compacte")
+    print("=" * 50)
+    
+    frames = synthetic_frames(50_000)
+    standard = transform_data(*frames)
+    compact = transform_data(*frames, compact=True)
+    
+    for df_standard, df_compact in zip(standard, compact):
+        if not df_standard.equals(df_compact.astype(df_standard.dtypes.to_dict())):
+            print("❌ Valeurs différentes entre les modes standard et compact")
+            return False
+    
+    if list(standard[2]['TAILLE_MAGASIN']) != ['Moyen', 'Petit', 'Grand']:
+        print("❌ Classement des magasins incorrect")
+        return False
+    
+    # Référence produit manquante: conservée comme valeur manquante
+    files = dict(SAMPLE_CSV)
+    files['ventes'] += "2023-05-30,,2,1\n"
+    references = transform_data(*sample_frames(files), compact=True)[3]['ID_REFERENCE_PRODUIT']
+    if references.isna().sum() != 1 or list(references.cat.categories) != ['REF001', 'REF002', 'REF003']:
+        print(f"❌ Référence manquante mal typée: {list(references)}")
+        return False
+    
+    before = frame_memory_usage({'FAIT_VENTES': standard[3]})['FAIT_VENTES']
+    after = frame_memory_usage({'FAIT_VENTES': compact[3]})['FAIT_VENTES']
+    if after >= before:
+        print("❌ Aucun gain mémoire sur FAIT_VENTES")
+        return False
+    
+    print(f"✅ FAIT_VENTES: {before / 1024:,.0f} Ko -> {after / 1024:,.0f} Ko")
+    return True
+
+def test_incremental_load():
+    """Test du chargement incrémental: seul le delta est inséré, watermark enregistré"""
+    print("\n🧪 Test: Chargement incrémental")
+    print("=" * 50)
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'sales_analysis.db')
+        
+        first = load_data_conditionally(*transform_data(*sample_frames(), compact=True), db_path=db_path)
+        again = load_data_conditionally(*transform_data(*sample_frames()), db_path=db_path)
+        if first['FAIT_VENTES'] != 5 or again['FAIT_VENTES'] != 0 or again['DIM_TEMPS'] != 0:
+            print(f"❌ Rechargement non idempotent: {first} puis {again}")
+            return False
+        
+        # Nouvelle journée + une vente identique à une vente existante du même jour
+        files = dict(SAMPLE_CSV)
+        files['ventes'] += "2023-05-29,REF001,5,1\n2023-05-30,REF003,1,3\n"
+        df_ventes, df_produits, df_magasins = sample_frames(files)
+        watermark = read_high_watermark(db_path)
+        df_ventes = prune_sales(df_ventes, watermark)
+        delta = load_data_conditionally(*transform_data(df_ventes, df_produits, df_magasins), db_path=db_path)
+        if len(df_ventes) != 4 or delta['FAIT_VENTES'] != 2 or delta['DIM_TEMPS'] != 1:
+            print(f"❌ Delta inattendu: {delta}")
+            return False
+        
+        conn = sqlite3.connect(db_path)
+        total = conn.execute("SELECT COUNT(*) FROM FAIT_VENTES").fetchone()[0]
+        conn.close()
+        if total != 7 or read_high_watermark(db_path) != pd.Timestamp('2023-05-30'):
+            print("❌ Contenu final ou watermark incorrect")
+            return False
+        
+        # Ventes sans magasin ou sans date sur un jour déjà chargé: insérées, puis reconnues au rechargement
+        files['ventes'] += "2023-05-27,REF002,1,\n,REF003,1,3\n"
+        missing_keys = load_data_conditionally(*transform_data(*sample_frames(files)), db_path=db_path)
+        reloaded = load_data_conditionally(*transform_data(*sample_frames(files)), db_path=db_path)
+        if missing_keys['FAIT_VENTES'] != 2 or reloaded['FAIT_VENTES'] != 0:
+            print(f"❌ Ventes à clé manquante perdues ou dupliquées: {missing_keys} puis {reloaded}")
+            return False
+    
+    print(f"✅ Delta chargé seul (clés manquantes comprises), watermark au {watermark:%Y-%m-%d} puis 2023-05-30")
+    return True
+
+def aggregates_match_facts(conn):
+    """Comparaison des tables d'agrégats avec un recalcul direct sur FAIT_VENTES"""
+    checks = {
+        'AGG_VENTES_JOUR_MAGASIN_PRODUIT': """
+            SELECT ID_TEMPS, ID_MAGASIN, ID_PRODUIT, COUNT(*), SUM(QUANTITE_VENDUE), ROUND(SUM(MONTANT_VENTE), 2)
+            FROM FAIT_VENTES GROUP BY 1, 2, 3
+            EXCEPT
+            SELECT ID_TEMPS, ID_MAGASIN, ID_PRODUIT, NB_VENTES, QUANTITE_TOTALE, ROUND(MONTANT_TOTAL, 2)
+            FROM AGG_VENTES_JOUR_MAGASIN_PRODUIT
+        """,
+        'AGG_VENTES_MOIS_MAGASIN': """
+            SELECT substr(t.DATE_COMPLETE, 1, 7), f.ID_MAGASIN, COUNT(*), SUM(f.QUANTITE_VENDUE), ROUND(SUM(f.MONTANT_VENTE), 2)
+            FROM FAIT_VENTES f LEFT JOIN DIM_TEMPS t ON t.ID_TEMPS = f.ID_TEMPS GROUP BY 1, 2
+            EXCEPT
+            SELECT ANNEE_MOIS, ID_MAGASIN, NB_VENTES, QUANTITE_TOTALE, ROUND(MONTANT_TOTAL, 2)
+            FROM AGG_VENTES_MOIS_MAGASIN
+        """,
+        'AGG_VENTES_PRODUIT': """
+            SELECT ID_PRODUIT, COUNT(*), SUM(QUANTITE_VENDUE), ROUND(SUM(MONTANT_VENTE), 2)
+            FROM FAIT_VENTES GROUP BY 1
+            EXCEPT
+            SELECT ID_PRODUIT, NB_VENTES, QUANTITE_TOTALE, ROUND(MONTANT_TOTAL, 2)
+            FROM AGG_VENTES_PRODUIT
+        """
+    }
+    for table_name, query in checks.items():
+        total = conn.execute(f"SELECT SUM(NB_VENTES) FROM {table_name}").fetchone()[0]
+        if conn.execute(query).fetchall() or total != conn.execute("SELECT COUNT(*) FROM FAIT_VENTES").fetchone()[0]:
+            print(f"❌ {table_name} incohérente avec FAIT_VENTES")
+            return False
+    return True
+
+def test_aggregates():
+    """Test des agrégats: mise à jour par le seul delta, recalcul d'une base sans agrégats"""
+    print("\n🧪 Test: Agrégats incrémentaux")
+    print("=" * 50)
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'sales_analysis.db')
+        load_data_conditionally(*transform_data(*sample_frames(), compact=True), db_path=db_path)
+        
+        # Delta: vente supplémentaire sur un jour existant, nouvelle journée, ventes sans magasin ou sans date
+        files = dict(SAMPLE_CSV)
+        files['ventes'] += "2023-05-29,REF001,5,1\n2023-06-01,REF003,1,3\n2023-05-27,REF002,1,\n,REF003,1,3\n,REF003,2,3\n"
+        load_data_conditionally(*transform_data(*sample_frames(files)), db_path=db_path)
+        conn = sqlite3.connect(db_path)
+        if not aggregates_match_facts(conn):
+            return False
+        # Groupes NULL compris: les totaux de chaque table d'agrégats sont ceux de FAIT_VENTES
+        null_groups = conn.execute("SELECT COUNT(*) FROM AGG_VENTES_MOIS_MAGASIN WHERE ANNEE_MOIS IS NULL OR ID_MAGASIN IS NULL").fetchone()[0]
+        if null_groups != 2:
+            print(f"❌ Ventes sans date ou sans magasin absentes des agrégats ({null_groups} groupe(s) NULL)")
+            return False
+        
+        # Base antérieure aux agrégats: recalcul complet au chargement suivant
+        for table_name in ('AGG_VENTES_JOUR_MAGASIN_PRODUIT', 'AGG_VENTES_MOIS_MAGASIN', 'AGG_VENTES_PRODUIT'):
+            conn.execute(f"DELETE FROM {table_name}")
+        conn.commit()
+        files['ventes'] += "2023-06-02,REF002,2,2\n"
+        load_data_conditionally(*transform_data(*sample_frames(files)), db_path=db_path)
+        if not aggregates_match_facts(conn):
+            return False
+        
+        # Les analyses lues dans les agrégats donnent les mêmes résultats que sur les ventes
+        ca_ville = pd.read_sql_query(ANALYSIS_QUERIES['ca_par_ville'], conn)
+        expected = pd.read_sql_query("""
+            SELECT dm.VILLE, COUNT(*) as nombre_ventes, SUM(fv.MONTANT_VENTE) as ca_total
+            FROM FAIT_VENTES fv JOIN DIM_MAGASINS dm ON fv.ID_MAGASIN = dm.ID_MAGASIN
+            GROUP BY dm.VILLE ORDER BY ca_total DESC
+        """, conn)
+        months = conn.execute("SELECT COUNT(*) FROM AGG_VENTES_MOIS_MAGASIN").fetchone()[0]
+        conn.close()
+    
+    if not ca_ville[expected.columns].round(2).equals(expected.round(2)):
+        print(f"❌ CA par ville différent:\n{ca_ville}\n{expected}")
+        return False
+    
+    print(f"✅ Agrégats cohérents avec FAIT_VENTES ({months} lignes mois x magasin)")
+    return True
+
+def test_partitioned_load():
+    """Test du stockage partitionné: routage par mois, vue unifiée, élagage, partitions gelées"""
+    print("\n🧪 Test: Stockage partitionné")
+    print("=" * 50)
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'sales_analysis.db')
+        load_data_conditionally(*transform_data(*sample_frames(), compact=True), db_path=db_path, partition_by='month')
+        
+        # Nouveau mois: la partition de mai est entièrement antérieure au watermark et gelée
+        files = dict(SAMPLE_CSV)
+        files['ventes'] += "2023-06-01,REF003,1,3\n2023-06-02,REF002,2,2\n"
+        delta = load_data_conditionally(*transform_data(*sample_frames(files)), db_path=db_path, partition_by='month')
+        
+        # Vente tardive sur mai: rejetée, le chargement entier est annulé
+        late = dict(files)
+        late['ventes'] += "2023-05-28,REF001,9,1\n"
+        rejected = load_data_conditionally(*transform_data(*sample_frames(late)), db_path=db_path, partition_by='month')
+        
+        conn = sqlite3.connect(db_path)
+        counts = {
+            table_name: conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+            for table_name in ('FAIT_VENTES', 'FAIT_VENTES_2023_05', 'FAIT_VENTES_2023_06', 'V_FAIT_VENTES')
+        }
+        distinct_ids = conn.execute("SELECT COUNT(DISTINCT ID_VENTE) FROM V_FAIT_VENTES").fetchone()[0]
+        frozen = [row[0] for row in conn.execute("SELECT NOM_PARTITION FROM FAIT_VENTES_PARTITIONS WHERE LECTURE_SEULE = 1")]
+        aggregated = conn.execute("SELECT SUM(NB_VENTES) FROM AGG_VENTES_PRODUIT").fetchone()[0]
+        june_source = fact_source(conn.cursor(), '2023-06-01', '2023-06-30')
+        # Requêtes utilisateur sur la vue (pas d'élagage): le filtre de date atteint l'index de chaque partition
+        view_scans = find_full_scans(conn, {name: query for name, query in EXAMPLE_QUERIES.items() if 'V_FAIT_VENTES' in query})
+        try:
+            conn.execute("DELETE FROM FAIT_VENTES_2023_05")
+            rewritable = True
+        except sqlite3.IntegrityError:
+            rewritable = False
+        conn.close()
+        
+        # Sans partitionnement, la vue existe aussi: les requêtes utilisateur s'écrivent de la même façon
+        single_path = os.path.join(tmp_dir, 'single.db')
+        load_data_conditionally(*transform_data(*sample_frames()), db_path=single_path)
+        conn = sqlite3.connect(single_path)
+        single_view = conn.execute("SELECT COUNT(*) FROM V_FAIT_VENTES").fetchone()[0]
+        conn.close()
+    
+    if single_view != 5:
+        print(f"❌ Vue V_FAIT_VENTES absente ou incomplète sans partitionnement: {single_view}")
+        return False
+    if delta['FAIT_VENTES'] != 2 or rejected is not None:
+        print(f"❌ Routage ou rejet incorrect: {delta}, {rejected}")
+        return False
+    if counts != {'FAIT_VENTES': 0, 'FAIT_VENTES_2023_05': 5, 'FAIT_VENTES_2023_06': 2, 'V_FAIT_VENTES': 7} or distinct_ids != 7:
+        print(f"❌ Répartition incorrecte: {counts}, {distinct_ids} identifiants distincts")
+        return False
+    if frozen != ['FAIT_VENTES_2023_05'] or rewritable or aggregated != 7:
+        print(f"❌ Gel ou agrégats incorrects: {frozen}, réécriture possible: {rewritable}, {aggregated}")
+        return False
+    if 'FAIT_VENTES_2023_05' in june_source or 'FAIT_VENTES_2023_06' not in june_source:
+        print(f"❌ Élagage incorrect: {june_source}")
+        return False
+    if view_scans:
+        print(f"❌ Partitions parcourues sans index par les requêtes sur V_FAIT_VENTES: {view_scans}")
+        return False
+    
+    print(f"✅ Ventes réparties par mois, partitions gelées: {frozen}")
+    return True
+
+def test_product_key():
+    """Test de la clé produit entière: migration d'une base existante et résolution des références"""
+    print("\n🧪 Test: Clé produit entière")
+    print("=" * 50)
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'sales_analysis.db')
+        
+        # Base existante: ventes et agrégats par référence texte, dont une référence hors catalogue
+        conn = sqlite3.connect(db_path)
+        conn.executescript("""
+            CREATE TABLE DIM_PRODUITS (ID_PRODUIT INTEGER PRIMARY KEY AUTOINCREMENT, ID_REFERENCE_PRODUIT VARCHAR(20) UNIQUE NOT NULL, NOM_PRODUIT VARCHAR(100), PRIX_UNITAIRE DECIMAL(10,2), STOCK_DISPONIBLE INTEGER);
+            CREATE TABLE FAIT_VENTES (ID_VENTE INTEGER PRIMARY KEY AUTOINCREMENT, ID_TEMPS INTEGER, ID_REFERENCE_PRODUIT VARCHAR(20) NOT NULL, ID_MAGASIN INTEGER, QUANTITE_VENDUE INTEGER, MONTANT_VENTE DECIMAL(10,2));
+            CREATE TABLE AGG_VENTES_PRODUIT (ID_REFERENCE_PRODUIT VARCHAR(20) PRIMARY KEY, NB_VENTES INTEGER NOT NULL, QUANTITE_TOTALE INTEGER NOT NULL, MONTANT_TOTAL DECIMAL(14,2) NOT NULL) WITHOUT ROWID;
+            INSERT INTO DIM_PRODUITS (ID_REFERENCE_PRODUIT, NOM_PRODUIT) VALUES ('REF002', 'Produit B');
+            INSERT INTO FAIT_VENTES (ID_TEMPS, ID_REFERENCE_PRODUIT, ID_MAGASIN, QUANTITE_VENDUE, MONTANT_VENTE)
+            VALUES (1, 'REF002', 2, 1, 19.99), (1, 'REF007', 2, 2, 10.0);
+        """)
+        conn.close()
+        
+        # La vente du 2023-05-27 (REF002, magasin 2) est déjà chargée: seul le reste est inséré
+        inserted = load_data_conditionally(*transform_data(*sample_frames()), db_path=db_path)
+        
+        # Vente sans référence produit: écartée, jamais rattachée à un autre produit
+        files = dict(SAMPLE_CSV)
+        files['ventes'] += "2023-05-30,,2,1\n2023-05-30,REF003,1,3\n"
+        unreferenced = load_data_conditionally(*transform_data(*sample_frames(files)), db_path=db_path)
+        
+        conn = sqlite3.connect(db_path)
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(FAIT_VENTES)")]
+        key_types = [row[0] for row in conn.execute("SELECT DISTINCT typeof(ID_PRODUIT) FROM FAIT_VENTES")]
+        joined = conn.execute("""
+            SELECT dp.ID_REFERENCE_PRODUIT, COUNT(*)
+            FROM FAIT_VENTES fv JOIN DIM_PRODUITS dp ON fv.ID_PRODUIT = dp.ID_PRODUIT
+            GROUP BY dp.ID_REFERENCE_PRODUIT
+        """).fetchall()
+        aggregates_ok = aggregates_match_facts(conn)
+        conn.close()
+    
+    if inserted is None or inserted['FAIT_VENTES'] != 4:
+        print(f"❌ Delta incorrect après migration: {inserted}")
+        return False
+    if 'ID_REFERENCE_PRODUIT' in columns or key_types != ['integer']:
+        print(f"❌ Clé produit non entière: {columns}, {key_types}")
+        return False
+    if unreferenced is None or unreferenced['FAIT_VENTES'] != 1:
+        print(f"❌ Vente sans référence produit mal traitée: {unreferenced}")
+        return False
+    if dict(joined) != {'REF001': 2, 'REF002': 2, 'REF003': 2, 'REF007': 1} or not aggregates_ok:
+        print(f"❌ Ventes mal rattachées aux produits: {joined}")
+        return False
+    
+    print(f"✅ Ventes migrées et chargées sur ID_PRODUIT: {dict(joined)}")
+    return True
+
+def baseline_database(db_path, files=SAMPLE_CSV):
+    """Base remplie comme par le chargement d'origine: une ligne DIM_TEMPS par vente, dates horodatées, montants en euros"""
+    df_ventes, df_produits, df_magasins = sample_frames(files)
+    dates = pd.to_datetime(df_ventes['Date'])
+    prix = dict(zip(df_produits['ID Référence produit'], df_produits['Prix']))
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE DIM_TEMPS (ID_TEMPS INTEGER PRIMARY KEY AUTOINCREMENT, DATE_COMPLETE DATE NOT NULL, JOUR_SEMAINE VARCHAR(20), MOIS VARCHAR(20), ANNEE INTEGER, TRIMESTRE INTEGER);
+        CREATE TABLE DIM_PRODUITS (ID_PRODUIT INTEGER PRIMARY KEY AUTOINCREMENT, ID_REFERENCE_PRODUIT VARCHAR(20) UNIQUE NOT NULL, NOM_PRODUIT VARCHAR(100), PRIX_UNITAIRE DECIMAL(10,2), STOCK_DISPONIBLE INTEGER);
+        CREATE TABLE DIM_MAGASINS (ID_MAGASIN INTEGER PRIMARY KEY, VILLE VARCHAR(50), NOMBRE_SALARIES INTEGER, REGION VARCHAR(50), TAILLE_MAGASIN VARCHAR(20));
+        CREATE TABLE FAIT_VENTES (ID_VENTE INTEGER PRIMARY KEY AUTOINCREMENT, ID_TEMPS INTEGER, ID_REFERENCE_PRODUIT VARCHAR(20) NOT NULL, ID_MAGASIN INTEGER, QUANTITE_VENDUE INTEGER, MONTANT_VENTE DECIMAL(10,2));
+    """)
+    pd.DataFrame({
+        'DATE_COMPLETE': dates, 'JOUR_SEMAINE': dates.dt.day_name(), 'MOIS': dates.dt.month_name(),
+        'ANNEE': dates.dt.year, 'TRIMESTRE': dates.dt.quarter
+    }).to_sql('DIM_TEMPS', conn, if_exists='append', index=False)
+    df_produits.rename(columns={
+        'ID Référence produit': 'ID_REFERENCE_PRODUIT', 'Nom': 'NOM_PRODUIT', 'Prix': 'PRIX_UNITAIRE', 'Stock': 'STOCK_DISPONIBLE'
+    }).to_sql('DIM_PRODUITS', conn, if_exists='append', index=False)
+    df_magasins.rename(columns={
+        'ID Magasin': 'ID_MAGASIN', 'Ville': 'VILLE', 'Nombre de salariés': 'NOMBRE_SALARIES'
+    }).to_sql('DIM_MAGASINS', conn, if_exists='append', index=False)
+    # Chaque vente pointe vers la dernière ligne DIM_TEMPS de sa date (dictionnaire date -> position)
+    date_to_id = dict(zip(dates, range(1, len(dates) + 1)))
+    pd.DataFrame({
+        'ID_TEMPS': dates.map(date_to_id),
+        'ID_REFERENCE_PRODUIT': df_ventes['ID Référence produit'],
+        'ID_MAGASIN': df_ventes['ID Magasin'],
+        'QUANTITE_VENDUE': df_ventes['Quantité'],
+        'MONTANT_VENTE': df_ventes['ID Référence produit'].map(prix) * df_ventes['Quantité']
+    }).to_sql('FAIT_VENTES', conn, if_exists='append', index=False)
+    conn.commit()
+    conn.close()
+
+def test_baseline_upgrade():
+    """Test de la mise à niveau d'une base remplie par le chargement d'origine (une ligne DIM_TEMPS par vente)"""
+    print("\n🧪 Test: Mise à niveau d'une base d'origine")
+    print("=" * 50)
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'sales_analysis.db')
+        baseline_database(db_path)
+        conn = sqlite3.connect(db_path)
+        sales_before = conn.execute("""
+            SELECT date(t.DATE_COMPLETE), f.ID_REFERENCE_PRODUIT, f.ID_MAGASIN
+            FROM FAIT_VENTES f JOIN DIM_TEMPS t ON t.ID_TEMPS = f.ID_TEMPS ORDER BY f.ID_VENTE
+        """).fetchall()
+        conn.close()
+        
+        # Doublons de dates fusionnés avant la création de l'index unique: le chargement aboutit,
+        # et les dates horodatées reconnues comme déjà chargées (aucune vente comptée deux fois)
+        inserted = load_data_conditionally(*transform_data(*sample_frames()), db_path=db_path)
+        files = dict(SAMPLE_CSV)
+        files['ventes'] += "2023-05-28,REF001,1,1\n"
+        delta = load_data_conditionally(*transform_data(*sample_frames(files)), db_path=db_path)
+        
+        conn = sqlite3.connect(db_path)
+        duplicates = conn.execute("SELECT COUNT(*) - COUNT(DISTINCT DATE_COMPLETE) FROM DIM_TEMPS").fetchone()[0]
+        dates = [row[0] for row in conn.execute("SELECT DATE_COMPLETE FROM DIM_TEMPS ORDER BY DATE_COMPLETE")]
+        ca_total = conn.execute("SELECT SUM(MONTANT_VENTE) FROM FAIT_VENTES").fetchone()[0]
+        sales_after = conn.execute("""
+            SELECT date(t.DATE_COMPLETE), p.ID_REFERENCE_PRODUIT, f.ID_MAGASIN
+            FROM FAIT_VENTES f
+            JOIN DIM_TEMPS t ON t.ID_TEMPS = f.ID_TEMPS
+            JOIN DIM_PRODUITS p ON p.ID_PRODUIT = f.ID_PRODUIT
+            WHERE f.ID_VENTE <= ? ORDER BY f.ID_VENTE
+        """, (len(sales_before),)).fetchall()
+        conn.close()
+    
+    if inserted is None or delta is None:
+        print("❌ Chargement en échec sur une base d'origine")
+        return False
+    if inserted['FAIT_VENTES'] != 0 or inserted['DIM_TEMPS'] != 0 or delta['FAIT_VENTES'] != 1:
+        print(f"❌ Ventes d'origine rechargées: {inserted} puis {delta}")
+        return False
+    if dates != ['2023-05-27', '2023-05-28', '2023-05-29'] or ca_total != 58985 + 4999:
+        print(f"❌ Dates ou CA incorrects: {dates}, {ca_total}")
+        return False
+    if duplicates or sales_after != sales_before:
+        print(f"❌ Calendrier mal fusionné: {duplicates} doublon(s), ventes {sales_after}")
+        return False
+    
+    print(f"✅ Calendrier fusionné en dates ISO, {len(sales_before)} ventes d'origine conservées sans doublon")
+    return True
+
+def test_money_cents():
+    """Test des montants en centimes entiers: sommes exactes et migration d'une base en euros"""
+    print("\n🧪 Test: Montants en centimes")
+    print("=" * 50)
+    
+    # CA attendu calculé en décimal exact à partir des sources
+    df_ventes, df_produits, _ = sample_frames()
+    prix = {row['ID Référence produit']: Decimal(str(row['Prix'])) for _, row in df_produits.iterrows()}
+    expected = int(sum(prix[reference] * quantite for reference, quantite in zip(df_ventes['ID Référence produit'], df_ventes['Quantité'])) * 100)
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'sales_analysis.db')
+        
+        # Base en euros (DECIMAL): une vente déjà chargée et une vente de 10 € hors du jeu d'essai
+        conn = sqlite3.connect(db_path)
+        conn.executescript("""
+            CREATE TABLE DIM_PRODUITS (ID_PRODUIT INTEGER PRIMARY KEY AUTOINCREMENT, ID_REFERENCE_PRODUIT VARCHAR(20) UNIQUE NOT NULL, NOM_PRODUIT VARCHAR(100), PRIX_UNITAIRE DECIMAL(10,2), STOCK_DISPONIBLE INTEGER);
+            CREATE TABLE FAIT_VENTES (ID_VENTE INTEGER PRIMARY KEY AUTOINCREMENT, ID_TEMPS INTEGER, ID_PRODUIT INTEGER NOT NULL, ID_MAGASIN INTEGER, QUANTITE_VENDUE INTEGER, MONTANT_VENTE DECIMAL(10,2));
+            INSERT INTO DIM_PRODUITS (ID_REFERENCE_PRODUIT, NOM_PRODUIT, PRIX_UNITAIRE) VALUES ('REF002', 'Produit B', 19.99);
+            INSERT INTO FAIT_VENTES (ID_TEMPS, ID_PRODUIT, ID_MAGASIN, QUANTITE_VENDUE, MONTANT_VENTE)
+            VALUES (1, 1, 2, 1, 19.99), (1, 1, 2, 2, 10.0);
+        """)
+        conn.close()
+        
+        load_data_conditionally(*transform_data(*sample_frames(), compact=True), db_path=db_path)
+        
+        conn = sqlite3.connect(db_path)
+        types = {
+            row[0] for row in conn.execute("""
+                SELECT typeof(MONTANT_VENTE) FROM FAIT_VENTES
+                UNION SELECT typeof(PRIX_UNITAIRE) FROM DIM_PRODUITS
+                UNION SELECT typeof(MONTANT_TOTAL) FROM AGG_VENTES_PRODUIT
+            """)
+        }
+        migrated = [row[0] for row in conn.execute("SELECT MONTANT_VENTE FROM FAIT_VENTES WHERE ID_VENTE <= 2 ORDER BY ID_VENTE")]
+        ca_total = compute_grouping_sets(conn, {'total': ()})['total']['ca_total'].iloc[0]
+        aggregates_ok = aggregates_match_facts(conn)
+        conn.close()
+    
+    if types != {'integer'}:
+        print(f"❌ Montants non entiers: {types}")
+        return False
+    if migrated != [1999, 1000]:
+        print(f"❌ Migration en centimes incorrecte: {migrated}")
+        return False
+    if ca_total != expected + 1000 or not aggregates_ok:
+        print(f"❌ CA inexact: {ca_total} centimes au lieu de {expected + 1000}")
+        return False
+    
+    print(f"✅ CA exact: {ca_total} centimes, ventes existantes converties {migrated}")
+    return True
+
+def test_query_backends():
+    """Test des backends de requêtes: mêmes résultats sur SQLite et DuckDB pour toutes les requêtes intégrées"""
+    print("\n🧪 Test: Backends de requêtes")
+    print("=" * 50)
+    
+    if duckdb is None:
+        print("⚠️ duckdb non installé: test ignoré")
+        return True
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'sales_analysis.db')
+        load_data_conditionally(*transform_data(*synthetic_frames(2000), compact=True), db_path=db_path)
+        sqlite_conn = connect_backend('sqlite', db_path)
+        duckdb_conn = connect_backend('duckdb', db_path, os.path.join(tmp_dir, 'parquet'))
+        try:
+            tables = set(list_tables(duckdb_conn))
+            differences = []
+            for name, query in {**ANALYSIS_QUERIES, **EXAMPLE_QUERIES}.items():
+                expected = run_query(sqlite_conn, query)
+                result = run_query(duckdb_conn, query)
+                # Ordre des lignes non garanti à égalité de tri: comparaison après tri complet
+                expected = expected.sort_values(list(expected.columns)).reset_index(drop=True).round(6)
+                result = result.sort_values(list(result.columns)).reset_index(drop=True).round(6)
+                if list(result.columns) != list(expected.columns) or not result.astype(str).equals(expected.astype(str)):
+                    differences.append(name)
+        finally:
+            sqlite_conn.close()
+            duckdb_conn.close()
+    
+    if not {'FAIT_VENTES', 'DIM_PRODUITS', 'AGG_VENTES_PRODUIT'} <= tables:
+        print(f"❌ Tables absentes côté DuckDB: {sorted(tables)}")
+        return False
+    if differences:
+        print(f"❌ Résultats différents entre SQLite et DuckDB: {differences}")
+        return False
+    
+    print(f"✅ {len(ANALYSIS_QUERIES) + len(EXAMPLE_QUERIES)} requêtes identiques sur SQLite et DuckDB")
+    return True
+
+def test_connection_pool():
+    """Test du pool de connexions: lecture seule, réutilisation, accès concurrents, base remplacée par l'ETL"""
+    print("\n🧪 Test: Pool de connexions")
+    print("=" * 50)
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'sales_analysis.db')
+        load_data_conditionally(*transform_data(*sample_frames()), db_path=db_path)
+        pool = create_pool(db_path, 'sqlite', size=2)
+        
+        with pooled_connection(pool) as first_conn:
+            try:
+                first_conn.execute("DELETE FROM FAIT_VENTES")
+                writable = True
+            except sqlite3.OperationalError:
+                writable = False
+        with pooled_connection(pool) as conn:
+            reused = conn is first_conn
+        
+        # Sessions concurrentes: plus de threads que de connexions, chacun avec sa connexion
+        counts, errors = [], []
+        def session():
+            try:
+                with pooled_connection(pool) as conn:
+                    counts.append(conn.execute("SELECT COUNT(*) FROM FAIT_VENTES").fetchone()[0])
+                    time.sleep(0.05)
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=session) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        open_connections = pool['open']
+        
+        # L'ETL reconstruit la base dans un nouveau fichier et le substitue à l'ancien
+        files = dict(SAMPLE_CSV)
+        files['ventes'] += "2023-06-01,REF003,1,3\n"
+        rebuilt_path = os.path.join(tmp_dir, 'rebuilt.db')
+        load_data_conditionally(*transform_data(*sample_frames(files)), db_path=rebuilt_path)
+        os.replace(rebuilt_path, db_path)
+        with pooled_connection(pool) as conn:
+            swapped_count = conn.execute("SELECT COUNT(*) FROM FAIT_VENTES").fetchone()[0]
+            reconnected = conn is not first_conn
+        
+        close_pool(pool)
+        os.remove(db_path)
+        try:
+            with pooled_connection(pool):
+                pass
+            missing_detected = False
+        except FileNotFoundError:
+            missing_detected = True
+    
+    if writable or not reused:
+        print(f"❌ Connexion inscriptible ou non réutilisée (réutilisée: {reused})")
+        return False
+    if errors or counts != [5] * 6 or open_connections != 2:
+        print(f"❌ Accès concurrents incorrects: {counts}, {errors}, {open_connections} connexions")
+        return False
+    if swapped_count != 6 or not reconnected or not missing_detected:
+        print(f"❌ Base remplacée non détectée: {swapped_count} ventes, reconnexion: {reconnected}")
+        return False
+    
+    print(f"✅ {len(counts)} sessions servies par {open_connections} connexions en lecture seule, reconnexion après remplacement")
+    return True
+
+def test_streaming_export():
+    """Test de l'export en flux: CSV et Parquet identiques au résultat complet, mémoire bornée par bloc"""
+    print("\n🧪 Test: Export en flux")
+    print("=" * 50)
+    
+    query = "SELECT ID_VENTE, ID_TEMPS, ID_PRODUIT, ID_MAGASIN, QUANTITE_VENDUE, MONTANT_VENTE FROM FAIT_VENTES ORDER BY ID_VENTE"
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'sales_analysis.db')
+        load_data_conditionally(*transform_data(*synthetic_frames(50_000), compact=True), db_path=db_path)
+        conn = sqlite3.connect(db_path)
+        try:
+            expected = run_query(conn, query)
+            
+            # Pic mémoire d'un export de 10 000 lignes puis du résultat complet: borné par la taille des blocs
+            peaks, calls = [], []
+            for sql, file_name in ((f"{query} LIMIT 10000", 'extrait.csv'), (query, 'ventes.csv')):
+                calls.clear()
+                tracemalloc.start()
+                csv_result = export_query(conn, sql, os.path.join(tmp_dir, file_name), chunk_rows=500,
+                                          progress=lambda rows, nbytes: calls.append((rows, nbytes)))
+                peaks.append(tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+            csv_df = pd.read_csv(os.path.join(tmp_dir, 'ventes.csv'))
+            
+            streamed = b''.join(iter_csv_bytes(conn, query, chunk_rows=1000))
+            with open(os.path.join(tmp_dir, 'ventes.csv'), 'rb') as f:
+                same_stream = streamed == f.read()
+            
+            if pa is not None:
+                parquet_result = export_query(conn, query, os.path.join(tmp_dir, 'ventes.parquet'), chunk_rows=7000)
+                parquet_df = pd.read_parquet(os.path.join(tmp_dir, 'ventes.parquet'))
+            empty_result = export_query(conn, "SELECT * FROM FAIT_VENTES WHERE 0", os.path.join(tmp_dir, 'vide.csv'))
+            
+            # Même export lancé par deux sessions en même temps: fichiers temporaires distincts
+            concurrent_errors = []
+            def export_session():
+                session_conn = sqlite3.connect(db_path)
+                try:
+                    export_query(session_conn, query, os.path.join(tmp_dir, 'partage.csv'), chunk_rows=500)
+                except Exception as e:
+                    concurrent_errors.append(e)
+                finally:
+                    session_conn.close()
+            sessions = [threading.Thread(target=export_session) for _ in range(2)]
+            for session in sessions:
+                session.start()
+            for session in sessions:
+                session.join()
+            leftovers = [name for name in os.listdir(tmp_dir) if name.endswith('.tmp')]
+        finally:
+            conn.close()
+    
+    if csv_result['lignes'] != len(expected) or not csv_df.equals(expected) or not same_stream:
+        print(f"❌ Export CSV différent du résultat ({csv_result['lignes']} lignes sur {len(expected)})")
+        return False
+    if len(calls) != len(expected) // 500 or calls[-1] != (len(expected), csv_result['octets']):
+        print(f"❌ Progression incorrecte: {len(calls)} appels, dernier {calls[-1] if calls else None}")
+        return False
+    if peaks[1] > 2 * peaks[0]:
+        print(f"❌ Mémoire non bornée: pic {peaks[0] / 1024:.0f} Ko pour 10 000 lignes, {peaks[1] / 1024:.0f} Ko pour {len(expected):,}")
+        return False
+    if pa is not None and (parquet_result['lignes'] != len(expected) or not parquet_df.equals(expected)):
+        print("❌ Export Parquet différent du résultat")
+        return False
+    if empty_result['lignes'] != 0:
+        print("❌ Export d'un résultat vide incorrect")
+        return False
+    if concurrent_errors or leftovers:
+        print(f"❌ Exports simultanés en conflit: {concurrent_errors}, {leftovers}")
+        return False
+    
+    print(f"✅ {csv_result['lignes']:,} lignes exportées par blocs ({len(calls)} blocs), pic mémoire {peaks[1] / 1024:.0f} Ko pour {csv_result['octets'] / 1024:.0f} Ko de CSV")
+    return True
+
+def test_result_cache():
+    """Test du cache de résultats: succès mémoire et disque, invalidation au chargement, LRU et durée de vie"""
+    print("\n🧪 Test: Cache de résultats")
+    print("=" * 50)
+    
+    query = ANALYSIS_QUERIES['ca_par_ville']
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'sales_analysis.db')
+        cache_dir = os.path.join(tmp_dir, 'results')
+        load_data_conditionally(*transform_data(*sample_frames()), db_path=db_path)
+        conn = connect_readonly(db_path)
+        try:
+            cache = create_cache(cache_dir=cache_dir)
+            first = cached_query(cache, conn, query, db_path)
+            first['ca_total'] = 0
+            # Même requête, mise en forme différente: même entrée du cache, non modifiée par l'appelant
+            second = cached_query(cache, conn, "\n".join(query.split()) + ";", db_path)
+            memory_stats = cache_stats(cache)
+            direct = run_query(conn, query)
+            
+            # Redémarrage du dashboard: résultat relu sur disque
+            restarted = create_cache(cache_dir=cache_dir)
+            from_disk = cached_query(restarted, conn, query, db_path)
+            disk_stats = cache_stats(restarted)
+            
+            # Nouveau chargement validé: résultats précédents invalidés
+            files = dict(SAMPLE_CSV)
+            files['ventes'] += "2023-06-01,REF003,1,3\n"
+            load_data_conditionally(*transform_data(*sample_frames(files)), db_path=db_path)
+            reloaded = cached_query(restarted, conn, query, db_path)
+            reload_stats = cache_stats(restarted)
+            
+            # Taille maximale et durée de vie
+            small = create_cache(max_bytes=1, cache_dir=None)
+            for name in ('ca_par_ville', 'top_produits', 'vue_ensemble'):
+                cached_query(small, conn, ANALYSIS_QUERIES[name], db_path)
+            expiring = create_cache(ttl_s=0, cache_dir=None)
+            cached_query(expiring, conn, query, db_path)
+            time.sleep(0.01)
+            cached_query(expiring, conn, query, db_path)
+        finally:
+            conn.close()
+    
+    if (memory_stats['succes'], memory_stats['echecs']) != (1, 1) or not second.equals(direct):
+        print(f"❌ Succès mémoire attendu: {memory_stats}")
+        return False
+    if disk_stats['succes_disque'] != 1 or not from_disk.equals(second):
+        print(f"❌ Succès disque attendu après redémarrage: {disk_stats}")
+        return False
+    if reload_stats['echecs'] != 1 or reloaded['ca_total'].sum() <= from_disk['ca_total'].sum() or reload_stats['entrees'] != 1:
+        print(f"❌ Cache non invalidé par le chargement: {reload_stats}")
+        return False
+    if cache_stats(small)['evictions'] != 2 or cache_stats(small)['entrees'] != 1:
+        print(f"❌ Éviction LRU incorrecte: {cache_stats(small)}")
+        return False
+    if cache_stats(expiring)['echecs'] != 2:
+        print(f"❌ Durée de vie non respectée: {cache_stats(expiring)}")
+        return False
+    
+    print(f"✅ Succès mémoire et disque, invalidation au chargement, {cache_stats(small)['evictions']} évictions LRU")
+    return True
+
+def test_grouping_sets():
+    """Test des regroupements multiples: une seule requête, résultats identiques aux GROUP BY sur les faits"""
+    print("\n🧪 Test: Regroupements en un seul parcours")
+    print("=" * 50)
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'sales_analysis.db')
+        load_data_conditionally(*transform_data(*synthetic_frames(5000), compact=True), db_path=db_path)
+        conn = sqlite3.connect(db_path)
+        try:
+            queries_run = []
+            def runner(conn, query):
+                queries_run.append(query)
+                return run_query(conn, query)
+            breakdowns = compute_grouping_sets(conn, OVERVIEW_GROUPING_SETS, runner=runner)
+            by_region_year = compute_grouping_sets(conn, {'region_annee': ('REGION', 'ANNEE')})['region_annee']
+            from_facts = compute_grouping_sets(conn, OVERVIEW_GROUPING_SETS, fact_table='FAIT_VENTES')
+            
+            facts = pd.read_sql_query("""
+                SELECT dm.VILLE, dm.REGION, dp.NOM_PRODUIT, dt.ANNEE, fv.QUANTITE_VENDUE, fv.MONTANT_VENTE
+                FROM FAIT_VENTES fv
+                JOIN DIM_MAGASINS dm ON fv.ID_MAGASIN = dm.ID_MAGASIN
+                JOIN DIM_PRODUITS dp ON fv.ID_PRODUIT = dp.ID_PRODUIT
+                JOIN DIM_TEMPS dt ON fv.ID_TEMPS = dt.ID_TEMPS
+            """, conn)
+        finally:
+            conn.close()
+    
+    def expected(attributes):
+        grouped = facts.groupby(attributes).agg(
+            nombre_ventes=('MONTANT_VENTE', 'size'), ca_total=('MONTANT_VENTE', 'sum'), quantite_totale=('QUANTITE_VENDUE', 'sum')
+        )
+        return grouped.sort_index()
+    def actual(df, attributes):
+        return df.set_index(attributes)[['nombre_ventes', 'ca_total', 'quantite_totale']].sort_index()
+    
+    total = breakdowns['total'].iloc[0]
+    if len(queries_run) != 1 or 'FAIT_VENTES' in queries_run[0]:
+        print(f"❌ {len(queries_run)} requête(s) pour la vue d'ensemble")
+        return False
+    if (total['nombre_ventes'], total['ca_total'], total['quantite_totale']) != (len(facts), facts['MONTANT_VENTE'].sum(), facts['QUANTITE_VENDUE'].sum()):
+        print(f"❌ Totaux incorrects: {total.to_dict()}")
+        return False
+    if total['panier_moyen'] != facts['MONTANT_VENTE'].sum() / len(facts):
+        print(f"❌ Panier moyen incorrect: {total['panier_moyen']}")
+        return False
+    for name, attributes in (('ville', ['VILLE']), ('produit', ['NOM_PRODUIT'])):
+        if not actual(breakdowns[name], attributes).equals(expected(attributes)):
+            print(f"❌ Regroupement {name} différent des faits:\n{breakdowns[name]}")
+            return False
+        if not breakdowns[name]['ca_total'].is_monotonic_decreasing:
+            print(f"❌ Regroupement {name} non trié par CA")
+            return False
+    if not actual(by_region_year, ['REGION', 'ANNEE']).equals(expected(['REGION', 'ANNEE'])):
+        print(f"❌ Regroupement région x année différent des faits:\n{by_region_year}")
+        return False
+    if any(not from_facts[name].equals(breakdowns[name]) for name in OVERVIEW_GROUPING_SETS):
+        print("❌ Regroupements sur la table de faits différents des agrégats")
+        return False
+    if 'AGG_VENTES_PRODUIT' not in grouping_sets_sql({'produit': ('NOM_PRODUIT',)}):
+        print("❌ Table d'agrégats la plus petite non retenue")
+        return False
+    
+    print(f"✅ {len(OVERVIEW_GROUPING_SETS)} regroupements de la vue d'ensemble en 1 requête, identiques aux faits")
+    return True
+
+def test_query_pages():
+    """Test de la pagination des requêtes personnalisées: pages lues à la demande, limite de lignes, comptage borné"""
+    print("\n🧪 Test: Pagination des requêtes")
+    print("=" * 50)
+    
+    query = "SELECT * FROM FAIT_VENTES ORDER BY ID_VENTE;"
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'sales_analysis.db')
+        load_data_conditionally(*transform_data(*synthetic_frames(5000), compact=True), db_path=db_path)
+        conn = connect_readonly(db_path)
+        try:
+            expected = run_query(conn, query)
+            first, first_next, _ = fetch_page(conn, query, 0)
+            fourth, _, _ = fetch_page(conn, query, 3)
+            capped, capped_next, capped_flag = fetch_page(conn, query, 2, page_size=100, max_rows=250)
+            try:
+                fetch_page(conn, query, 3, page_size=100, max_rows=250)
+                beyond_cap = False
+            except ValueError:
+                beyond_cap = True
+            last, last_next, last_capped = fetch_page(conn, "SELECT * FROM FAIT_VENTES LIMIT 150", 1)
+            pragma, _, _ = fetch_page(conn, "PRAGMA table_info(FAIT_VENTES)", 0, page_size=4)
+            counts = (count_rows(conn, query), count_rows(conn, query, limit=1000))
+            try:
+                fetch_page(conn, "SELECT * FROM TABLE_INEXISTANTE", 0)
+                error = ''
+            except Exception as e:
+                error = str(e)
+        finally:
+            conn.close()
+    
+    if not first.equals(expected.iloc[:100].reset_index(drop=True)) or not first_next:
+        print("❌ Première page incorrecte")
+        return False
+    if not fourth.equals(expected.iloc[300:400].reset_index(drop=True)):
+        print("❌ Quatrième page incorrecte")
+        return False
+    if len(capped) != 50 or capped_next or not capped_flag or not beyond_cap:
+        print(f"❌ Limite de lignes non respectée: {len(capped)} lignes, suivante: {capped_next}")
+        return False
+    if len(last) != 50 or last_next or last_capped:
+        print(f"❌ Dernière page incorrecte: {len(last)} lignes")
+        return False
+    if list(pragma['name']) != ['ID_VENTE', 'ID_TEMPS', 'ID_PRODUIT', 'ID_MAGASIN']:
+        print(f"❌ Requête non englobable (PRAGMA) mal paginée: {list(pragma['name'])}")
+        return False
+    if counts != ((5000, True), (1000, False)):
+        print(f"❌ Comptage incorrect: {counts}")
+        return False
+    if 'TABLE_INEXISTANTE' not in error:
+        print(f"❌ Erreur SQL de l'utilisateur masquée: {error}")
+        return False
+    
+    print(f"✅ Pages de 100 lignes lues à la demande, limite de lignes, comptage borné ({counts[0][0]:,} lignes)")
+    return True
+
+def test_query_budget():
+    """Test du budget des requêtes personnalisées: produit cartésien refusé, durée et instructions bornées,
+    annulation, dépassements journalisés"""
+    print("\n🧪 Test: Budget des requêtes")
+    print("=" * 50)
+    
+    heavy_query = "SELECT COUNT(*) FROM FAIT_VENTES a, FAIT_VENTES b"
+    
+    class StopScript(BaseException):
+        """Interruption du script par Streamlit (clic pendant l'exécution)"""
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'sales_analysis.db')
+        log_path = os.path.join(tmp_dir, 'budget.jsonl')
+        load_data_conditionally(*transform_data(*synthetic_frames(5000), compact=True), db_path=db_path)
+        conn = connect_readonly(db_path)
+        try:
+            try:
+                check_query(conn, "SELECT * FROM FAIT_VENTES, DIM_TEMPS", max_rows=1_000_000, log_path=log_path)
+                rejected = ''
+            except ValueError as e:
+                rejected = str(e)
+            small_warnings = check_query(conn, "SELECT * FROM DIM_MAGASINS CROSS JOIN DIM_PRODUITS", log_path=log_path)
+            builtin_warnings = {
+                name: check_query(conn, query, log_path=log_path)
+                for name, query in {**ANALYSIS_QUERIES, **EXAMPLE_QUERIES}.items()
+            }
+            
+            errors = {}
+            for reason, budget in (('duree', {'timeout_s': 0.05}), ('instructions', {'max_steps': 1_000_000})):
+                start = time.perf_counter()
+                try:
+                    with query_budget(conn, heavy_query, log_path=log_path, **budget):
+                        conn.execute(heavy_query).fetchone()
+                    errors[reason] = None
+                except TimeoutError as e:
+                    errors[reason] = (str(e), time.perf_counter() - start)
+            
+            # Annulation depuis un autre thread (bouton du dashboard)
+            cancel = threading.Event()
+            threading.Timer(0.05, cancel.set).start()
+            try:
+                with query_budget(conn, heavy_query, cancel=cancel, log_path=log_path):
+                    conn.execute(heavy_query).fetchone()
+                cancelled = False
+            except InterruptedError:
+                cancelled = True
+            
+            # Script interrompu pendant l'attente: la requête du thread de travail est annulée
+            def stop_script(elapsed):
+                raise StopScript()
+            def run_heavy():
+                with query_budget(conn, heavy_query, cancel=stopped, log_path=log_path):
+                    return conn.execute(heavy_query).fetchone()
+            stopped = threading.Event()
+            start = time.perf_counter()
+            try:
+                run_cancellable(run_heavy, stopped, stop_script, poll_s=0.05)
+                script_stopped = False
+            except StopScript:
+                script_stopped = stopped.is_set()
+            stop_delay = time.perf_counter() - start
+            
+            # Gestionnaire retiré à la sortie: la connexion n'est plus bornée
+            with query_budget(conn, "SELECT 1", max_steps=10_000, log_path=log_path):
+                pass
+            unbounded = conn.execute("SELECT COUNT(*) FROM FAIT_VENTES a, DIM_MAGASINS b").fetchone()[0]
+        finally:
+            conn.close()
+        
+        # DuckDB: la page interrompue par le budget n'est pas relancée sans LIMIT
+        duckdb_error = 'DuckDB non installé'
+        if duckdb is not None:
+            duck = duckdb.connect()
+            duck.execute("CREATE TABLE T AS SELECT range AS X FROM range(30000)")
+            duck_query = "SELECT COUNT(*) FROM T a, T b WHERE a.X + b.X = 7"
+            start = time.perf_counter()
+            try:
+                with query_budget(duck, duck_query, timeout_s=0.1, log_path=log_path):
+                    fetch_page(duck, duck_query, 0)
+                duckdb_error = None
+            except TimeoutError:
+                duckdb_error = time.perf_counter() - start
+            finally:
+                duck.close()
+        
+        with open(log_path, encoding='utf-8') as f:
+            reasons = [json.loads(line)['motif'] for line in f]
+    
+    if 'FAIT_VENTES × DIM_TEMPS' not in rejected:
+        print(f"❌ Produit cartésien non refusé: {rejected}")
+        return False
+    if len(small_warnings) != 1 or 'DIM_MAGASINS × DIM_PRODUITS' not in small_warnings[0]:
+        print(f"❌ Petit produit cartésien non signalé: {small_warnings}")
+        return False
+    if any(builtin_warnings.values()):
+        print(f"❌ Requêtes intégrées signalées à tort: {builtin_warnings}")
+        return False
+    if any(error is None or error[1] > 2 for error in errors.values()):
+        print(f"❌ Budget non respecté: {errors}")
+        return False
+    if not cancelled or not script_stopped or stop_delay > 2:
+        print(f"❌ Annulation non prise en compte: {cancelled}, {script_stopped} ({stop_delay:.2f} s)")
+        return False
+    if unbounded != 5000 * 3:
+        print(f"❌ Requête suivante incorrecte: {unbounded}")
+        return False
+    if duckdb_error is None or (isinstance(duckdb_error, float) and duckdb_error > 1):
+        print(f"❌ Budget DuckDB non respecté: {duckdb_error}")
+        return False
+    expected_reasons = ['produit_cartesien', 'duree', 'instructions', 'annulation', 'annulation']
+    if duckdb is not None:
+        expected_reasons.append('duree')
+    if reasons != expected_reasons:
+        print(f"❌ Dépassements mal journalisés: {reasons}")
+        return False
+    
+    print(f"✅ Produit cartésien refusé, requêtes interrompues ({errors['duree'][1]:.2f} s), annulation en {stop_delay:.2f} s")
+    return True
+
+def test_table_statistics():
+    """Test du catalogue de statistiques: tenu à jour par chaque chargement, exact, rattaché au run ETL"""
+    print("\n🧪 Test: Catalogue de statistiques")
+    print("=" * 50)
+    
+    def naive_statistics(conn, table_name):
+        return conn.execute(f"""
+            SELECT COUNT(*), MIN(t.DATE_COMPLETE), MAX(t.DATE_COMPLETE), COUNT(DISTINCT f.ID_MAGASIN), COUNT(DISTINCT f.ID_PRODUIT)
+            FROM {table_name} f JOIN DIM_TEMPS t ON t.ID_TEMPS = f.ID_TEMPS
+        """).fetchone()
+    
+    def catalogued(stats, table_name):
+        return tuple(stats[table_name][column] for column in ('NB_LIGNES', 'DATE_MIN_VENTE', 'DATE_MAX_VENTE', 'NB_MAGASINS', 'NB_PRODUITS'))
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'sales_analysis.db')
+        conn = sqlite3.connect(db_path)
+        empty = read_table_statistics(conn)
+        conn.close()
+        
+        start_run()
+        load_data_conditionally(*transform_data(*synthetic_frames(5000, n_jours=60), compact=True), db_path=db_path)
+        finish_run('succes', db_path, os.path.join(tmp_dir, 'reports'))
+        conn = sqlite3.connect(db_path)
+        first = read_table_statistics(conn)
+        first_expected = naive_statistics(conn, 'FAIT_VENTES')
+        conn.close()
+        
+        # Second chargement hors run: nouvelles ventes, identifiant d'exécution remis à zéro
+        load_data_conditionally(*transform_data(*synthetic_frames(8000, n_jours=90, seed=7), compact=True), db_path=db_path)
+        conn = sqlite3.connect(db_path)
+        second = read_table_statistics(conn)
+        second_expected = naive_statistics(conn, 'FAIT_VENTES')
+        dimension_counts = {table_name: conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0] for table_name in ('DIM_TEMPS', 'AGG_VENTES_JOUR_MAGASIN_PRODUIT')}
+        conn.close()
+        
+        # Stockage partitionné: une entrée par partition, ventes réparties
+        partitioned_path = os.path.join(tmp_dir, 'partitioned.db')
+        load_data_conditionally(*transform_data(*synthetic_frames(5000, n_jours=90), compact=True), db_path=partitioned_path, partition_by='month')
+        conn = sqlite3.connect(partitioned_path)
+        partitioned = read_table_statistics(conn)
+        partition_expected = {
+            table_name: naive_statistics(conn, table_name)
+            for table_name in partitioned if table_name.startswith('FAIT_VENTES_')
+        }
+        conn.close()
+    
+    if empty != {}:
+        print(f"❌ Catalogue lu sur une base vide: {empty}")
+        return False
+    if catalogued(first, 'FAIT_VENTES') != first_expected or catalogued(second, 'FAIT_VENTES') != second_expected:
+        print(f"❌ Statistiques inexactes: {catalogued(second, 'FAIT_VENTES')} au lieu de {second_expected}")
+        return False
+    if any(second[table_name]['NB_LIGNES'] != count for table_name, count in dimension_counts.items()):
+        print(f"❌ Nombres de lignes inexacts: {dimension_counts}")
+        return False
+    if {stats['ID_EXECUTION'] for stats in first.values()} != {1} or second['FAIT_VENTES']['ID_EXECUTION'] is not None:
+        print(f"❌ Identifiant d'exécution incorrect: {first['FAIT_VENTES']['ID_EXECUTION']}, {second['FAIT_VENTES']['ID_EXECUTION']}")
+        return False
+    if second['FAIT_VENTES']['DERNIER_CHARGEMENT'] <= first['FAIT_VENTES']['DERNIER_CHARGEMENT']:
+        print("❌ Date du dernier chargement non mise à jour")
+        return False
+    if len(partition_expected) != 3 or any(catalogued(partitioned, name) != expected for name, expected in partition_expected.items()):
+        print(f"❌ Statistiques des partitions inexactes: {partition_expected}")
+        return False
+    
+    print(f"✅ Catalogue exact après deux chargements ({second_expected[0]:,} ventes) et sur {len(partition_expected)} partitions")
+    return True
+
+def test_table_browser():
+    """Test de l'explorateur de tables: pages par clé identiques à un tri complet, recherche dans l'index"""
+    print("\n🧪 Test: Explorateur de tables")
+    print("=" * 50)
+    
+    def browse(conn, table_name, layout, order, descending=False, filters=(), page_size=37):
+        rows, last, pages = [], None, 0
+        while True:
+            df, last = fetch_browse_page(conn, table_name, layout, None, order, descending, filters, last, page_size)
+            # NULL lus comme NaN par pandas: comparés sous forme de None
+            rows += [tuple(None if pd.isna(value) else value for value in row) for row in df.itertuples(index=False, name=None)]
+            pages += 1
+            if last is None:
+                return rows, pages
+    
+    def ordered(conn, table_name, layout, order, descending=False, where=""):
+        direction = ' DESC' if descending else ''
+        order_by = ', '.join(f"{column}{direction}" for column in layout['ordres'][order])
+        return conn.execute(f"SELECT {', '.join(layout['colonnes'])} FROM {table_name} {where} ORDER BY {order_by}").fetchall()
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'sales_analysis.db')
+        load_data_conditionally(*transform_data(*synthetic_frames(3000, n_jours=30), compact=True), db_path=db_path)
+        conn = sqlite3.connect(db_path)
+        layout = table_layout(conn, 'FAIT_VENTES')
+        
+        mismatches = []
+        for order in layout['ordres']:
+            for descending in (False, True):
+                rows, _ = browse(conn, 'FAIT_VENTES', layout, order, descending)
+                if rows != ordered(conn, 'FAIT_VENTES', layout, order, descending):
+                    mismatches.append((order, descending))
+        magasin_order = next(order for order in layout['ordres'] if order.startswith('ID_MAGASIN'))
+        filtered, _ = browse(conn, 'FAIT_VENTES', layout, magasin_order, True, [('ID_PRODUIT', '=', '2'), ('QUANTITE_VENDUE', '>=', '3')])
+        filtered_expected = ordered(conn, 'FAIT_VENTES', layout, magasin_order, True, "WHERE ID_PRODUIT = 2 AND QUANTITE_VENDUE >= 3")
+        
+        # Page profonde: plages de la clé résolues par recherche dans l'index, sans parcours complet
+        last = tuple(conn.execute("SELECT ID_MAGASIN, QUANTITE_VENDUE, MONTANT_VENTE, ID_VENTE FROM FAIT_VENTES ORDER BY 1, 2, 3, 4 LIMIT 1 OFFSET 2000").fetchone())
+        query, params = browse_query('FAIT_VENTES', layout, ['MONTANT_VENTE'], magasin_order, filters=[('ID_PRODUIT', '=', '2')], last=last)
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()]
+        
+        errors = []
+        for filters in ([('COLONNE_INCONNUE', '=', '1')], [('ID_PRODUIT', '; DROP TABLE FAIT_VENTES', '1')]):
+            try:
+                fetch_browse_page(conn, 'FAIT_VENTES', layout, filters=filters)
+            except ValueError:
+                errors.append(filters)
+        projection, _ = fetch_browse_page(conn, 'FAIT_VENTES', layout, ['MONTANT_VENTE', 'ID_PRODUIT'], magasin_order)
+        conn.close()
+    
+    # NULL, doublons, clé composite sans rowid et table sans clé primaire (rowid)
+    memory = sqlite3.connect(':memory:')
+    memory.execute("CREATE TABLE T (A INTEGER, B TEXT, C INTEGER, PRIMARY KEY (A, C)) WITHOUT ROWID")
+    memory.execute("CREATE INDEX IDX_T_B ON T (B)")
+    memory.execute("CREATE TABLE R (X INTEGER, Y TEXT)")
+    memory.execute("CREATE INDEX IDX_R_Y ON R (Y)")
+    values = [(i % 7, None if i % 5 == 0 else f"v{i % 4}", i) for i in range(300)]
+    memory.executemany("INSERT INTO T VALUES (?, ?, ?)", values)
+    memory.executemany("INSERT INTO R VALUES (?, ?)", [(a, b) for a, b, _ in values])
+    null_mismatches = []
+    for table_name in ('T', 'R'):
+        table = table_layout(memory, table_name)
+        for order in table['ordres']:
+            for descending in (False, True):
+                rows, _ = browse(memory, table_name, table, order, descending, page_size=11)
+                expected = [row[:len(table['colonnes'])] for row in ordered(memory, table_name, table, order, descending)]
+                if [row[:len(table['colonnes'])] for row in rows] != expected:
+                    null_mismatches.append((table_name, order, descending))
+    
+    # Texte d'allure numérique: même résultat quel que soit l'ordre (colonne en tête ou préfixée d'un +)
+    memory.execute("CREATE TABLE N (ID INTEGER PRIMARY KEY, CODE VARCHAR(10), QUANTITE INTEGER)")
+    memory.execute("CREATE INDEX IDX_N_QUANTITE ON N (QUANTITE)")
+    memory.execute("CREATE INDEX IDX_N_CODE ON N (CODE)")
+    memory.executemany("INSERT INTO N VALUES (?, ?, ?)", [(1, '123', 5), (2, 'abc', 123), (3, '0123', 7), (4, '123', 123)])
+    codes = table_layout(memory, 'N')
+    text_filters = {
+        order: [len(fetch_browse_page(memory, 'N', codes, None, order, filters=[(column, '=', '123')])[0]) for column in ('CODE', 'QUANTITE')]
+        for order in codes['ordres']
+    }
+    memory.close()
+    
+    if mismatches or null_mismatches:
+        print(f"❌ Pages différentes du tri complet: {mismatches + null_mismatches}")
+        return False
+    if filtered != filtered_expected:
+        print(f"❌ Filtres: {len(filtered)} lignes au lieu de {len(filtered_expected)}")
+        return False
+    if any(detail.startswith('SCAN FAIT_VENTES') for detail in plan) or not any('SEARCH' in detail for detail in plan):
+        print(f"❌ Page profonde sans recherche dans l'index: {plan}")
+        return False
+    if any(counts != [2, 2] for counts in text_filters.values()):
+        print(f"❌ Filtres dépendant de l'ordre de tri: {text_filters}")
+        return False
+    if len(errors) != 2:
+        print("❌ Colonne ou opérateur invalide accepté")
+        return False
+    if list(projection.columns) != ['MONTANT_VENTE', 'ID_PRODUIT'] or len(projection) != 100:
+        print(f"❌ Projection incorrecte: {list(projection.columns)}, {len(projection)} lignes")
+        return False
+    
+    print(f"✅ {len(layout['ordres'])} ordres × 2 sens identiques au tri complet, {len(filtered)} lignes filtrées, pages profondes par recherche dans l'index")
+    return True
+
+def test_new_keys_detection():
+    """Test de la détection des nouvelles clés (table temporaire + anti-jointure)"""
+    print("\n🧪 Test: Détection des nouvelles clés")
+    print("=" * 50)
+    
+    # Bien au-delà de la limite de paramètres SQLite d'une clause IN (...)
+    conn = sqlite3.connect(':memory:')
+    cursor = conn.cursor()
+    cursor.execute("CREATE TABLE DIM_TEMPS (ID_TEMPS INTEGER PRIMARY KEY, DATE_COMPLETE DATE UNIQUE)")
+    cursor.executemany(
+        "INSERT INTO DIM_TEMPS (DATE_COMPLETE) VALUES (?)",
+        ((f"K{i:07d}",) for i in range(0, 200_000, 2))
+    )
+    
+    df_keys = pd.DataFrame({'DATE_COMPLETE': [f"K{i:07d}" for i in range(200_000)]})
+    stage_frame(cursor, 'STG_CLES', df_keys, ['DATE_COMPLETE'])
+    new_keys = find_new_keys(cursor, 'STG_CLES', 'DIM_TEMPS', ['DATE_COMPLETE'])
+    conn.close()
+    
+    expected = {f"K{i:07d}" for i in range(1, 200_000, 2)}
+    if set(new_keys['DATE_COMPLETE']) != expected:
+        print(f"❌ {len(new_keys)} nouvelles clés trouvées au lieu de {len(expected)}")
+        return False
+    
+    print(f"✅ {len(new_keys)} nouvelles clés identifiées sur {len(df_keys)} candidates")
+    return True
+
+def test_bulk_load():
+    """Test du chargement en masse: contenu exact et index reconstruits"""
+    print("\n🧪 Test: Chargement en masse")
+    print("=" * 50)
+    
+    frames = transform_data(*synthetic_frames(20_000), compact=True)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'sales_analysis.db')
+        inserted = load_data_conditionally(*frames, db_path=db_path, batch_size=3_000, rebuild_indexes=True)
+        
+        conn = sqlite3.connect(db_path)
+        count, total = conn.execute("SELECT COUNT(*), SUM(QUANTITE_VENDUE) FROM FAIT_VENTES").fetchone()
+        indexes = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'FAIT_VENTES'"
+        )]
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        conn.close()
+    
+    if inserted is None or count != 20_000 or total != frames[3]['QUANTITE_VENDUE'].sum():
+        print(f"❌ Contenu incorrect: {count} ventes chargées")
+        return False
+    if 'IDX_FAIT_VENTES_CLE' not in indexes or journal_mode != 'wal':
+        print(f"❌ Index ou journal incorrects: {indexes}, {journal_mode}")
+        return False
+    
+    print(f"✅ {count} ventes chargées, index {indexes} reconstruits")
+    return True
+
+def test_query_plans():
+    """Test des plans d'exécution: aucune requête intégrée ne parcourt FAIT_VENTES sans index"""
+    print("\n🧪 Test: Plans des requêtes intégrées")
+    print("=" * 50)
+    
+    frames = transform_data(*synthetic_frames(20_000), compact=True)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'sales_analysis.db')
+        
+        # Base existante avec l'ancien index non couvrant: il doit être recréé
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE FAIT_VENTES (ID_VENTE INTEGER PRIMARY KEY AUTOINCREMENT, ID_TEMPS INTEGER, ID_REFERENCE_PRODUIT VARCHAR(20) NOT NULL, ID_MAGASIN INTEGER, QUANTITE_VENDUE INTEGER, MONTANT_VENTE DECIMAL(10,2))")
+        conn.execute("CREATE INDEX IDX_FAIT_VENTES_CLE ON FAIT_VENTES(ID_TEMPS, ID_REFERENCE_PRODUIT, ID_MAGASIN)")
+        conn.close()
+        load_data_conditionally(*frames, db_path=db_path)
+        
+        conn = sqlite3.connect(db_path)
+        key_columns = [row[2] for row in conn.execute("PRAGMA index_info(IDX_FAIT_VENTES_CLE)")]
+        full_scans = find_full_scans(conn)
+        conn.close()
+    
+    if 'MONTANT_VENTE' not in key_columns:
+        print(f"❌ Index non mis à jour: {key_columns}")
+        return False
+    if full_scans:
+        print(f"❌ Parcours complets de table: {full_scans}")
+        return False
+    
+    print(f"✅ {len(ANALYSIS_QUERIES) + len(EXAMPLE_QUERIES)} requêtes servies par index")
+    return True
+
+def test_maintenance():
+    """Test de la maintenance: statistiques, WAL tronqué, pages libres récupérées, plans inchangés"""
+    print("\n🧪 Test: Maintenance de la base")
+    print("=" * 50)
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'sales_analysis.db')
+        load_data_conditionally(*transform_data(*synthetic_frames(20_000), compact=True), db_path=db_path)
+        pending = needs_maintenance(db_path)
+        
+        # Ventes supprimées: pages libres à récupérer
+        conn = sqlite3.connect(db_path)
+        conn.execute("DELETE FROM FAIT_VENTES WHERE ID_VENTE % 2 = 0")
+        conn.commit()
+        conn.close()
+        
+        report = maintain_database(db_path)
+        conn = sqlite3.connect(db_path)
+        stats = conn.execute("SELECT COUNT(*) FROM sqlite_stat1").fetchone()[0]
+        full_scans = find_full_scans(conn)
+        conn.close()
+        done = not needs_maintenance(db_path)
+    
+    before, after = report['avant'], report['apres']
+    if not pending or not done or stats == 0:
+        print(f"❌ Statistiques non calculées: {stats} lignes dans sqlite_stat1")
+        return False
+    if after['auto_vacuum'] != 'INCREMENTAL' or before['pages_libres'] == 0 or after['pages_libres'] != 0:
+        print(f"❌ Pages libres non récupérées: {before} -> {after}")
+        return False
+    if after['taille_wal'] != 0 or after['taille_fichier'] >= before['taille_fichier'] + before['taille_wal']:
+        print(f"❌ WAL non tronqué ou fichier non réduit: {before} -> {after}")
+        return False
+    if full_scans:
+        print(f"❌ Parcours complets après ANALYZE: {full_scans}")
+        return False
+    
+    print(f"✅ {before['pages_libres']} pages libres récupérées, fichier {before['taille_fichier']} -> {after['taille_fichier']} octets")
+    return True
+
+def test_run_report():
+    """Test de l'instrumentation: rapport JSON par étape et historique ETL_EXECUTIONS"""
+    print("\n🧪 Test: Rapport d'exécution")
+    print("=" * 50)
+    
+    server, sources, _ = start_local_server(SAMPLE_CSV)
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = os.path.join(tmp_dir, 'test.db')
+            start_run()
+            with measure('extraction') as step:
+                etl_script._parsed_frames.clear()
+                frames = extract_data(sources, os.path.join(tmp_dir, 'cache'))
+                step['lignes_sortie'] = sum(len(df) for df in frames)
+            with measure('transformation', rows_in=len(frames[0])) as step:
+                star_schema = transform_data(*frames)
+                step['lignes_sortie'] = len(star_schema[3])
+            with measure('chargement', rows_in=len(star_schema[3])) as step:
+                inserted = load_data_conditionally(*star_schema, db_path=db_path)
+                step['lignes_sortie'] = sum(inserted.values())
+            report_path = finish_run('succes', db_path, os.path.join(tmp_dir, 'reports'))
+            
+            with open(report_path, encoding='utf-8') as f:
+                report = json.load(f)
+            steps = {(step['etape'], step['table']) for step in report['etapes']}
+            expected = {('extraction', 'ventes'), ('transformation', 'FAIT_VENTES'), ('chargement', 'DIM_TEMPS'), ('chargement', None)}
+            if not expected <= steps:
+                print(f"❌ Étapes manquantes: {expected - steps}")
+                return False
+            # Mémoire par étape: résidente au début et à la fin, hausse du pic (jamais négative)
+            if any(step['hausse_pic_rss_mo'] is not None and step['hausse_pic_rss_mo'] < 0 for step in report['etapes']):
+                print("❌ Hausse du pic mémoire négative")
+                return False
+            if any(step['rss_debut_mo'] is None for step in report['etapes']) and os.path.exists('/proc/self/statm'):
+                print("❌ Mémoire résidente non mesurée")
+                return False
+            if report['totaux']['octets_lus'] != sum(len(body.encode('utf-8')) for body in SAMPLE_CSV.values()):
+                print(f"❌ Octets lus inattendus: {report['totaux']['octets_lus']}")
+                return False
+            
+            conn = sqlite3.connect(db_path)
+            history = conn.execute("SELECT STATUT, LIGNES_EXTRAITES, LIGNES_CHARGEES FROM ETL_EXECUTIONS").fetchall()
+            conn.close()
+            if history != [('succes', 11, sum(inserted.values()))]:
+                print(f"❌ Historique inattendu: {history}")
+                return False
+    finally:
+        server.shutdown()
+    
+    print(f"✅ Rapport de {len(report['etapes'])} étapes, {report['totaux']['duree_s']:.3f} s")
+    return True
+
+def test_parallel_transform():
+    """Test de la transformation parallèle: résultat identique au chemin série"""
+    print("\n🧪 Test: Transformation parallèle")
+    print("=" * 50)
+    
+    frames = synthetic_frames(20_000)
+    serial = transform_data(*frames, compact=True)
+    parallel = transform_data(*frames, compact=True, workers=2)
+    
+    for df_serial, df_parallel in zip(serial, parallel):
+        if not df_serial.equals(df_parallel):
+            print("❌ Résultats différents entre les chemins série et parallèle")
+            return False
+    
+    print("✅ Transformation parallèle identique au chemin série")
+    return True
+
+def test_snapshot_cache():
+    """Test des snapshots Arrow: relecture sans re-parsing ni re-transformation, éviction"""
+    print("\n🧪 Test: Snapshots Arrow")
+    print("=" * 50)
+    
+    server, sources, _ = start_local_server(SAMPLE_CSV)
+    original_reader = etl_script.iter_source_chunks
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            etl_script._parsed_frames.clear()
+            df_ventes, df_produits, df_magasins = extract_data(sources, cache_dir)
+            
+            # Nouveau processus simulé: mémo vidé, le CSV ne doit plus être parsé
+            etl_script._parsed_frames.clear()
+            def fail_reader(*args, **kwargs):
+                raise AssertionError("CSV re-parsé malgré le snapshot")
+            etl_script.iter_source_chunks = fail_reader
+            frames = extract_data(sources, cache_dir)
+            etl_script.iter_source_chunks = original_reader
+            if not all(df.equals(snapshot) for df, snapshot in zip((df_ventes, df_produits, df_magasins), frames)):
+                print("❌ Snapshot d'extraction différent des données parsées")
+                return False
+            
+            # Transformation: le second appel est relu depuis le snapshot, types compris
+            snapshot_dir = os.path.join(cache_dir, 'snapshots')
+            computed = transform_data_cached(*frames, compact=True, snapshot_dir=snapshot_dir)
+            cached = transform_data_cached(*frames, compact=True, snapshot_dir=snapshot_dir)
+            if not all(df.equals(snapshot) for df, snapshot in zip(computed, cached)):
+                print("❌ Snapshot de transformation différent du calcul")
+                return False
+    finally:
+        etl_script.iter_source_chunks = original_reader
+        server.shutdown()
+    
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        df = pd.DataFrame({'valeur': range(1000)})
+        for key in ('ancien', 'recent', 'courant'):
+            save_snapshot(key, {'frame': df}, snapshot_dir)
+        os.utime(os.path.join(snapshot_dir, 'ancien'), (0, 0))
+        recent = time.time() - 86400
+        os.utime(os.path.join(snapshot_dir, 'recent'), (recent, recent))
+        
+        # Éviction par âge, puis par taille (le moins récemment utilisé d'abord)
+        evicted = evict_snapshots(snapshot_dir, max_bytes=10 ** 9, max_age_days=30)
+        if evicted != ['ancien']:
+            print(f"❌ Éviction par âge inattendue: {evicted}")
+            return False
+        evicted = evict_snapshots(snapshot_dir, max_bytes=1, max_age_days=10 ** 6)
+        if evicted != ['recent', 'courant'] or load_snapshot('courant', ['frame'], snapshot_dir) is not None:
+            print(f"❌ Éviction par taille inattendue: {evicted}")
+            return False
+    
+    print("✅ Snapshots relus sans re-parsing, éviction correcte")
+    return True
+
 def test_database_connection():
     """Test de connexion à la base de données"""
     print("\n🧪 Test 3: Connexion à la base de données")
@@ -181,7 +1717,33 @@ def run_all_tests():
     
     tests = [
         ("Extraction", test_extraction),
+        ("Extraction cache", test_conditional_extraction),
+        ("Extraction flux", test_streaming_extraction),
         ("Transformation", test_transformation),
+        ("Dimension temps", test_calendar_dimension),
+        ("Transformation compacte", test_compact_transform),
+        ("Transformation parallèle", test_parallel_transform),
+        ("Snapshots Arrow", test_snapshot_cache),
+        ("Chargement incrémental", test_incremental_load),
+        ("Agrégats", test_aggregates),
+        ("Stockage partitionné", test_partitioned_load),
+        ("Nouvelles clés", test_new_keys_detection),
+        ("Chargement en masse", test_bulk_load),
+        ("Plans de requêtes", test_query_plans),
+        ("Clé produit entière", test_product_key),
+        ("Montants en centimes", test_money_cents),
+        ("Base d'origine", test_baseline_upgrade),
+        ("Backends de requêtes", test_query_backends),
+        ("Pool de connexions", test_connection_pool),
+        ("Export en flux", test_streaming_export),
+        ("Cache de résultats", test_result_cache),
+        ("Regroupements", test_grouping_sets),
+        ("Pagination requêtes", test_query_pages),
+        ("Budget requêtes", test_query_budget),
+        ("Catalogue statistiques", test_table_statistics),
+        ("Explorateur de tables", test_table_browser),
+        ("Maintenance", test_maintenance),
+        ("Rapport d'exécution", test_run_report),
         ("Connexion DB", test_database_connection),
         ("Pipeline complet", test_full_etl),
         ("Qualité données", test_data_quality)
@@ -224,8 +1786,60 @@ if __name__ == "__main__":
         
         if test_option == "extract":
             test_extraction()
+        elif test_option == "cache":
+            test_conditional_extraction()
+        elif test_option == "stream":
+            test_streaming_extraction()
         elif test_option == "transform":
             test_transformation()
+        elif test_option == "calendar":
+            test_calendar_dimension()
+        elif test_option == "compact":
+            test_compact_transform()
+        elif test_option == "parallel":
+            test_parallel_transform()
+        elif test_option == "snapshot":
+            test_snapshot_cache()
+        elif test_option == "incremental":
+            test_incremental_load()
+        elif test_option == "aggregates":
+            test_aggregates()
+        elif test_option == "partitions":
+            test_partitioned_load()
+        elif test_option == "pool":
+            test_connection_pool()
+        elif test_option == "export":
+            test_streaming_export()
+        elif test_option == "resultcache":
+            test_result_cache()
+        elif test_option == "groupingsets":
+            test_grouping_sets()
+        elif test_option == "pages":
+            test_query_pages()
+        elif test_option == "budget":
+            test_query_budget()
+        elif test_option == "stats":
+            test_table_statistics()
+        elif test_option == "browser":
+            test_table_browser()
+        elif test_option == "keys":
+            test_new_keys_detection()
+        elif test_option == "bulk":
+            test_bulk_load()
+        elif test_option == "plans":
+            test_query_plans()
+        elif test_option == "productkey":
+            test_product_key()
+        elif test_option == "cents":
+            test_money_cents()
+        elif test_option == "baseline":
+            test_baseline_upgrade()
+        elif test_option == "backends":
+            test_query_backends()
+        elif test_option == "maintenance":
+            test_maintenance()
+        elif test_option == "report":
+            test_run_report()
         elif test_option == "db":
             test_database_connection()
         elif test_option == "etl":
@@ -235,7 +1849,33 @@ if __name__ == "__main__":
         else:
             print("Options disponibles:")
             print("  python test_etl.py extract   - Test extraction")
+            print("  python test_etl.py cache     - Test extraction conditionnelle")
+            print("  python test_etl.py stream    - Test extraction en flux")
             print("  python test_etl.py transform - Test transformation")
+            print("  python test_etl.py calendar  - Test dimension temps")
+            print("  python test_etl.py compact   - Test transformation compacte")
+            print("  python test_etl.py parallel  - Test transformation parallèle")
+            print("  python test_etl.py snapshot  - Test snapshots Arrow")
+            print("  python test_etl.py incremental - Test chargement incrémental")
+            print("  python test_etl.py aggregates - Test agrégats incrémentaux")
+            print("  python test_etl.py partitions - Test stockage partitionné")
+            print("  python test_etl.py pool      - Test pool de connexions")
+            print("  python test_etl.py export    - Test export en flux")
+            print("  python test_etl.py resultcache - Test cache de résultats")
+            print("  python test_etl.py groupingsets - Test regroupements en un seul parcours")
+            print("  python test_etl.py pages     - Test pagination des requêtes")
+            print("  python test_etl.py budget    - Test budget des requêtes")
+            print("  python test_etl.py stats     - Test catalogue de statistiques")
+            print("  python test_etl.py browser   - Test explorateur de tables")
+            print("  python test_etl.py keys      - Test détection des nouvelles clés")
+            print("  python test_etl.py bulk      - Test chargement en masse")
+            print("  python test_etl.py plans     - Test plans des requêtes")
+            print("  python test_etl.py productkey - Test clé produit entière")
+            print("  python test_etl.py cents     - Test montants en centimes")
+            print("  python test_etl.py baseline  - Test mise à niveau d'une base d'origine")
+            print("  python test_etl.py backends  - Test backends de requêtes (SQLite, DuckDB)")
+            print("  python test_etl.py maintenance - Test maintenance de la base")
+            print("  python test_etl.py report    - Test rapport d'exécution")
             print("  python test_etl.py db        - Test connexion DB")
             print("  python test_etl.py etl       - Test pipeline complet")
             print("  python test_etl.py quality   - Test qualité données")